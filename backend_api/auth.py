@@ -1,58 +1,36 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import HTTPException, status
 from fastapi import Depends, HTTPException, status  # ← Ajouter Depends
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import database
 import crud
+import identity
+import models
+import passwords
 import os
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production-2024")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Configuration de bcrypt - CORRIGÉE
-pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    deprecated="auto"
-)
-
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Vérifie un mot de passe"""
+    """Vérifie un mot de passe (appel bloquant ; les routes async utilisent passwords.hasher.verify)"""
     try:
-        # Limiter à 72 octets (limite bcrypt)
-        if isinstance(plain_password, str):
-            plain_password_bytes = plain_password.encode('utf-8')
-            if len(plain_password_bytes) > 72:
-                plain_password = plain_password_bytes[:72].decode('utf-8', errors='ignore')
-        
-        return pwd_context.verify(plain_password, hashed_password)
+        return passwords.hasher.verify_blocking(plain_password, hashed_password)
     except Exception as e:
         print(f"❌ Erreur verify_password: {e}")
         return False
 
 def get_password_hash(password: str) -> str:
-    """Hash un mot de passe"""
+    """Hash un mot de passe (appel bloquant ; les routes async utilisent passwords.hasher.hash)"""
     try:
-        # S'assurer que c'est une string
-        password = str(password)
-        
-        # Limiter à 72 octets (limite bcrypt)
-        password_bytes = password.encode('utf-8')
-        if len(password_bytes) > 72:
-            # Tronquer proprement en évitant de couper un caractère UTF-8
-            password = password_bytes[:72].decode('utf-8', errors='ignore')
-            print(f"⚠️  Mot de passe tronqué à 72 octets")
-        
-        hashed = pwd_context.hash(password)
-        print(f"✅ Mot de passe hashé avec succès")
-        return hashed
+        return passwords.hasher.hash_blocking(password)
     except Exception as e:
         print(f"❌ Erreur get_password_hash: {e}")
         raise HTTPException(
@@ -60,21 +38,39 @@ def get_password_hash(password: str) -> str:
             detail=f"Erreur lors du hachage du mot de passe: {str(e)}"
         )
     
-def get_current_user(
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(database.get_db)
-):
-    """Récupère l'utilisateur actuellement connecté depuis le token"""
-    email = verify_token(token)
-    user = crud.get_user_by_email(db, email=email)
+    db: AsyncSession = Depends(database.get_async_db)
+) -> identity.Identity:
+    """Récupère l'utilisateur actuellement connecté depuis le token (en cache, sans requête le plus souvent)"""
+    claims = token_claims(token)
+    user_id = claims.get("uid")
+    email = str(claims["sub"])
     
-    if user is None:
+    current_user = identity.cache.user(user_id=user_id, email=email)
+    # Version de session inconnue de l'entrée en cache : mot de passe changé sur un autre worker
+    if current_user is not None and not current_user.accepts(claims.get("sv")):
+        current_user = None
+    if current_user is None:
+        if user_id is not None:
+            user = await db.get(models.User, user_id)
+        else:
+            user = await crud.get_user_by_email(db, email=email)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Utilisateur non trouvé"
+            )
+        current_user = identity.cache.put(identity.Identity.from_user(user))
+    
+    # Token émis avant le dernier changement de mot de passe
+    if not current_user.accepts(claims.get("sv")):
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Utilisateur non trouvé"
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Session expirée"
         )
     
-    return user
+    return current_user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Crée un token JWT"""
@@ -94,21 +90,31 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
             detail="Erreur lors de la création du token"
         )
 
-def verify_token(token: str) -> str:
-    """Vérifie un token JWT et retourne l'email"""
+def create_user_token(user, expires_delta: Optional[timedelta] = None) -> str:
+    """Token d'un utilisateur : email (sub), id immuable (uid) et version de session (sv)"""
+    return create_access_token(
+        data={
+            "sub": user.email,
+            "uid": user.id,
+            "sv": identity.session_version(user),
+        },
+        expires_delta=expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
+def _decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
         
-        if email is None:
+        if payload.get("sub") is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid authentication credentials"
             )
         
-        # S'assurer que email est une string
-        return str(email)
+        return payload
         
+    except HTTPException:
+        raise
     except JWTError as e:
         print(f"❌ Erreur verify_token: {e}")
         raise HTTPException(
@@ -120,4 +126,13 @@ def verify_token(token: str) -> str:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials"
-        )
\ No newline at end of file
+        )
+
+def token_claims(token: str) -> dict:
+    """Revendications d'un token valide (signature vérifiée une fois, puis en cache jusqu'à expiration)"""
+    return identity.cache.claims(token, _decode_token)
+
+def verify_token(token: str) -> str:
+    """Vérifie un token JWT et retourne l'email"""
+    # S'assurer que email est une string
+    return str(token_claims(token)["sub"])
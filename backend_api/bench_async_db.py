@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la couche de données : Session synchrone contre AsyncSession dans les routes async
+
+Base SQLite temporaire ; deux applications FastAPI servent la même page d'historique :
+  - avant : `async def` + Session synchrone, moteur configuré comme auparavant
+    (chaque requête SQL bloque la boucle)
+  - après : `async def` + AsyncSession, options de pool et PRAGMA de database.py
+Pendant la charge, un client mesure la latence de /ping : une boucle bloquée par
+les requêtes SQL répond en retard même aux routes qui ne touchent pas la base.
+
+Au-delà de OLD_POOL_CAPACITY requêtes simultanées, la version synchrone se bloque :
+la boucle attend une connexion (pool_timeout) que seules les requêtes en cours,
+suspendues sur cette même boucle, peuvent rendre. Sa mesure est alors ignorée.
+
+Usage:
+    python bench_async_db.py [requêtes] [concurrence] [designs_par_utilisateur]
+"""
+
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+import database
+from models import Base, DesignHistory
+from pagination import encode_cursor, history_page
+
+USERS = 20
+PAGE_SIZE = 50
+PING_INTERVAL_S = 0.005
+# QueuePool par défaut de l'ancien moteur : pool_size=5, max_overflow=10
+OLD_POOL_CAPACITY = 5 + 10
+
+
+def populate(session, rows_per_user: int):
+    start = datetime(2024, 1, 1)
+    table = DesignHistory.__table__
+    for user_id in range(1, USERS + 1):
+        session.execute(table.insert(), [{
+            "user_id": user_id,
+            "original_image_path": f"uploads/objects/{user_id}/{i}_o.jpg",
+            "generated_image_path": f"uploads/objects/{user_id}/{i}_g.jpg",
+            "style": "modern",
+            "room_type": "bedroom",
+            "is_favorite": i % 10 == 0,
+            "created_at": start + timedelta(minutes=i),
+        } for i in range(rows_per_user)])
+    session.commit()
+
+
+def sync_app(url: str) -> FastAPI:
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+
+    @app.get("/history/{user_id}")
+    async def history(user_id: int, cursor: str = None, db: Session = Depends(get_db)):
+        items, next_cursor = history_page(db, user_id, PAGE_SIZE, cursor)
+        return {"count": len(items), "next_cursor": next_cursor}
+
+    @app.get("/ping")
+    async def ping():
+        return {}
+
+    app.state.engine = engine
+    return app
+
+
+def async_app(url: str) -> FastAPI:
+    engine = create_async_engine(database.async_url(url), **database._engine_options(database.async_url(url)))
+    event.listen(engine.sync_engine, "connect", database._sqlite_pragmas)
+    SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def get_db():
+        async with SessionLocal() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.get("/history/{user_id}")
+    async def history(user_id: int, cursor: str = None, db: AsyncSession = Depends(get_db)):
+        items, next_cursor = await db.run_sync(history_page, user_id, PAGE_SIZE, cursor)
+        return {"count": len(items), "next_cursor": next_cursor}
+
+    @app.get("/ping")
+    async def ping():
+        return {}
+
+    app.state.engine = engine
+    return app
+
+
+def percentile(samples, q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+async def run_load(app: FastAPI, requests: int, concurrency: int, cursors) -> dict:
+    # Erreur dans l'application (attente du pool expirée...) : comptée comme réponse 500
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        queue = list(range(requests))
+        latencies, pings, errors = [], [], []
+        done = asyncio.Event()
+
+        async def worker():
+            while queue:
+                queue.pop()
+                user_id = random.randint(1, USERS)
+                start = time.perf_counter()
+                response = await client.get(f"/history/{user_id}",
+                                            params={"cursor": random.choice(cursors)})
+                if response.status_code != 200:
+                    errors.append(response.status_code)
+                    continue
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        async def pinger():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/ping")
+                pings.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(PING_INTERVAL_S)
+
+        ping_task = asyncio.create_task(pinger())
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+        done.set()
+        await ping_task
+
+    return {
+        "rps": len(latencies) / elapsed,
+        "errors": len(errors),
+        "p50": statistics.median(latencies) if latencies else float("nan"),
+        "p95": percentile(latencies, 0.95) if latencies else float("nan"),
+        "ping_p50": statistics.median(pings),
+        "ping_p95": percentile(pings, 0.95),
+    }
+
+
+async def measure(app: FastAPI, requests: int, concurrency: int, cursors) -> dict:
+    """Chauffe (connexions du pool, caches SQLite), mesure, puis ferme le pool"""
+    await run_load(app, min(200, requests), concurrency, cursors)
+    result = await run_load(app, requests, concurrency, cursors)
+    engine = app.state.engine
+    if isinstance(engine, AsyncEngine):
+        await engine.dispose()
+    else:
+        engine.dispose()
+    return result
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    rows_per_user = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_async.db')}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as session:
+        populate(session, rows_per_user)
+    engine.dispose()
+
+    # Curseurs à différentes profondeurs (None : première page)
+    start = datetime(2024, 1, 1)
+    cursors = [None] + [
+        encode_cursor(start + timedelta(minutes=depth), 10 ** 9)
+        for depth in range(PAGE_SIZE, rows_per_user, max(1, rows_per_user // 20))
+    ]
+
+    print("=" * 60)
+    print(f"⏱️  BENCHMARK SESSION SYNCHRONE / ASYNCHRONE ({requests} requêtes, "
+          f"concurrence {concurrency})")
+    print("=" * 60)
+    print(f"   pool : {database.DB_POOL_SIZE} connexions (+{database.DB_MAX_OVERFLOW}), "
+          f"{USERS} utilisateurs x {rows_per_user} designs")
+
+    results = {}
+    for label, factory in (("avant (Session)", sync_app), ("après (AsyncSession)", async_app)):
+        if factory is sync_app and concurrency > OLD_POOL_CAPACITY:
+            print(f"\n⚠️  {label} : concurrence > {OLD_POOL_CAPACITY} connexions, la boucle se bloque "
+                  f"sur le pool (voir l'en-tête) ; mesure ignorée")
+            continue
+        results[label] = asyncio.run(measure(factory(url), requests, concurrency, cursors))
+
+    print(f"\n{'':<22} | {'req/s':>7} | {'erreurs':>7} | {'p50 ms':>7} | {'p95 ms':>7} | "
+          f"{'ping p50':>8} | {'ping p95':>8}")
+    print("-" * 84)
+    for label, r in results.items():
+        print(f"{label:<22} | {r['rps']:>7.0f} | {r['errors']:>7} | {r['p50']:>7.1f} | {r['p95']:>7.1f} | "
+              f"{r['ping_p50']:>8.1f} | {r['ping_p95']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
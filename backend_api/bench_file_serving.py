@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark de l'envoi des images : octets transférés au premier chargement,
+aux chargements suivants (revalidation ETag -> 304) et en reprise (Range)
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from file_serving import CachedStaticFiles, cached_file_response
+from storage import LocalStorage
+
+
+def make_photo(seed: int, width: int = 1600, height: int = 1200) -> bytes:
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 256, size=(height // 8, width // 8, 3), dtype=np.uint8)
+    img = Image.fromarray(pixels).resize((width, height), Image.Resampling.BILINEAR)
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def build_app(root: str, paths: list) -> FastAPI:
+    app = FastAPI()
+    app.mount("/static", CachedStaticFiles(directory=os.path.join(root, "uploads")), name="static")
+
+    @app.get("/download/{index}")
+    def download(index: int, request: Request):
+        return cached_file_response(request, os.path.join(root, paths[index]), media_type="image/jpeg")
+
+    return app
+
+
+def run(client: TestClient, urls: list, etags: dict = None, sizes: dict = None, range_from: float = 0.0):
+    """Charge toutes les URLs ; renvoie (octets reçus, ms, statuts, etags, tailles)"""
+    received = 0
+    statuses = {}
+    seen = {}
+    lengths = {}
+    start = time.perf_counter()
+    for url in urls:
+        headers = {}
+        if etags:
+            headers["If-None-Match"] = etags[url]
+        if range_from:
+            headers["Range"] = f"bytes={int(sizes[url] * range_from)}-"
+        response = client.get(url, headers=headers)
+        received += len(response.content)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        seen[url] = response.headers.get("etag")
+        lengths[url] = len(response.content)
+    return received, (time.perf_counter() - start) * 1000, statuses, seen, lengths
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    root = tempfile.mkdtemp()
+    storage = LocalStorage(root=root)
+
+    paths = []
+    for i in range(count):
+        source = os.path.join(root, f"photo_{i}.jpg")
+        with open(source, "wb") as f:
+            f.write(make_photo(i))
+        paths.append(storage.ingest_file(source).path)
+
+    client = TestClient(build_app(root, paths))
+    urls = [f"/download/{i}" for i in range(count)]
+    urls += ["/static/" + path.split("/", 1)[1] for path in paths]
+
+    print("=" * 60)
+    print(f"⏱️  BENCHMARK DE L'ENVOI DES IMAGES ({len(urls)} requêtes)")
+    print("=" * 60)
+
+    full_bytes, full_ms, statuses, etags, sizes = run(client, urls)
+    print(f"\n📥 Premier chargement   : {full_bytes / 1024:9.1f} KB  {full_ms:7.1f} ms  {statuses}")
+
+    repeat_bytes, repeat_ms, statuses, _, _ = run(client, urls, etags=etags)
+    print(f"🔁 Rechargement (ETag)  : {repeat_bytes / 1024:9.1f} KB  {repeat_ms:7.1f} ms  {statuses}")
+
+    resume_bytes, resume_ms, statuses, _, _ = run(client, urls, sizes=sizes, range_from=0.5)
+    print(f"⏯️  Reprise à 50% (Range): {resume_bytes / 1024:9.1f} KB  {resume_ms:7.1f} ms  {statuses}")
+
+    print(f"\n💾 Octets économisés au rechargement : {(full_bytes - repeat_bytes) / 1024:.1f} KB "
+          f"({100 * (1 - repeat_bytes / full_bytes):.1f}%)")
+    print(f"💾 Octets économisés en reprise      : {(full_bytes - resume_bytes) / 1024:.1f} KB "
+          f"({100 * (1 - resume_bytes / full_bytes):.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la pagination de l'historique : offset/limit contre curseur (keyset)
+
+Base SQLite temporaire, 100k+ designs pour un utilisateur (et d'autres utilisateurs
+autour) ; temps d'une page à différentes profondeurs. Avec le curseur, le coût d'une
+page reste celui de `limit` lignes ; avec offset, il croît avec la profondeur.
+
+Usage:
+    python bench_history_pagination.py [designs_par_utilisateur] [limit]
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, DesignHistory
+from pagination import encode_cursor, history_page, history_query
+
+OTHER_USERS = 4
+REPEATS = 7
+
+
+def populate(session, rows_per_user: int):
+    """Designs créés toutes les minutes environ ; quelques horodatages identiques (départage par id)"""
+    start = datetime(2024, 1, 1)
+    table = DesignHistory.__table__
+    for user_id in range(1, OTHER_USERS + 2):
+        count = rows_per_user if user_id == 1 else rows_per_user // 5
+        batch = []
+        for i in range(count):
+            batch.append({
+                "user_id": user_id,
+                "original_image_path": f"uploads/objects/{user_id}/{i}_o.jpg",
+                "generated_image_path": f"uploads/objects/{user_id}/{i}_g.jpg",
+                "style": "modern",
+                "room_type": "bedroom",
+                "is_favorite": i % 10 == 0,
+                "created_at": start + timedelta(minutes=i - i % 3),
+            })
+            if len(batch) >= 20000:
+                session.execute(table.insert(), batch)
+                batch = []
+        if batch:
+            session.execute(table.insert(), batch)
+    session.commit()
+
+
+def timed(fn) -> float:
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def offset_page(session, offset: int, limit: int):
+    return history_query(session, 1).order_by(
+        DesignHistory.created_at.desc(),
+        DesignHistory.id.desc()
+    ).offset(offset).limit(limit).all()
+
+
+def main():
+    rows_per_user = int(sys.argv[1]) if len(sys.argv) > 1 else 120_000
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    db_path = os.path.join(tempfile.mkdtemp(), "bench_history.db")
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    print("=" * 60)
+    print(f"⏱️  BENCHMARK PAGINATION DE L'HISTORIQUE ({rows_per_user} designs, limit={limit})")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    populate(session, rows_per_user)
+    print(f"\n📦 Base remplie en {time.perf_counter() - start:.1f} s")
+
+    depths = [0, 1_000, 10_000, 50_000, rows_per_user - limit]
+    print(f"\n{'profondeur':>10} | {'offset (ms)':>11} | {'curseur (ms)':>12} | identiques")
+    print("-" * 52)
+    for depth in depths:
+        # Curseur de la ligne qui précède la page (calculé hors mesure)
+        cursor = None
+        if depth:
+            previous = offset_page(session, depth - 1, 1)[0]
+            cursor = encode_cursor(previous.created_at, previous.id)
+
+        by_offset = [row.id for row in offset_page(session, depth, limit)]
+        by_cursor = [row.id for row in history_page(session, 1, limit, cursor)[0]]
+        session.expunge_all()
+
+        offset_ms = timed(lambda: offset_page(session, depth, limit))
+        cursor_ms = timed(lambda: history_page(session, 1, limit, cursor))
+        print(f"{depth:>10} | {offset_ms:>11.2f} | {cursor_ms:>12.2f} | {by_offset == by_cursor}")
+
+    # Plan d'exécution de la requête par curseur : recherche dans l'index composite
+    created_at, design_id = datetime(2024, 3, 1), 1
+    plan = session.execute(text(
+        "EXPLAIN QUERY PLAN SELECT * FROM design_history WHERE user_id = 1 "
+        "AND (created_at, id) < (:created_at, :id) ORDER BY created_at DESC, id DESC LIMIT :limit"
+    ), {"created_at": created_at, "id": design_id, "limit": limit + 1}).fetchall()
+    print("\n🔎 Plan (curseur) :")
+    for row in plan:
+        print(f"   {row[-1]}")
+
+    # Parcours complet page par page
+    start = time.perf_counter()
+    cursor, pages, seen = None, 0, 0
+    while True:
+        items, cursor = history_page(session, 1, limit, cursor)
+        pages += 1
+        seen += len(items)
+        session.expunge_all()
+        if cursor is None:
+            break
+    print(f"\n📜 Parcours complet : {pages} pages, {seen} designs, "
+          f"{(time.perf_counter() - start) * 1000 / pages:.2f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark de l'inférence Keras : model.predict() vs tf.function compilée (et XLA en option)
+Usage : python bench_inference.py [iterations] [--xla]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+from inference.backends import KerasBackend, model_filename
+
+MODEL_PATH = os.path.join("model", model_filename("keras"))
+IMG_SIZE = 224
+
+
+def bench(backend, batch_size: int, iterations: int) -> float:
+    batch = np.random.default_rng(0).uniform(0, 255, (batch_size, IMG_SIZE, IMG_SIZE, 3)).astype(np.float32)
+    for _ in range(3):  # échauffement (traçage, allocations)
+        backend.predict(batch)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        backend.predict(batch)
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    iterations = int(args[0]) if args else 50
+    use_xla = "--xla" in sys.argv
+
+    if not os.path.exists(MODEL_PATH):
+        print(f"❌ Modèle introuvable: {MODEL_PATH} (lancer convert_model.py)")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("⏱️  BENCHMARK DE L'INFÉRENCE KERAS")
+    print("=" * 60)
+
+    variants = [
+        ("model.predict()", KerasBackend(MODEL_PATH, compiled=False)),
+        ("tf.function", KerasBackend(MODEL_PATH, compiled=True)),
+    ]
+    if use_xla:
+        variants.append(("tf.function + XLA", KerasBackend(MODEL_PATH, compiled=True, jit_compile=True)))
+
+    for batch_size in (1, 8):
+        print(f"\n📦 Lot de {batch_size} image(s), {iterations} itérations")
+        baseline = None
+        for label, backend in variants:
+            ms = bench(backend, batch_size, iterations)
+            baseline = baseline or ms
+            print(f"   {label:<20}: {ms:8.2f} ms/appel  (x{baseline / ms:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark du prétraitement : ancien pipeline vs ImagePreprocessor (draft JPEG)
+
+Affiche aussi la parité : écart en niveaux de gris (0-255) entre les pixels vus par le
+modèle et ceux de l'ancien pipeline (celui de l'entraînement).
+"""
+
+import io
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from inference.preprocessing import ImagePreprocessor
+
+IMG_SIZE = 224
+
+
+def legacy_preprocess(image_bytes: bytes):
+    """Ancienne version de main.preprocess_image (décodage complet)"""
+    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    img = img.resize((IMG_SIZE, IMG_SIZE))
+    arr = np.array(img).astype(np.float32) / 255.0
+    arr = np.expand_dims(arr, axis=0)
+    return arr
+
+
+def make_photo(width: int, height: int) -> bytes:
+    """Génère un JPEG de la taille d'une photo de téléphone"""
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    noise = rng.integers(0, 32, size=base.shape, dtype=np.uint8)
+    pixels = np.clip(base + noise, 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def parity(preprocessor: ImagePreprocessor, image_bytes: bytes):
+    """(écart moyen, écart max) avec l'ancien pipeline, en niveaux 0-255"""
+    reference = legacy_preprocess(image_bytes)[0]
+    sample = preprocessor.decode(image_bytes).astype(np.float32)
+    if not preprocessor.rescale:
+        sample /= 255.0
+    diff = np.abs(sample - reference) * 255
+    return float(diff.mean()), float(diff.max())
+
+
+def bench(fn, image_bytes: bytes, iterations: int) -> float:
+    fn(image_bytes)  # échauffement
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(image_bytes)
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    preprocessor = ImagePreprocessor(size=IMG_SIZE)
+
+    print("=" * 60)
+    print("⏱️  BENCHMARK DU PRÉTRAITEMENT")
+    print("=" * 60)
+
+    for width, height in [(1280, 960), (4032, 3024)]:
+        image_bytes = make_photo(width, height)
+        legacy_ms = bench(legacy_preprocess, image_bytes, iterations)
+        fast_ms = bench(preprocessor.decode, image_bytes, iterations)
+        print(f"\n📷 {width}x{height} ({len(image_bytes) / 1024 / 1024:.2f} MB)")
+        print(f"   Ancien pipeline : {legacy_ms:8.2f} ms/image")
+        print(f"   Nouveau         : {fast_ms:8.2f} ms/image")
+        print(f"   Gain            : x{legacy_ms / fast_ms:.1f}")
+        mean_diff, max_diff = parity(preprocessor, image_bytes)
+        print(f"   Parité          : écart moyen {mean_diff:.2f}, max {max_diff:.0f} (niveaux 0-255)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Benchmark du moteur de styles : latence par style et par taille, contrôle du déterminisme
+"""
+
+import hashlib
+import sys
+import time
+
+import numpy as np
+
+from style_engine import STYLES, StyleEngine
+
+
+def make_photo(width: int, height: int) -> np.ndarray:
+    """Image synthétique (dégradés + bruit) de la taille d'une photo"""
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    noise = rng.integers(0, 32, size=base.shape, dtype=np.uint8)
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    engine = StyleEngine()
+    styles = sorted({style.name: style for style in STYLES.values()}.items())
+
+    print("=" * 60)
+    print("⏱️  BENCHMARK DU MOTEUR DE STYLES")
+    print("=" * 60)
+
+    for width, height in [(1280, 960), (2048, 1536)]:
+        pixels = make_photo(width, height)
+        print(f"\n📷 {width}x{height}")
+        for name, style in styles:
+            first = engine.apply(pixels, style)
+            start = time.perf_counter()
+            for _ in range(iterations):
+                result = engine.apply(pixels, style)
+            elapsed_ms = (time.perf_counter() - start) * 1000 / iterations
+            estimate_ms = width * height * style.cost_ns_per_pixel() / 1e6
+            stable = "✅" if np.array_equal(first, result) else "❌"
+            digest = hashlib.sha256(result.tobytes()).hexdigest()[:12]
+            print(f"   {name:20s} {elapsed_ms:8.1f} ms (estimé {estimate_ms:7.1f}) {stable} {digest}")
+
+
+if __name__ == "__main__":
+    main()
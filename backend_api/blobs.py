@@ -0,0 +1,50 @@
+# backend_api/blobs.py - Références vers les images stockées par contenu
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import ImageBlob
+from storage import StoredFile, object_sha256
+
+
+def register(db: Session, stored: StoredFile):
+    """Enregistre un objet écrit par le stockage (sans référence : à acquérir ensuite)"""
+    if db.get(ImageBlob, stored.sha256) is not None:
+        # Ligne antérieure à storage.content_ext pour ces octets sous une autre extension :
+        # ce fichier reste sans ligne (ni compteur), récupéré quand plus rien ne le référence
+        return
+    db.add(ImageBlob(sha256=stored.sha256, path=stored.path, size=stored.size, ref_count=0))
+    try:
+        db.commit()
+    except IntegrityError:
+        # Même contenu enregistré en parallèle par une autre requête
+        db.rollback()
+
+
+def acquire(db: Session, path: Optional[str]) -> bool:
+    """+1 référence ; à committer avec la ligne qui référence l'image"""
+    sha256 = object_sha256(path)
+    if sha256 is None:
+        return False
+    # Par chemin : la ligne d'un même contenu sous une autre extension n'est pas celle de ce fichier
+    return db.query(ImageBlob).filter(ImageBlob.path == path).update({
+        "ref_count": ImageBlob.ref_count + 1,
+        "updated_at": datetime.utcnow()
+    }, synchronize_session=False) > 0
+
+
+def release(db: Session, path: Optional[str]) -> bool:
+    """-1 référence ; un objet sans référence est laissé au ramasse-miettes"""
+    sha256 = object_sha256(path)
+    if sha256 is None:
+        return False
+    return db.query(ImageBlob).filter(
+        ImageBlob.path == path,
+        ImageBlob.ref_count > 0
+    ).update({
+        "ref_count": ImageBlob.ref_count - 1,
+        "updated_at": datetime.utcnow()
+    }, synchronize_session=False) > 0
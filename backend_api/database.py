@@ -1,6 +1,9 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
 import os
 from dotenv import load_dotenv
 
@@ -8,13 +11,123 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./interior_design.db")
 
+# Connexions gardées ouvertes, connexions supplémentaires en pointe, attente d'une connexion libre
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT_S", "30"))
+DB_POOL_RECYCLE_S = int(os.getenv("DB_POOL_RECYCLE_S", "1800"))
+# SQLite : attente d'un verrou d'écriture avant "database is locked"
+SQLITE_BUSY_TIMEOUT_S = float(os.getenv("SQLITE_BUSY_TIMEOUT_S", "30"))
+
+# Pilotes asynchrones : même base, mêmes modèles, requêtes qui ne bloquent pas la boucle
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+
+def async_url(url: str) -> str:
+    """sqlite:///x.db -> sqlite+aiosqlite:///x.db, postgresql://... -> postgresql+asyncpg://..."""
+    scheme, sep, rest = url.partition("://")
+    driver = ASYNC_DRIVERS.get(scheme.split("+")[0])
+    return f"{driver}{sep}{rest}" if driver else url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", async_url(DATABASE_URL))
+# "false" : pas de pilote asynchrone (aiosqlite/asyncpg absent) ; les routes gardent le même
+# code, leurs requêtes passent par le moteur synchrone dans le pool de threads
+DB_ASYNC = os.getenv("DB_ASYNC", "true").lower() in ("1", "true", "yes")
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+
+def _engine_options(url: str) -> dict:
+    if not url.startswith("sqlite"):
+        # Connexions coupées par le serveur (redémarrage, pare-feu) détectées avant usage
+        return {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT_S,
+            "pool_recycle": DB_POOL_RECYCLE_S,
+            "pool_pre_ping": True,
+        }
+    options = {"connect_args": {"timeout": SQLITE_BUSY_TIMEOUT_S}}
+    in_memory = ":memory:" in url or url.split("://", 1)[1] in ("", "/")
+    if not in_memory:
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                       pool_timeout=DB_POOL_TIMEOUT_S)
+        if "+aiosqlite" in url:
+            # aiosqlite utilise NullPool par défaut : une connexion (et un thread) par session
+            options["poolclass"] = AsyncAdaptedQueuePool
+    return options
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL : les lectures continuent pendant une écriture (plusieurs connexions par processus)
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
 # Pour SQLite, ajouter check_same_thread=False
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-)
+sync_options = _engine_options(DATABASE_URL)
+if IS_SQLITE:
+    sync_options["connect_args"]["check_same_thread"] = False
+engine = create_engine(DATABASE_URL, **sync_options)
+
+# Moteur asynchrone : routes FastAPI (crud, routers) ; le moteur synchrone reste
+# celui des workers, du ramasse-miettes et des scripts
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL)) if DB_ASYNC else None
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _sqlite_pragmas)
+    if async_engine is not None:
+        event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Méthodes d'AsyncSession attendues (await) par les routes
+_AWAITED_METHODS = {"scalar", "scalars", "execute", "get", "commit", "rollback", "refresh",
+                    "delete", "flush", "merge", "close"}
+
+
+class ThreadedSession:
+    """DB_ASYNC=false : l'interface d'AsyncSession utilisée par les routes, au-dessus d'une
+    session synchrone dont chaque requête s'exécute dans le pool de threads"""
+
+    def __init__(self, sync_session: Session):
+        self.sync_session = sync_session
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    def __getattr__(self, name):
+        attr = getattr(self.sync_session, name)
+        if name not in _AWAITED_METHODS:
+            return attr
+
+        async def call(*args, **kwargs):
+            return await run_in_threadpool(attr, *args, **kwargs)
+        return call
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await run_in_threadpool(self.sync_session.close)
+
+
+# expire_on_commit=False : les objets restent lisibles après commit sans rechargement implicite
+if async_engine is not None:
+    AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession,
+                                           autoflush=False, expire_on_commit=False)
+else:
+    _threaded_sessions = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    def AsyncSessionLocal() -> ThreadedSession:
+        return ThreadedSession(_threaded_sessions())
+
 Base = declarative_base()
 
 def get_db():
@@ -22,4 +135,8 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,185 @@
+# backend_api/derivatives.py - Miniatures et tailles intermédiaires des images de l'historique
+
+import hashlib
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from PIL import Image, ImageOps, features
+
+from storage import STORAGE_ROOT, object_sha256
+
+# Côté le plus long de chaque taille ("original" = le fichier enregistré, sans dérivé)
+DERIVATIVE_SIZES = {
+    "thumb": int(os.getenv("DERIVATIVE_THUMB_PX", "256")),
+    "medium": int(os.getenv("DERIVATIVE_MEDIUM_PX", "1024")),
+    "full": int(os.getenv("DERIVATIVE_FULL_PX", "2048")),
+}
+# Tailles servies : les dérivés plus le fichier enregistré
+IMAGE_SIZES = list(DERIVATIVE_SIZES) + ["original"]
+DERIVATIVE_DIR = os.getenv("DERIVATIVE_DIR", "uploads/derivatives")
+# Dérivés des fichiers hérités (clé = hash du chemin) : rangés à part, ils changent avec leur source
+LEGACY_SUBDIR = "legacy"
+DERIVATIVE_WORKERS = int(os.getenv("DERIVATIVE_WORKERS", "2"))
+DERIVATIVE_QUALITY = int(os.getenv("DERIVATIVE_QUALITY", "80"))
+# WebP si Pillow le supporte, sinon JPEG progressif
+DERIVATIVE_FORMAT = os.getenv("DERIVATIVE_FORMAT", "webp" if features.check("webp") else "jpeg")
+
+_EXTENSIONS = {"webp": ".webp", "jpeg": ".jpg"}
+MEDIA_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+
+def source_key(source_path: str) -> str:
+    """Hash du contenu pour un objet, hash du chemin pour un fichier hérité"""
+    return object_sha256(source_path) or hashlib.sha256(source_path.encode()).hexdigest()
+
+
+class DerivativeGenerator:
+    """Produit les dérivés d'une image dans un pool dédié
+
+    Le dérivé d'un objet ne change jamais (clé = hash du contenu). Celui d'un fichier hérité
+    (clé = hash du chemin, fichier réécrivable) est régénéré s'il est plus ancien que sa source.
+    """
+
+    def __init__(
+        self,
+        sizes: Dict[str, int] = DERIVATIVE_SIZES,
+        root: str = STORAGE_ROOT,
+        directory: str = DERIVATIVE_DIR,
+        image_format: str = DERIVATIVE_FORMAT,
+        quality: int = DERIVATIVE_QUALITY,
+        workers: int = DERIVATIVE_WORKERS,
+    ):
+        self.sizes = sizes
+        self.root = root
+        self.directory = directory
+        self.format = image_format
+        self.quality = quality
+        self.media_type = MEDIA_TYPES[image_format]
+        self.workers = max(1, int(workers))
+
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+        self.generated = 0
+        self.on_demand = 0
+        self.failed = 0
+
+    def path_for(self, source_path: str, size: str) -> str:
+        key = source_key(source_path)
+        directory = self.directory if object_sha256(source_path) else f"{self.directory}/{LEGACY_SUBDIR}"
+        return f"{directory}/{key[:2]}/{key[2:4]}/{key}_{size}{_EXTENSIONS[self.format]}"
+
+    def full_path(self, path: str) -> str:
+        """Fichier réel d'un chemin enregistré (relatif à STORAGE_ROOT)"""
+        return os.path.join(self.root, path)
+
+    def _source_file(self, source_path: str) -> str:
+        return self.full_path(source_path.replace("\\", "/"))
+
+    def _is_current(self, source_path: str, path: str) -> bool:
+        """Dérivé présent, et pas plus ancien que sa source si elle est héritée"""
+        try:
+            generated_at = os.stat(self.full_path(path)).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if object_sha256(source_path):
+            return True
+        try:
+            return generated_at >= os.stat(self._source_file(source_path)).st_mtime_ns
+        except FileNotFoundError:
+            return True
+
+    def _missing(self, source_path: str):
+        return [size for size in self.sizes
+                if not self._is_current(source_path, self.path_for(source_path, size))]
+
+    def _save(self, img: Image.Image, path: str):
+        full_path = self.full_path(path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        tmp_path = f"{full_path}.{uuid.uuid4().hex}.tmp"
+        if self.format == "webp":
+            img.save(tmp_path, format="WEBP", quality=self.quality, method=4)
+        else:
+            img.save(tmp_path, format="JPEG", quality=self.quality, optimize=True, progressive=True)
+        os.replace(tmp_path, full_path)
+
+    def generate(self, source_path: str):
+        """Toutes les tailles manquantes à partir d'un seul décodage, de la plus grande à la plus petite"""
+        missing = self._missing(source_path)
+        if not missing:
+            return
+        largest = max(self.sizes[size] for size in missing)
+        with Image.open(self._source_file(source_path)) as img:
+            # JPEG : décodage directement à une échelle réduite
+            img.draft("RGB", (largest, largest))
+            img = ImageOps.exif_transpose(img).convert("RGB")
+
+        for size in sorted(missing, key=lambda s: -self.sizes[s]):
+            img.thumbnail((self.sizes[size], self.sizes[size]), Image.Resampling.LANCZOS, reducing_gap=2.0)
+            self._save(img, self.path_for(source_path, size))
+        with self._lock:
+            self.generated += 1
+
+    def _run(self, source_path: str):
+        try:
+            self.generate(source_path)
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            print(f"❌ Dérivés de {source_path}: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.pop(source_key(source_path), None)
+
+    def submit(self, *source_paths: Optional[str]):
+        """Génère en arrière-plan les dérivés des images qui viennent d'être enregistrées"""
+        for source_path in source_paths:
+            if not source_path:
+                continue
+            key = source_key(source_path)
+            with self._lock:
+                if key in self._in_flight:
+                    continue
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix="derivatives")
+                self._in_flight[key] = self._pool.submit(self._run, source_path)
+
+    def ensure(self, source_path: str, size: str) -> str:
+        """Chemin du dérivé, généré sur place s'il manque (images antérieures au pipeline) ; bloquant"""
+        path = self.path_for(source_path, size)
+        if self._is_current(source_path, path):
+            return path
+        with self._lock:
+            pending = self._in_flight.get(source_key(source_path))
+        if pending is not None:
+            pending.result()
+        if not self._is_current(source_path, path):
+            self.generate(source_path)
+            with self._lock:
+                self.on_demand += 1
+        return path
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "format": self.format,
+                "sizes": self.sizes,
+                "pending": len(self._in_flight),
+                "generated": self.generated,
+                "on_demand": self.on_demand,
+                "failed": self.failed,
+            }
+
+
+generator = DerivativeGenerator()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Statistiques des designs de chaque utilisateur, tenues à jour à chaque modification
+
+Une ligne par compteur : (user_id, "total", ""), (user_id, "favorites", ""),
+(user_id, "style", <style>), (user_id, "room_type", <pièce>). Les compteurs sont
+modifiés dans la transaction qui crée, supprime ou (dé)marque le design ; lire les
+statistiques d'un utilisateur est une seule requête sur la clé primaire.
+
+Reconstruction / vérification à partir de design_history :
+    python design_stats.py [--verify] [--user ID]
+"""
+
+import argparse
+import sys
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import database
+import models
+from models import DesignHistory, UserDesignStat
+
+TOTAL = "total"
+FAVORITES = "favorites"
+STYLE = "style"
+ROOM_TYPE = "room_type"
+
+
+def _bump(db: Session, user_id: int, dimension: str, value: Optional[str], delta: int):
+    """Incrément atomique ; la ligne est créée au premier design (non committé)"""
+    if value is None or delta == 0:
+        return
+    key = (UserDesignStat.user_id == user_id, UserDesignStat.dimension == dimension,
+           UserDesignStat.value == value)
+    if db.query(UserDesignStat).filter(*key).update(
+        {"count": UserDesignStat.count + delta}, synchronize_session=False
+    ):
+        return
+    if delta < 0:
+        return
+    try:
+        with db.begin_nested():
+            db.add(UserDesignStat(user_id=user_id, dimension=dimension, value=value, count=delta))
+    except IntegrityError:
+        # Créée en parallèle par une autre requête
+        db.query(UserDesignStat).filter(*key).update(
+            {"count": UserDesignStat.count + delta}, synchronize_session=False
+        )
+
+
+def _design_counters(design: DesignHistory):
+    yield TOTAL, ""
+    if design.is_favorite:
+        yield FAVORITES, ""
+    yield STYLE, design.style
+    yield ROOM_TYPE, design.room_type
+
+
+def record_design(db: Session, design: DesignHistory):
+    """Nouveau design : à committer avec la ligne design_history"""
+    for dimension, value in _design_counters(design):
+        _bump(db, design.user_id, dimension, value, 1)
+
+
+def forget_design(db: Session, design: DesignHistory):
+    """Design supprimé : à committer avec la suppression"""
+    for dimension, value in _design_counters(design):
+        _bump(db, design.user_id, dimension, value, -1)
+
+
+def record_favorite(db: Session, user_id: int, delta: int):
+    _bump(db, user_id, FAVORITES, "", delta)
+
+
+def _counters(db: Session, user_id: int) -> Dict[Tuple[str, str], int]:
+    return {
+        (row.dimension, row.value): row.count
+        for row in db.query(UserDesignStat).filter(UserDesignStat.user_id == user_id)
+    }
+
+
+def total_designs(db: Session, user_id: int) -> int:
+    stat = db.get(UserDesignStat, (user_id, TOTAL, ""))
+    return stat.count if stat else 0
+
+
+def _summary(counters: Dict[Tuple[str, str], int]) -> dict:
+    def distribution(dimension: str, label: str):
+        return [
+            {label: value, "count": count}
+            for (kind, value), count in sorted(counters.items())
+            if kind == dimension and count > 0
+        ]
+
+    return {
+        "total_designs": counters.get((TOTAL, ""), 0),
+        "total_favorites": counters.get((FAVORITES, ""), 0),
+        "style_distribution": distribution(STYLE, "style"),
+        "room_distribution": distribution(ROOM_TYPE, "room_type"),
+    }
+
+
+def summary(db: Session, user_id: int) -> dict:
+    """Réponse de /history/stats/summary à partir des compteurs"""
+    return _summary(_counters(db, user_id))
+
+
+def compute(db: Session, user_id: int) -> Dict[Tuple[str, str], int]:
+    """Compteurs recalculés depuis design_history (référence pour la vérification)"""
+    counters = Counter()
+    for design in db.query(DesignHistory).filter(DesignHistory.user_id == user_id):
+        for dimension, value in _design_counters(design):
+            if value is not None:
+                counters[(dimension, value)] += 1
+    return dict(counters)
+
+
+def rebuild(db: Session, user_id: int):
+    db.query(UserDesignStat).filter(UserDesignStat.user_id == user_id).delete(synchronize_session=False)
+    for (dimension, value), count in compute(db, user_id).items():
+        db.add(UserDesignStat(user_id=user_id, dimension=dimension, value=value, count=count))
+    db.commit()
+
+
+def verify(db: Session, user_id: int) -> Dict[Tuple[str, str], Tuple[int, int]]:
+    """Écarts {compteur: (enregistré, attendu)} ; vide si tout est juste"""
+    stored = {key: count for key, count in _counters(db, user_id).items() if count}
+    expected = compute(db, user_id)
+    return {
+        key: (stored.get(key, 0), expected.get(key, 0))
+        for key in stored.keys() | expected.keys()
+        if stored.get(key, 0) != expected.get(key, 0)
+    }
+
+
+def _user_ids(db: Session):
+    ids = {user_id for (user_id,) in db.query(DesignHistory.user_id).distinct()}
+    ids |= {user_id for (user_id,) in db.query(UserDesignStat.user_id).distinct()}
+    return sorted(ids)
+
+
+def initialize(db: Session) -> int:
+    """Premier démarrage avec la table vide : compteurs construits depuis l'historique existant"""
+    if db.query(UserDesignStat).first() is not None:
+        return 0
+    user_ids = _user_ids(db)
+    for user_id in user_ids:
+        rebuild(db, user_id)
+    return len(user_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruction des statistiques des designs")
+    parser.add_argument("--verify", action="store_true",
+                        help="Compare seulement les compteurs à design_history (code 1 si écart)")
+    parser.add_argument("--user", type=int, help="Un seul utilisateur")
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+
+    print("=" * 60)
+    print("📊 STATISTIQUES DES DESIGNS" + (" (vérification)" if args.verify else ""))
+    print("=" * 60)
+
+    mismatches = 0
+    try:
+        for user_id in [args.user] if args.user else _user_ids(db):
+            diff = verify(db, user_id)
+            if diff:
+                mismatches += 1
+                print(f"⚠️  Utilisateur {user_id}:")
+                for (dimension, value), (stored, expected) in sorted(diff.items()):
+                    print(f"     {dimension}{'=' + value if value else ''}: {stored} -> {expected}")
+            if not args.verify and diff:
+                rebuild(db, user_id)
+    finally:
+        db.close()
+
+    if args.verify:
+        print(f"\n{'✅ Compteurs exacts' if not mismatches else f'❌ {mismatches} utilisateur(s) en écart'}")
+        sys.exit(1 if mismatches else 0)
+    print(f"\n✅ {mismatches} utilisateur(s) reconstruit(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# backend_api/file_serving.py - Envoi des images : ETag, 304, Range, politique de cache
+
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate
+from typing import Optional, Sequence
+
+from fastapi import Request
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from derivatives import DERIVATIVE_DIR, LEGACY_SUBDIR
+from storage import STORAGE_OBJECTS_DIR, file_sha256, object_sha256
+
+# Objets et dérivés ne changent jamais : cache long côté client
+IMMUTABLE_CACHE_CONTROL = os.getenv("IMMUTABLE_CACHE_CONTROL", "private, max-age=31536000, immutable")
+# Fichiers hérités (nommés par date, réécrivables) et leurs dérivés : revalidation à chaque usage,
+# 304 si inchangé
+MUTABLE_CACHE_CONTROL = os.getenv("MUTABLE_CACHE_CONTROL", "private, no-cache")
+ETAG_CACHE_ENTRIES = int(os.getenv("ETAG_CACHE_ENTRIES", "4096"))
+
+# Absent de la table de certaines installations Python
+mimetypes.add_type("image/webp", ".webp")
+
+_etags: OrderedDict = OrderedDict()
+_etags_lock = threading.Lock()
+
+
+def media_type_for(path: str) -> str:
+    """Type d'une image enregistrée d'après son extension (JPEG ou WebP selon INGEST_FORMAT)"""
+    return mimetypes.guess_type(path)[0] or "image/jpeg"
+
+
+def is_content_derivative(path: str) -> bool:
+    """Dérivé d'un objet (clé = hash du contenu), pas d'un fichier hérité"""
+    return path.startswith(f"{DERIVATIVE_DIR}/") and not path.startswith(f"{DERIVATIVE_DIR}/{LEGACY_SUBDIR}/")
+
+
+def is_immutable(path: str) -> bool:
+    path = path.replace("\\", "/")
+    return path.startswith(f"{STORAGE_OBJECTS_DIR}/") or is_content_derivative(path)
+
+
+def weak_etag(stat_result: os.stat_result) -> str:
+    """ETag faible (date de modification, taille) : aucun octet lu"""
+    return f'W/"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def strong_etag(path: str, stat_result: os.stat_result, file_path: Optional[str] = None) -> str:
+    """ETag fort dérivé du contenu : hash de l'objet, nom du dérivé d'un objet, sinon hash du fichier (mis en cache)"""
+    file_path = file_path or path
+    path = path.replace("\\", "/")
+    sha256 = object_sha256(path)
+    if sha256 is not None:
+        return f'"{sha256}"'
+    if is_content_derivative(path):
+        return f'"{os.path.basename(path)}"'
+
+    version = (file_path, stat_result.st_mtime_ns, stat_result.st_size)
+    with _etags_lock:
+        etag = _etags.get(version)
+        if etag is not None:
+            _etags.move_to_end(version)
+            return etag
+    etag = f'"{file_sha256(file_path)}"'
+    with _etags_lock:
+        _etags[version] = etag
+        while len(_etags) > ETAG_CACHE_ENTRIES:
+            _etags.popitem(last=False)
+    return etag
+
+
+def cache_headers(path: str, stat_result: os.stat_result, file_path: Optional[str] = None,
+                  hash_content: bool = True) -> dict:
+    """path : chemin relatif (décide de la politique) ; file_path : fichier réel si différent
+
+    hash_content=False : ETag faible pour un fichier hérité plutôt que de hasher son contenu
+    (appel depuis la boucle d'événements) ; objets et dérivés gardent leur ETag fort, gratuit.
+    """
+    if hash_content or is_immutable(path):
+        etag = strong_etag(path, stat_result, file_path)
+    else:
+        etag = weak_etag(stat_result)
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if is_immutable(path) else MUTABLE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+
+def is_not_modified(response_headers, request_headers) -> bool:
+    """If-None-Match prioritaire sur If-Modified-Since (RFC 9110, comparaison faible)"""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        etag = response_headers["etag"].removeprefix("W/")
+        return etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    since = parsedate(if_modified_since)
+    last_modified = parsedate(response_headers["last-modified"])
+    return since is not None and last_modified is not None and since >= last_modified
+
+
+def cached_file_response(
+    request: Request,
+    path: str,
+    media_type: Optional[str] = None,
+    filename: Optional[str] = None,
+    file_path: Optional[str] = None,
+) -> Response:
+    """FileResponse avec ETag fort, 304 et Range (Starlette gère Range / If-Range) ; bloquant (stat, hash)
+
+    path : chemin enregistré (décide de la politique de cache) ; file_path : fichier réel si différent
+    """
+    file_path = file_path or path
+    stat_result = os.stat(file_path)
+    headers = cache_headers(path, stat_result, file_path)
+    if is_not_modified(Headers(headers=headers), request.headers):
+        return NotModifiedResponse(Headers(headers=headers))
+    return FileResponse(file_path, media_type=media_type, filename=filename,
+                        headers=headers, stat_result=stat_result)
+
+
+class CachedStaticFiles(StaticFiles):
+    """/static avec la même politique : objets immuables en cache long
+
+    file_response est appelé sur la boucle d'événements : les fichiers hérités n'y sont pas
+    hashés (ETag faible d'après stat), seuls les objets et dérivés ont un ETag fort.
+
+    allowed_prefixes : sous-dossiers servis (relatifs au dossier monté), None pour tout servir
+    """
+
+    def __init__(self, *args, allowed_prefixes: Optional[Sequence[str]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.allowed_prefixes = [prefix.rstrip("/") + "/" for prefix in allowed_prefixes or []]
+        self.restricted = allowed_prefixes is not None
+
+    def _allowed(self, path: str) -> bool:
+        path = path.replace("\\", "/")
+        # Fichiers temporaires des objets (.tmp) : jamais servis
+        return not any(part.startswith(".") for part in path.split("/")) and \
+            any(path.startswith(prefix) for prefix in self.allowed_prefixes)
+
+    async def get_response(self, path: str, scope) -> Response:
+        # path est déjà normalisé par Starlette (plus de "..")
+        if self.restricted and not self._allowed(path):
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        relative = os.path.relpath(full_path, os.path.dirname(os.path.abspath(self.directory)))
+        headers = cache_headers(relative, stat_result, str(full_path), hash_content=False)
+        if is_not_modified(Headers(headers=headers), Headers(scope=scope)):
+            return NotModifiedResponse(Headers(headers=headers))
+        return FileResponse(full_path, status_code=status_code, headers=headers, stat_result=stat_result)
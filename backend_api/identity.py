@@ -0,0 +1,153 @@
+# backend_api/identity.py - Identité de l'appelant : tokens décodés et utilisateurs en cache
+#
+# Le token porte l'id immuable de l'utilisateur ("uid") : un appel authentifié ne coûte
+# ni décodage JWT ni requête users tant que les entrées du cache sont valides.
+#
+# Le cache est propre à chaque processus : invalidate() ne touche que le worker qui a traité
+# le changement de mot de passe. Sur les autres workers uvicorn, un token émis avant le
+# changement reste accepté tant que l'utilisateur y est en cache, IDENTITY_USER_TTL_S au plus.
+# Un token émis après (version de session plus récente) relit l'utilisateur en base.
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, NamedTuple, Optional
+
+# Nombre d'entrées (tokens, utilisateurs) et durée de vie d'un utilisateur en cache
+# (aussi le délai maximal de révocation des anciens tokens sur les autres workers)
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", "10000"))
+IDENTITY_USER_TTL_S = float(os.getenv("IDENTITY_USER_TTL_S", "10"))
+
+
+def session_version(user) -> str:
+    """Version de session stockée dans le token : change avec le mot de passe, pas avec un rehash"""
+    return f"p{user.password_version or 0}"
+
+
+def password_fingerprint(hashed_password: str) -> str:
+    """Ancienne version de session (empreinte du hash) des tokens émis avant password_version"""
+    return hashlib.sha256(hashed_password.encode()).hexdigest()[:16]
+
+
+class Identity(NamedTuple):
+    """Instantané de l'utilisateur (indépendant de toute session SQLAlchemy)"""
+    id: int
+    email: str
+    username: str
+    created_at: Optional[datetime]
+    session_version: str
+    password_fingerprint: str
+
+    @classmethod
+    def from_user(cls, user) -> "Identity":
+        return cls(user.id, user.email, user.username, user.created_at,
+                   session_version(user), password_fingerprint(user.hashed_password))
+
+    def accepts(self, sv: Optional[str]) -> bool:
+        """Token encore valide pour cette version de session (sans sv : token antérieur aux versions)"""
+        if sv is None or sv == self.session_version:
+            return True
+        # Tokens émis avant password_version : valides jusqu'à leur expiration si le hash n'a pas changé
+        return not sv.startswith("p") and sv == self.password_fingerprint
+
+
+class IdentityCache:
+    """LRU bornés : token -> revendications (jusqu'à l'expiration du token), id -> Identity (TTL)"""
+
+    def __init__(self, max_entries: int = IDENTITY_CACHE_SIZE, user_ttl_s: float = IDENTITY_USER_TTL_S):
+        self.max_entries = max(1, int(max_entries))
+        self.user_ttl_s = user_ttl_s
+        self._tokens: OrderedDict = OrderedDict()
+        self._users: OrderedDict = OrderedDict()
+        self._emails = {}
+        self._lock = threading.Lock()
+
+        self.token_hits = 0
+        self.token_misses = 0
+        self.user_hits = 0
+        self.user_misses = 0
+        self.invalidations = 0
+
+    def _evict(self, entries: OrderedDict):
+        while len(entries) > self.max_entries:
+            key, value = entries.popitem(last=False)
+            if entries is self._users:
+                self._emails.pop(value[0].email, None)
+
+    def claims(self, token: str, decode: Callable[[str], dict]) -> dict:
+        """Revendications du token ; decode (vérification de la signature) au premier usage seulement"""
+        now = time.time()
+        with self._lock:
+            entry = self._tokens.get(token)
+            if entry is not None and entry[1] > now:
+                self._tokens.move_to_end(token)
+                self.token_hits += 1
+                return entry[0]
+            self.token_misses += 1
+
+        claims = decode(token)
+        expires_at = claims.get("exp")
+        expires_at = float(expires_at) if expires_at is not None else now + self.user_ttl_s
+        with self._lock:
+            self._tokens[token] = (claims, expires_at)
+            self._evict(self._tokens)
+        return claims
+
+    def _get(self, user_id: Optional[int]) -> Optional[Identity]:
+        entry = self._users.get(user_id)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            del self._users[user_id]
+            self._emails.pop(entry[0].email, None)
+            return None
+        self._users.move_to_end(user_id)
+        return entry[0]
+
+    def user(self, user_id: Optional[int] = None, email: Optional[str] = None) -> Optional[Identity]:
+        """Utilisateur par id (tokens récents) ou par email (tokens émis avant l'ajout de uid)"""
+        with self._lock:
+            if user_id is None:
+                user_id = self._emails.get(email)
+            identity = self._get(user_id)
+            if identity is None:
+                self.user_misses += 1
+            else:
+                self.user_hits += 1
+            return identity
+
+    def put(self, identity: Identity) -> Identity:
+        with self._lock:
+            self._users[identity.id] = (identity, time.time() + self.user_ttl_s)
+            self._users.move_to_end(identity.id)
+            self._emails[identity.email] = identity.id
+            self._evict(self._users)
+        return identity
+
+    def invalidate(self, user_id: int):
+        """Après un changement de mot de passe ou de profil : relu en base à la prochaine requête"""
+        with self._lock:
+            entry = self._users.pop(user_id, None)
+            if entry is not None:
+                self._emails.pop(entry[0].email, None)
+            for token in [t for t, (claims, _) in self._tokens.items() if claims.get("uid") == user_id]:
+                del self._tokens[token]
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            tokens = self.token_hits + self.token_misses
+            users = self.user_hits + self.user_misses
+            return {
+                "tokens": len(self._tokens),
+                "users": len(self._users),
+                "token_hit_rate": round(self.token_hits / tokens, 3) if tokens else None,
+                "user_hit_rate": round(self.user_hits / users, 3) if users else None,
+                "invalidations": self.invalidations,
+            }
+
+
+cache = IdentityCache()
@@ -0,0 +1,2 @@
+# Paquet partagé : room_classifier_api/inference ajoute ce dossier à son __path__
+# (backends, batching, cache, executor, preprocessing y sont importés tels quels)
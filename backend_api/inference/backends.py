@@ -0,0 +1,176 @@
+# backend_api/inference/backends.py
+
+import os
+import threading
+
+import numpy as np
+
+# Runtime de service : "keras" (TensorFlow complet), "tflite" ou "onnx" (sans importer tensorflow)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "keras").lower()
+# "" (float32), "float16" ou "int8" : choisit l'artefact produit par convert_model.py
+INFERENCE_QUANTIZATION = os.getenv("INFERENCE_QUANTIZATION", "").lower()
+# Threads intra-op / inter-op du runtime (0 = valeur par défaut du runtime)
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "0")) or None
+INFERENCE_INTER_OP_THREADS = int(os.getenv("INFERENCE_INTER_OP_THREADS", "0")) or None
+# Keras : appel direct d'une tf.function à signature fixe au lieu de model.predict(), XLA en option
+KERAS_COMPILED = os.getenv("KERAS_COMPILED", "true").lower() in ("1", "true", "yes")
+KERAS_XLA = os.getenv("KERAS_XLA", "false").lower() in ("1", "true", "yes")
+
+MODEL_BASENAME = "room_classifier"
+_EXTENSIONS = {"keras": ".keras", "tflite": ".tflite", "onnx": ".onnx"}
+
+
+def model_filename(backend: str, quantization: str = "") -> str:
+    """Nom de l'artefact, ex. room_classifier_int8.tflite"""
+    suffix = f"_{quantization}" if quantization else ""
+    return f"{MODEL_BASENAME}{suffix}{_EXTENSIONS[backend]}"
+
+
+class KerasBackend:
+    """Modèle Keras complet (importe tensorflow)"""
+
+    name = "keras"
+
+    def __init__(
+        self,
+        model_path: str,
+        compiled: bool = KERAS_COMPILED,
+        jit_compile: bool = KERAS_XLA,
+        intra_op_threads=INFERENCE_THREADS,
+        inter_op_threads=INFERENCE_INTER_OP_THREADS,
+    ):
+        import tensorflow as tf
+
+        self._tf = tf
+        # Doit être appelé avant la première opération TensorFlow du processus
+        try:
+            if intra_op_threads:
+                tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+            if inter_op_threads:
+                tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+        except RuntimeError as e:
+            print(f"⚠️  Threads TensorFlow non modifiés (runtime déjà initialisé): {e}")
+
+        self.model_path = model_path
+        self.model = tf.keras.models.load_model(model_path)
+        self.compiled = compiled
+
+        if compiled:
+            # Batch dynamique : un seul traçage quelle que soit la taille du lot
+            spec = tf.TensorSpec((None,) + tuple(self.model.input_shape[1:]), tf.float32)
+            self._forward = tf.function(
+                lambda x: self.model(x, training=False),
+                input_signature=[spec],
+                jit_compile=jit_compile,
+            )
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        if not self.compiled:
+            return self.model.predict(batch, verbose=0)
+        # Appel direct : pas d'adaptateur de données ni de step function par requête
+        tensor = self._tf.convert_to_tensor(batch, dtype=self._tf.float32)
+        return self._forward(tensor).numpy()
+
+
+class TFLiteBackend:
+    """Interpréteur TFLite (ai-edge-litert / tflite-runtime, tensorflow en dernier recours)"""
+
+    name = "tflite"
+
+    def __init__(self, model_path: str, num_threads=INFERENCE_THREADS):
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tflite_runtime.interpreter import Interpreter
+            except ImportError:
+                from tensorflow.lite import Interpreter
+
+        self.model_path = model_path
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        # L'interpréteur n'est pas thread-safe
+        self._lock = threading.Lock()
+
+    def _resize(self, shape: tuple):
+        if tuple(self._input["shape"]) == shape:
+            return
+        self.interpreter.resize_tensor_input(self._input["index"], shape)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            self._resize(batch.shape)
+
+            dtype = self._input["dtype"]
+            if dtype in (np.int8, np.uint8):
+                scale, zero_point = self._input["quantization"]
+                info = np.iinfo(dtype)
+                batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max)
+            self.interpreter.set_tensor(self._input["index"], batch.astype(dtype, copy=False))
+            self.interpreter.invoke()
+            preds = self.interpreter.get_tensor(self._output["index"])
+
+            if self._output["dtype"] in (np.int8, np.uint8):
+                scale, zero_point = self._output["quantization"]
+                preds = (preds.astype(np.float32) - zero_point) * scale
+            return np.array(preds, dtype=np.float32)
+
+
+class OnnxBackend:
+    """Session ONNX Runtime (CPU)"""
+
+    name = "onnx"
+
+    def __init__(self, model_path: str, num_threads=INFERENCE_THREADS):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        if INFERENCE_INTER_OP_THREADS:
+            options.inter_op_num_threads = INFERENCE_INTER_OP_THREADS
+        self.model_path = model_path
+        self.session = ort.InferenceSession(
+            model_path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        return self.session.run(None, {self._input_name: batch})[0]
+
+
+BACKENDS = {
+    "keras": KerasBackend,
+    "tflite": TFLiteBackend,
+    "onnx": OnnxBackend,
+}
+
+
+def model_path(
+    model_dir: str,
+    backend: str = INFERENCE_BACKEND,
+    quantization: str = INFERENCE_QUANTIZATION,
+) -> str:
+    """Chemin de l'artefact utilisé par le runtime configuré"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend d'inférence inconnu: {backend} (attendu: {', '.join(BACKENDS)})")
+    if backend == "keras":
+        quantization = ""
+    return os.path.join(model_dir, model_filename(backend, quantization))
+
+
+def load_backend(
+    model_dir: str,
+    backend: str = INFERENCE_BACKEND,
+    quantization: str = INFERENCE_QUANTIZATION,
+):
+    """Charge le modèle avec le runtime configuré"""
+    return BACKENDS[backend](model_path(model_dir, backend, quantization))
@@ -0,0 +1,156 @@
+# backend_api/inference/batching.py
+
+import asyncio
+import os
+import time
+from collections import Counter
+from concurrent.futures import Executor
+from typing import Callable, Optional
+
+import numpy as np
+
+# Taille maximale d'un lot et fenêtre d'attente (configurables par variables d'environnement)
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+
+
+class BatchScheduler:
+    """Regroupe les requêtes arrivant dans une même fenêtre et exécute une seule passe du modèle"""
+
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], np.ndarray],
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_wait_ms: float = BATCH_MAX_WAIT_MS,
+        executor: Optional[Executor] = None,
+        input_dtype=np.float32,
+        versioned: bool = False,
+    ):
+        # versioned : predict_fn renvoie (prédictions, version) et chaque résultat est
+        # (prédiction, version), la version du modèle qui a réellement traité le lot
+        self.predict_fn = predict_fn
+        self.versioned = versioned
+        self.executor = executor
+        self.input_dtype = input_dtype
+
+        # Tampon d'entrée réutilisé d'un lot à l'autre (un seul lot est en cours à la fois)
+        self._buffer: Optional[np.ndarray] = None
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Statistiques pour le réglage
+        self._batch_sizes = Counter()
+        self._total_items = 0
+        self._total_batches = 0
+        self._total_batch_time = 0.0
+        self._max_queue_depth = 0
+
+    def _ensure_started(self):
+        """Démarre la tâche de collecte sur la boucle courante si nécessaire"""
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, sample: np.ndarray) -> np.ndarray:
+        """Ajoute un échantillon (H, W, C) au prochain lot et attend sa prédiction"""
+        self._ensure_started()
+        future = self._loop.create_future()
+        self._queue.put_nowait((sample, future))
+        self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+        return await future
+
+    async def submit_many(self, samples: list) -> list:
+        """Ajoute plusieurs échantillons d'un coup : ils partent dans le même lot (ou les suivants)"""
+        if not samples:
+            return []
+        self._ensure_started()
+        futures = []
+        for sample in samples:
+            future = self._loop.create_future()
+            self._queue.put_nowait((sample, future))
+            futures.append(future)
+        self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+        return list(await asyncio.gather(*futures))
+
+    async def _collect(self) -> list:
+        """Attend le premier élément puis remplit le lot jusqu'à la taille ou au délai maximum"""
+        items = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait_ms / 1000.0
+
+        while len(items) < self.max_batch_size:
+            if not self._queue.empty():
+                items.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # Ignorer les clients qui ont abandonné entre-temps
+        return [(sample, future) for sample, future in items if not future.done()]
+
+    async def _run(self):
+        while True:
+            items = await self._collect()
+            if not items:
+                continue
+
+            batch = self._fill_buffer([sample for sample, _ in items])
+            start = time.perf_counter()
+            try:
+                # La passe du modèle ne doit pas bloquer la collecte du lot suivant
+                result = await self._loop.run_in_executor(self.executor, self.predict_fn, batch)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self._record(len(items), time.perf_counter() - start)
+            preds, version = result if self.versioned else (result, None)
+            for i, (_, future) in enumerate(items):
+                if not future.done():
+                    future.set_result((preds[i], version) if self.versioned else preds[i])
+
+    def _fill_buffer(self, samples: list) -> np.ndarray:
+        """Copie les échantillons (uint8 ou float32) dans le tampon préalloué"""
+        shape = samples[0].shape
+        if self._buffer is None or self._buffer.shape[1:] != shape:
+            self._buffer = np.empty((self.max_batch_size,) + shape, dtype=self.input_dtype)
+
+        batch = self._buffer[:len(samples)]
+        for i, sample in enumerate(samples):
+            np.copyto(batch[i], sample, casting="unsafe")
+        return batch
+
+    def _record(self, batch_size: int, elapsed: float):
+        self._batch_sizes[batch_size] += 1
+        self._total_items += batch_size
+        self._total_batches += 1
+        self._total_batch_time += elapsed
+
+    def stats(self) -> dict:
+        """Profondeur de file et distribution des tailles de lot"""
+        batches = self._total_batches
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": self._max_queue_depth,
+            "total_batches": batches,
+            "total_items": self._total_items,
+            "avg_batch_size": round(self._total_items / batches, 2) if batches else 0.0,
+            "avg_batch_latency_ms": round(self._total_batch_time * 1000 / batches, 2) if batches else 0.0,
+            "batch_size_histogram": {
+                str(size): count for size, count in sorted(self._batch_sizes.items())
+            },
+        }
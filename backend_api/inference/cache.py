@@ -0,0 +1,129 @@
+# backend_api/inference/cache.py
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Budget mémoire et durée de vie des prédictions en cache
+PREDICTION_CACHE_MAX_BYTES = int(os.getenv("PREDICTION_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+PREDICTION_CACHE_TTL_S = float(os.getenv("PREDICTION_CACHE_TTL_S", "3600"))
+
+# Surcoût approximatif d'une entrée (clé, tuple, objet ndarray)
+_ENTRY_OVERHEAD = 256
+
+
+def model_version(model_path: str) -> str:
+    """Identifiant du modèle chargé : change dès que le fichier ou ses métadonnées changent"""
+    digest = hashlib.sha256()
+    model_dir = os.path.dirname(model_path)
+    for path in (model_path, os.path.join(model_dir, "metadata.json")):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+class PredictionCache:
+    """Cache LRU + TTL des prédictions, indexé par le hash des octets envoyés et la version du modèle"""
+
+    def __init__(
+        self,
+        model_version: str = "",
+        max_bytes: int = PREDICTION_CACHE_MAX_BYTES,
+        ttl_s: float = PREDICTION_CACHE_TTL_S,
+    ):
+        self.model_version = model_version
+        self.max_bytes = max(0, int(max_bytes))
+        self.ttl_s = ttl_s
+
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def key_for(self, image_bytes: bytes) -> str:
+        return f"{self.model_version}:{hashlib.sha256(image_bytes).hexdigest()}"
+
+    def set_model_version(self, version: str):
+        """Vide le cache si le modèle a changé"""
+        with self._lock:
+            if version == self.model_version:
+                return
+            self.model_version = version
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        entry = self.get_with_version(key)
+        return entry[0] if entry is not None else None
+
+    def get_with_version(self, key: str) -> Optional[Tuple[np.ndarray, str]]:
+        """(prédictions, version du modèle qui les a calculées) ou None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, preds, size, version = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return preds, version
+
+    def put(self, key: str, preds: np.ndarray, version: str = ""):
+        size = preds.nbytes + len(key) + _ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            # Une clé calculée avant un changement de modèle ne doit pas être réinsérée
+            if not key.startswith(f"{self.model_version}:"):
+                return
+
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+
+            self._entries[key] = (time.monotonic() + self.ttl_s, preds, size, version)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "model_version": self.model_version,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,85 @@
+# backend_api/inference/cascade.py
+
+import os
+import threading
+import time
+from typing import Tuple
+
+import numpy as np
+
+# Cascade optionnelle : un petit modèle rapide répond quand il est assez confiant
+CASCADE_ENABLED = os.getenv("CASCADE_ENABLED", "false").lower() in ("1", "true", "yes")
+CASCADE_THRESHOLD = float(os.getenv("CASCADE_THRESHOLD", "0.9"))
+# Dossier du modèle rapide (mêmes noms d'artefacts que le modèle principal, même entrée 224x224)
+CASCADE_MODEL_DIR = os.getenv("CASCADE_MODEL_DIR", os.path.join("model", "cascade"))
+
+
+class CascadeModel:
+    """Deux étages : le modèle rapide d'abord, le modèle complet seulement pour les images incertaines"""
+
+    def __init__(self, fast, full, threshold: float = CASCADE_THRESHOLD):
+        self.fast = fast
+        self.full = full
+        self.threshold = threshold
+
+        self._lock = threading.Lock()
+        self._images = 0
+        self._fast_answers = 0
+        self._fallbacks = 0
+        self._fast_errors = 0
+        self._fast_time = 0.0
+        self._full_time = 0.0
+        self._fast_calls = 0
+        self._full_calls = 0
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.predict_with_version(batch)[0]
+
+    def predict_with_version(self, batch: np.ndarray) -> Tuple[np.ndarray, str]:
+        """Prédictions et version du modèle complet (celle qui a tranché les cas incertains)"""
+        start = time.perf_counter()
+        try:
+            preds = np.array(self.fast.predict(batch), dtype=np.float32)
+        except Exception as e:
+            # Le modèle rapide ne doit jamais faire échouer la requête
+            with self._lock:
+                if not self._fast_errors:
+                    print(f"⚠️  Cascade: modèle rapide indisponible ({e}), modèle complet utilisé")
+                self._fast_errors += 1
+            return self._predict_full(batch, len(batch))
+        fast_elapsed = time.perf_counter() - start
+
+        version = self.full.version
+        uncertain = preds.max(axis=1) < self.threshold
+        n_uncertain = int(uncertain.sum())
+        if n_uncertain:
+            preds[uncertain], version = self._predict_full(batch[uncertain], n_uncertain)
+
+        with self._lock:
+            self._images += len(batch)
+            self._fast_answers += len(batch) - n_uncertain
+            self._fast_time += fast_elapsed
+            self._fast_calls += 1
+        return preds, version
+
+    def _predict_full(self, batch: np.ndarray, count: int) -> Tuple[np.ndarray, str]:
+        start = time.perf_counter()
+        preds, version = self.full.predict_with_version(batch)
+        with self._lock:
+            self._fallbacks += count
+            self._full_time += time.perf_counter() - start
+            self._full_calls += 1
+        return preds, version
+
+    def stats(self) -> dict:
+        images = self._images
+        return {
+            "threshold": self.threshold,
+            "images": images,
+            "fast_answers": self._fast_answers,
+            "fallbacks": self._fallbacks,
+            "fast_hit_rate": round(self._fast_answers / images, 4) if images else 0.0,
+            "fast_errors": self._fast_errors,
+            "avg_fast_batch_ms": round(self._fast_time * 1000 / self._fast_calls, 2) if self._fast_calls else 0.0,
+            "avg_full_batch_ms": round(self._full_time * 1000 / self._full_calls, 2) if self._full_calls else 0.0,
+        }
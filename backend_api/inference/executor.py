@@ -0,0 +1,94 @@
+# backend_api/inference/executor.py
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Callable
+
+from fastapi import HTTPException, status
+
+# Pool dédié au décodage d'images et à l'inférence (hors de la boucle asyncio)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(os.cpu_count() or 4)))
+# Requêtes traitées simultanément, puis requêtes autorisées à attendre une place
+INFERENCE_MAX_CONCURRENCY = int(os.getenv("INFERENCE_MAX_CONCURRENCY", "32"))
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "64"))
+# Attente maximale d'une place avant de renvoyer 503
+INFERENCE_QUEUE_TIMEOUT_S = float(os.getenv("INFERENCE_QUEUE_TIMEOUT_S", "2"))
+INFERENCE_RETRY_AFTER_S = int(os.getenv("INFERENCE_RETRY_AFTER_S", "1"))
+
+
+class InferenceExecutor:
+    """Exécute le travail CPU dans un pool dédié avec concurrence bornée et délestage"""
+
+    def __init__(
+        self,
+        max_workers: int = INFERENCE_WORKERS,
+        max_concurrency: int = INFERENCE_MAX_CONCURRENCY,
+        max_queue: int = INFERENCE_MAX_QUEUE,
+        queue_timeout_s: float = INFERENCE_QUEUE_TIMEOUT_S,
+        retry_after_s: int = INFERENCE_RETRY_AFTER_S,
+    ):
+        self.max_workers = max(1, int(max_workers))
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout_s = queue_timeout_s
+        self.retry_after_s = retry_after_s
+
+        self.pool = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="inference"
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        self._active = 0
+        self._waiting = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def _overloaded(self) -> HTTPException:
+        self._rejected += 1
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Serveur d'inférence surchargé, réessayez plus tard",
+            headers={"Retry-After": str(self.retry_after_s)},
+        )
+
+    @asynccontextmanager
+    async def slot(self):
+        """Réserve une place de traitement, ou lève 503 immédiatement si la file est pleine"""
+        if self._active + self._waiting >= self.max_concurrency + self.max_queue:
+            raise self._overloaded()
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            raise self._overloaded()
+        finally:
+            self._waiting -= 1
+
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._completed += 1
+            self._semaphore.release()
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Exécute une fonction bloquante dans le pool dédié"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, functools.partial(fn, *args, **kwargs))
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self._active,
+            "waiting": self._waiting,
+            "completed": self._completed,
+            "rejected": self._rejected,
+        }
@@ -0,0 +1,270 @@
+# backend_api/inference/lifecycle.py
+
+import os
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from inference.batching import BATCH_MAX_SIZE
+
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+# Ne pas charger le modèle à l'import (workers auth/historique, tests)
+MODEL_LAZY_LOAD = _flag("MODEL_LAZY_LOAD", "false")
+# Charger et préchauffer le modèle en arrière-plan au démarrage ; par défaut, pas avec
+# MODEL_LAZY_LOAD (le modèle n'est chargé qu'à la première prédiction), sauf MODEL_WARMUP=true
+MODEL_WARMUP = _flag("MODEL_WARMUP", "false" if MODEL_LAZY_LOAD else "true")
+# Attente maximale des lots en cours sur l'ancien modèle après un remplacement
+MODEL_DRAIN_TIMEOUT_S = float(os.getenv("MODEL_DRAIN_TIMEOUT_S", "30"))
+
+
+def default_warmup_batch_sizes(max_batch_size: int = BATCH_MAX_SIZE) -> list:
+    """Puissances de deux jusqu'à la taille de lot maximale, plus la taille maximale elle-même"""
+    sizes = []
+    size = 1
+    while size < max_batch_size:
+        sizes.append(size)
+        size *= 2
+    sizes.append(max_batch_size)
+    return sizes
+
+
+def warmup_batch_sizes_from_env() -> list:
+    raw = os.getenv("MODEL_WARMUP_BATCH_SIZES", "")
+    sizes = [int(s) for s in raw.split(",") if s.strip()]
+    return sizes or default_warmup_batch_sizes()
+
+
+class ModelHolder:
+    """Charge le modèle à la demande et le préchauffe avant de le déclarer prêt"""
+
+    def __init__(
+        self,
+        loader: Callable,
+        input_shape: tuple = (224, 224, 3),
+        warmup_batch_sizes: Optional[list] = None,
+        version: str = "",
+    ):
+        self.loader = loader
+        self.input_shape = input_shape
+        self.warmup_batch_sizes = warmup_batch_sizes or warmup_batch_sizes_from_env()
+        self.version = version
+
+        self.model = None
+        self.state = "cold"  # cold -> loading -> loaded -> warming -> ready (ou failed)
+        self.error: Optional[str] = None
+        self.load_time_s: Optional[float] = None
+        self.warmup_time_s: Optional[float] = None
+
+        # Remplacement à chaud : idle -> loading -> warming -> draining -> idle (ou failed)
+        self.swap_state = "idle"
+        self.swap_error: Optional[str] = None
+        self.pending_version: Optional[str] = None
+        self.swaps = 0
+
+        self._lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+
+    @property
+    def failed(self) -> bool:
+        return self.state == "failed"
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    @property
+    def swapping(self) -> bool:
+        return self._swap_lock.locked()
+
+    def load(self):
+        """Charge le modèle une seule fois (thread-safe)"""
+        if self.model is not None:
+            return self.model
+
+        with self._lock:
+            if self.model is not None:
+                return self.model
+            if self.failed:
+                raise RuntimeError(f"Modèle indisponible: {self.error}")
+
+            self.state = "loading"
+            start = time.perf_counter()
+            try:
+                self.model = self.loader()
+            except Exception as e:
+                self.state = "failed"
+                self.error = str(e)
+                raise
+            self.load_time_s = round(time.perf_counter() - start, 3)
+            self.state = "loaded"
+        return self.model
+
+    def _warm(self, model) -> float:
+        start = time.perf_counter()
+        for batch_size in self.warmup_batch_sizes:
+            model.predict(np.zeros((batch_size,) + tuple(self.input_shape), dtype=np.float32))
+        return round(time.perf_counter() - start, 3)
+
+    def warm_up(self):
+        """Exécute un lot synthétique de chaque taille configurée (traçage, allocations)"""
+        model = self.load()
+        self.state = "warming"
+        self.warmup_time_s = self._warm(model)
+        self.state = "ready"
+
+    def start_background(self, warm_up: bool = True):
+        """Charge (et préchauffe) le modèle dans un thread sans bloquer le démarrage"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def run():
+            try:
+                self.load()
+                if warm_up:
+                    self.warm_up()
+                print(f"✅ Modèle prêt (état: {self.state})")
+            except Exception as e:
+                self.state = "failed"
+                self.error = str(e)
+                print(f"❌ Erreur lors du chargement du modèle: {e}")
+
+        self._thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+        self._thread.start()
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.predict_with_version(batch)[0]
+
+    def predict_with_version(self, batch: np.ndarray) -> Tuple[np.ndarray, str]:
+        """Prédictions et version du modèle qui les a calculées (exacte pendant un remplacement)"""
+        self.load()
+        # Modèle et version lus ensemble : swap() les remplace sous le même verrou
+        with self._lock:
+            model, version = self.model, self.version
+        key = id(model)
+        with self._in_flight_lock:
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        try:
+            return model.predict(batch), version
+        finally:
+            with self._in_flight_lock:
+                self._in_flight[key] -= 1
+                if not self._in_flight[key]:
+                    del self._in_flight[key]
+
+    def _drain(self, model, timeout_s: float) -> bool:
+        """Attend la fin des lots encore en cours sur l'ancien modèle"""
+        deadline = time.monotonic() + timeout_s
+        while time.monotonic() < deadline:
+            with self._in_flight_lock:
+                if id(model) not in self._in_flight:
+                    return True
+            time.sleep(0.05)
+        return False
+
+    def swap(
+        self,
+        loader: Callable,
+        version: str,
+        on_swap: Optional[Callable] = None,
+        drain_timeout_s: float = MODEL_DRAIN_TIMEOUT_S,
+    ):
+        """Charge et préchauffe une nouvelle version, la bascule atomiquement puis draine l'ancienne"""
+        if not self._swap_lock.acquire(blocking=False):
+            raise RuntimeError("Un remplacement de modèle est déjà en cours")
+        try:
+            self.pending_version = version
+            self.swap_error = None
+            self.swap_state = "loading"
+            start = time.perf_counter()
+            new_model = loader()
+            load_time_s = round(time.perf_counter() - start, 3)
+
+            self.swap_state = "warming"
+            warmup_time_s = self._warm(new_model)
+
+            with self._lock:
+                old_model = self.model
+                self.model = new_model
+                self.loader = loader
+                self.version = version
+                self.load_time_s = load_time_s
+                self.warmup_time_s = warmup_time_s
+                self.state = "ready"
+                self.error = None
+                if on_swap is not None:
+                    on_swap(version)
+            self.swaps += 1
+
+            self.swap_state = "draining"
+            if old_model is not None and not self._drain(old_model, drain_timeout_s):
+                print(f"⚠️  Ancien modèle encore utilisé après {drain_timeout_s}s, libéré quand même")
+            del old_model
+            self.swap_state = "idle"
+            print(f"✅ Modèle remplacé à chaud: version {version}")
+        except Exception as e:
+            self.swap_state = "failed"
+            self.swap_error = str(e)
+            print(f"❌ Échec du remplacement du modèle ({version}): {e}")
+            raise
+        finally:
+            self.pending_version = None
+            self._swap_lock.release()
+
+    def swap_in_background(self, loader: Callable, version: str, on_swap: Optional[Callable] = None):
+        """Lance swap() dans un thread ; les requêtes continuent sur l'ancien modèle"""
+        if self.swapping:
+            raise RuntimeError("Un remplacement de modèle est déjà en cours")
+
+        def run():
+            try:
+                self.swap(loader, version, on_swap)
+            except Exception:
+                pass  # déjà journalisé, état disponible via status()
+
+        threading.Thread(target=run, name="model-swap", daemon=True).start()
+
+    def status(self) -> dict:
+        return {
+            "version": self.version,
+            "state": self.state,
+            "error": self.error,
+            "load_time_s": self.load_time_s,
+            "warmup_time_s": self.warmup_time_s,
+            "warmup_batch_sizes": self.warmup_batch_sizes,
+            "swap": {
+                "state": self.swap_state,
+                "pending_version": self.pending_version,
+                "error": self.swap_error,
+                "swaps": self.swaps,
+            },
+        }
+
+
+def watch_registry(holder: ModelHolder, registry, loader_for: Callable, interval_s: float, on_swap=None):
+    """Surveille le pointeur ACTIVE du registre et remplace le modèle quand il change"""
+
+    def run():
+        failed_version = None
+        while True:
+            time.sleep(interval_s)
+            version = registry.active()
+            if not version or version in (holder.version, failed_version) or holder.swapping:
+                continue
+            try:
+                holder.swap(loader_for(version), version, on_swap)
+            except Exception:
+                # Ne pas réessayer en boucle une version défectueuse
+                failed_version = version
+
+    thread = threading.Thread(target=run, name="model-registry-watch", daemon=True)
+    thread.start()
+    return thread
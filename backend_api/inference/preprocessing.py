@@ -0,0 +1,86 @@
+# backend_api/inference/preprocessing.py
+
+import io
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+IMG_SIZE = 224
+
+# "true" (défaut) : diviser par 255, comme à l'entraînement de model/ (EfficientNet dont la
+#   couche Rescaling s'ajoute à cette normalisation : les poids attendent les deux)
+# "auto" : diviser par 255 seulement si le modèle ne contient pas déjà une couche Rescaling
+#   (à réserver à un modèle entraîné sur des pixels 0-255, parité vérifiée au préalable)
+# "false" : jamais
+PREPROCESS_RESCALE = os.getenv("PREPROCESS_RESCALE", "true").lower()
+# Décodage JPEG réduit (draft) : écart avec l'entraînement affiché par bench_preprocessing.py ;
+# "false" pour retrouver exactement les pixels de l'entraînement (décodage complet)
+PREPROCESS_DRAFT = os.getenv("PREPROCESS_DRAFT", "true").lower() in ("1", "true", "yes")
+# Même filtre que l'entraînement (img.resize sans argument : BICUBIC)
+RESAMPLE = Image.Resampling.BICUBIC
+
+
+def model_rescales_input(config_path: str) -> bool:
+    """Vrai si la première couche après l'entrée du modèle sauvegardé est un Rescaling"""
+    try:
+        with open(config_path, "r") as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return False
+
+    for layer in config.get("config", {}).get("layers", []):
+        if layer.get("class_name") == "InputLayer":
+            continue
+        return layer.get("class_name") == "Rescaling"
+    return False
+
+
+def should_rescale(config_path: str) -> bool:
+    """Décide si le prétraitement doit diviser par 255"""
+    if PREPROCESS_RESCALE in ("1", "true", "yes"):
+        return True
+    if PREPROCESS_RESCALE in ("0", "false", "no"):
+        return False
+    return not model_rescales_input(config_path)
+
+
+class ImagePreprocessor:
+    """Décodage réduit (draft JPEG) + redimensionnement vers un tableau prêt pour le modèle"""
+
+    def __init__(self, size: int = IMG_SIZE, rescale: bool = False, draft: bool = PREPROCESS_DRAFT):
+        self.size = size
+        self.rescale = rescale
+        self.draft = draft
+        self._scale = np.float32(1.0 / 255.0)
+
+    def _load(self, image_bytes: bytes) -> Image.Image:
+        img = Image.open(io.BytesIO(image_bytes))
+        # Décodage JPEG à l'échelle 1/2, 1/4 ou 1/8 : on lit directement une image proche de 224x224
+        if self.draft and img.format == "JPEG":
+            img.draft("RGB", (self.size, self.size))
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        if img.size != (self.size, self.size):
+            img = img.resize((self.size, self.size), RESAMPLE)
+        return img
+
+    def decode(self, image_bytes: bytes) -> np.ndarray:
+        """Échantillon (H, W, 3) : uint8 si le modèle normalise lui-même, float32 sinon"""
+        arr = np.asarray(self._load(image_bytes))
+        if not self.rescale:
+            return arr
+        out = np.empty(arr.shape, dtype=np.float32)
+        np.multiply(arr, self._scale, out=out, dtype=np.float32)
+        return out
+
+    def __call__(self, image_bytes: bytes) -> np.ndarray:
+        """Lot (1, H, W, 3) float32, en une seule allocation"""
+        out = np.empty((1, self.size, self.size, 3), dtype=np.float32)
+        arr = np.asarray(self._load(image_bytes))
+        if self.rescale:
+            np.multiply(arr, self._scale, out=out[0], dtype=np.float32)
+        else:
+            np.copyto(out[0], arr, casting="unsafe")
+        return out
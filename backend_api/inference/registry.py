@@ -0,0 +1,137 @@
+# backend_api/inference/registry.py
+
+import argparse
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import Optional
+
+# Répertoire des versions : <racine>/<version>/ contient les artefacts, config.json et metadata.json
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", os.path.join("model", "registry"))
+# Intervalle de surveillance du fichier ACTIVE (0 = désactivé)
+MODEL_REGISTRY_WATCH_S = float(os.getenv("MODEL_REGISTRY_WATCH_S", "0"))
+
+ACTIVE_FILE = "ACTIVE"
+METADATA_FILE = "metadata.json"
+_ARTIFACTS = (".keras", ".tflite", ".onnx", ".json", ".h5")
+
+
+class ModelRegistry:
+    """Versions du modèle sur disque et pointeur vers la version active"""
+
+    def __init__(self, root: str = MODEL_REGISTRY_DIR):
+        self.root = root
+
+    def version_dir(self, version: str) -> str:
+        if not version or os.sep in version or version.startswith("."):
+            raise ValueError(f"Version invalide: {version}")
+        return os.path.join(self.root, version)
+
+    def metadata(self, version: str) -> dict:
+        try:
+            with open(os.path.join(self.version_dir(version), METADATA_FILE), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def versions(self) -> list:
+        """Versions disponibles, de la plus ancienne à la plus récente"""
+        if not os.path.isdir(self.root):
+            return []
+        names = [
+            name for name in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, name)) and not name.startswith(".")
+        ]
+        return sorted(names, key=lambda v: (self.metadata(v).get("registered_at", ""), v))
+
+    def exists(self, version: str) -> bool:
+        return os.path.isdir(self.version_dir(version))
+
+    def active(self) -> Optional[str]:
+        """Version pointée par ACTIVE, sinon la plus récente, sinon None (registre vide)"""
+        try:
+            with open(os.path.join(self.root, ACTIVE_FILE), "r") as f:
+                version = f.read().strip()
+            if version and self.exists(version):
+                return version
+        except OSError:
+            pass
+        versions = self.versions()
+        return versions[-1] if versions else None
+
+    def set_active(self, version: str):
+        """Met à jour ACTIVE de façon atomique (écriture temporaire + rename)"""
+        if not self.exists(version):
+            raise ValueError(f"Version inconnue: {version}")
+        tmp_path = os.path.join(self.root, f".{ACTIVE_FILE}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.root, ACTIVE_FILE))
+
+    def register(self, source_dir: str, version: Optional[str] = None) -> str:
+        """Copie les artefacts d'un dossier modèle dans une nouvelle version"""
+        metadata = {}
+        try:
+            with open(os.path.join(source_dir, METADATA_FILE), "r") as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+        now = datetime.utcnow()
+        version = version or f"v{now.strftime('%Y%m%d-%H%M%S')}"
+        target = self.version_dir(version)
+        if os.path.exists(target):
+            raise ValueError(f"La version existe déjà: {version}")
+
+        # Copie dans un dossier temporaire puis rename : une version n'apparaît jamais à moitié copiée
+        tmp_target = os.path.join(self.root, f".{version}.tmp")
+        os.makedirs(tmp_target)
+        for name in os.listdir(source_dir):
+            if name.endswith(_ARTIFACTS) and name != METADATA_FILE:
+                shutil.copy2(os.path.join(source_dir, name), tmp_target)
+
+        metadata.update({"version": version, "registered_at": now.isoformat()})
+        with open(os.path.join(tmp_target, METADATA_FILE), "w") as f:
+            json.dump(metadata, f, indent=2)
+        os.replace(tmp_target, target)
+        return version
+
+    def describe(self) -> dict:
+        return {
+            "root": self.root,
+            "active": self.active(),
+            "versions": [{"version": v, **self.metadata(v)} for v in self.versions()],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registre des versions du modèle de classification")
+    parser.add_argument("--root", default=MODEL_REGISTRY_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="Lister les versions")
+    register = sub.add_parser("register", help="Ajouter une version depuis un dossier modèle")
+    register.add_argument("source_dir")
+    register.add_argument("--version")
+    register.add_argument("--activate", action="store_true")
+    activate = sub.add_parser("activate", help="Changer la version active")
+    activate.add_argument("version")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == "list":
+        print(json.dumps(registry.describe(), indent=2))
+    elif args.command == "register":
+        os.makedirs(registry.root, exist_ok=True)
+        version = registry.register(args.source_dir, args.version)
+        print(f"✅ Version enregistrée: {version}")
+        if args.activate:
+            registry.set_active(version)
+            print(f"✅ Version active: {version}")
+    elif args.command == "activate":
+        registry.set_active(args.version)
+        print(f"✅ Version active: {args.version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# backend_api/ingestion.py - Normalisation des images à l'upload (orientation, taille, ré-encodage)
+#
+# Les photos de téléphone (4-12 MB, 12+ Mpx, EXIF) sont normalisées avant d'être adressées
+# par leur contenu : c'est la version normalisée qui est stockée, classée, transformée et servie.
+
+import io
+import os
+import shutil
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from fastapi import HTTPException, UploadFile
+from PIL import ExifTags, Image, ImageCms, ImageOps, UnidentifiedImageError, features
+from starlette.concurrency import run_in_threadpool
+
+from storage import MAX_UPLOAD_BYTES, StoredFile
+
+# Côté le plus long conservé (photos de pièces / photos de profil)
+INGEST_MAX_EDGE = int(os.getenv("INGEST_MAX_EDGE", "2048"))
+PROFILE_PICTURE_MAX_EDGE = int(os.getenv("PROFILE_PICTURE_MAX_EDGE", "512"))
+INGEST_QUALITY = int(os.getenv("INGEST_QUALITY", "85"))
+# JPEG progressif par défaut (lu partout, y compris par le moteur de styles) ; webp possible
+INGEST_FORMAT = os.getenv("INGEST_FORMAT", "jpeg")
+# Garde contre les bombes de décompression : vérifié sur l'en-tête, avant tout décodage
+INGEST_MAX_PIXELS = int(os.getenv("INGEST_MAX_PIXELS", str(50_000_000)))
+# Seuls ces décodeurs sont essayés sur les fichiers reçus (le décodeur JPEG couvre aussi MPO)
+INGEST_INPUT_FORMATS = ("JPEG", "PNG", "WEBP")
+
+_EXTENSIONS = {"jpeg": ".jpg", "webp": ".webp"}
+# Métadonnées dont la présence impose un ré-encodage
+_METADATA_KEYS = ("exif", "icc_profile", "xmp", "XML:com.adobe.xmp", "comment", "photoshop")
+
+# Enregistre tous les décodeurs (WEBP ne fait pas partie de ceux chargés d'office)
+Image.init()
+_SRGB = ImageCms.createProfile("sRGB") if features.check("littlecms2") else None
+
+
+class NormalizedImage(NamedTuple):
+    bytes_in: int
+    bytes_out: int
+    pixels_in: int
+    pixels_out: int
+    reencoded: bool
+
+
+def _to_srgb(img: Image.Image) -> Image.Image:
+    """Convertit selon le profil ICC embarqué (ex. Display P3) avant de le retirer"""
+    icc_profile = img.info.get("icc_profile")
+    if not icc_profile or _SRGB is None:
+        return img
+    try:
+        source = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile))
+        return ImageCms.profileToProfile(img, source, _SRGB, outputMode="RGB")
+    except (ImageCms.PyCMSError, OSError):
+        return img
+
+
+def _flatten(img: Image.Image) -> Image.Image:
+    """RGB ; la transparence (PNG) est posée sur fond blanc"""
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        return background
+    return img.convert("RGB")
+
+
+class ImageNormalizer:
+    """Orientation EXIF, résolution plafonnée, métadonnées retirées, ré-encodage progressif"""
+
+    def __init__(
+        self,
+        max_edge: int = INGEST_MAX_EDGE,
+        quality: int = INGEST_QUALITY,
+        image_format: str = INGEST_FORMAT,
+        max_pixels: int = INGEST_MAX_PIXELS,
+    ):
+        self.max_edge = max_edge
+        self.quality = quality
+        self.format = image_format
+        self.ext = _EXTENSIONS[image_format]
+        self.max_pixels = max_pixels
+
+        self._lock = threading.Lock()
+        self.images = 0
+        self.reencoded = 0
+        self.rejected = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.pixels_in = 0
+        self.pixels_out = 0
+        self.total_ms = 0.0
+
+    def _is_normalized(self, img: Image.Image, max_edge: int) -> bool:
+        """Déjà conforme (ex. une image générée par l'API) : gardée octet pour octet"""
+        return (
+            img.format == self.format.upper()
+            # Un JPEG de base (non progressif) est ré-encodé : affichage progressif côté client
+            and (self.format != "jpeg" or bool(img.info.get("progressive")))
+            and max(img.size) <= max_edge
+            and img.mode == "RGB"
+            and not any(img.info.get(key) for key in _METADATA_KEYS)
+            and img.getexif().get(ExifTags.Base.Orientation, 1) == 1
+        )
+
+    def _encode(self, img: Image.Image, path: str):
+        # Rien n'est recopié de l'original (EXIF, GPS, ICC, commentaires)
+        img.info = {}
+        if self.format == "webp":
+            img.save(path, format="WEBP", quality=self.quality, method=4)
+        else:
+            img.save(path, format="JPEG", quality=self.quality, optimize=True, progressive=True)
+
+    def normalize(self, source_path: str, output_path: str, max_edge: Optional[int] = None) -> NormalizedImage:
+        """Écrit la version normalisée de source_path dans output_path ; 400/413 si refusée (bloquant)"""
+        max_edge = max_edge or self.max_edge
+        bytes_in = os.path.getsize(source_path)
+        try:
+            with Image.open(source_path, formats=INGEST_INPUT_FORMATS) as img:
+                width, height = img.size
+                if width * height > self.max_pixels:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Image trop grande ({width}x{height}, max {self.max_pixels / 1e6:.0f} Mpx)"
+                    )
+                if self._is_normalized(img, max_edge):
+                    shutil.copyfile(source_path, output_path)
+                    return NormalizedImage(bytes_in, bytes_in, width * height, width * height, False)
+
+                # JPEG : décodage directement à une échelle réduite (le carré couvre les deux orientations)
+                img.draft("RGB", (max_edge, max_edge))
+                img = ImageOps.exif_transpose(img)
+                img = _flatten(_to_srgb(img))
+        except Image.DecompressionBombError:
+            raise HTTPException(status_code=413, detail="Image trop grande (bombe de décompression)")
+        except (UnidentifiedImageError, SyntaxError, OSError):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Image invalide (formats acceptés : {', '.join(INGEST_INPUT_FORMATS)})"
+            )
+
+        img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS, reducing_gap=2.0)
+        self._encode(img, output_path)
+        return NormalizedImage(bytes_in, os.path.getsize(output_path),
+                               width * height, img.width * img.height, True)
+
+    def _record(self, result: NormalizedImage, elapsed_ms: float):
+        with self._lock:
+            self.images += 1
+            self.reencoded += int(result.reencoded)
+            self.bytes_in += result.bytes_in
+            self.bytes_out += result.bytes_out
+            self.pixels_in += result.pixels_in
+            self.pixels_out += result.pixels_out
+            self.total_ms += elapsed_ms
+
+    def ingest_file(self, storage, raw_path: str, max_edge: Optional[int] = None) -> StoredFile:
+        """Normalise un fichier reçu et le range dans le stockage ; le fichier brut est supprimé"""
+        output_path = storage.temp_path(self.ext)
+        start = time.perf_counter()
+        try:
+            result = self.normalize(raw_path, output_path, max_edge)
+            stored = storage.ingest_file(output_path, self.ext)
+        except HTTPException:
+            with self._lock:
+                self.rejected += 1
+            raise
+        finally:
+            for path in (raw_path, output_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        self._record(result, (time.perf_counter() - start) * 1000)
+        if result.reencoded:
+            saved = 1 - result.bytes_out / max(1, result.bytes_in)
+            print(f"📉 Image normalisée : {result.bytes_in / 1024:.0f} KB -> "
+                  f"{result.bytes_out / 1024:.0f} KB ({saved:.0%} économisés)")
+        return stored
+
+    async def save_upload(self, storage, upload: UploadFile, max_bytes: Optional[int] = MAX_UPLOAD_BYTES,
+                          max_edge: Optional[int] = None) -> StoredFile:
+        """Reçoit l'upload (taille brute limitée), le normalise hors de la boucle d'événements, le stocke"""
+        raw_path = await storage.receive_upload(upload, max_bytes=max_bytes)
+        return await run_in_threadpool(self.ingest_file, storage, raw_path, max_edge)
+
+    def stats(self) -> dict:
+        with self._lock:
+            images = max(1, self.images)
+            saved = self.bytes_in - self.bytes_out
+            return {
+                "format": self.format,
+                "max_edge": self.max_edge,
+                "quality": self.quality,
+                "images": self.images,
+                "reencoded": self.reencoded,
+                "rejected": self.rejected,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                # Octets économisés sur le disque, et à chaque téléchargement de l'original
+                "bytes_saved": saved,
+                "bytes_saved_per_image": round(saved / images),
+                "size_ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None,
+                "megapixels_in_per_image": round(self.pixels_in / images / 1e6, 2),
+                "megapixels_out_per_image": round(self.pixels_out / images / 1e6, 2),
+                "avg_ms": round(self.total_ms / images, 1),
+            }
+
+
+normalizer = ImageNormalizer()
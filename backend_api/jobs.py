@@ -0,0 +1,390 @@
+# backend_api/jobs.py - File de jobs de transformation (persistée en base)
+
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, aliased
+
+import blobs
+import database
+import derivatives
+import design_stats
+import quotas
+import storage as storage_module
+from models import DesignHistory, TransformJob
+
+# Nombre de workers locaux, jobs simultanés par utilisateur, bail d'un job en cours
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_PER_USER_LIMIT = int(os.getenv("JOB_PER_USER_LIMIT", "1"))
+JOB_LEASE_S = float(os.getenv("JOB_LEASE_S", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_INTERVAL_S = float(os.getenv("JOB_POLL_INTERVAL_S", "1"))
+JOB_MAX_PRIORITY = int(os.getenv("JOB_MAX_PRIORITY", "10"))
+
+FINISHED_STATUSES = ("done", "failed")
+
+
+def job_to_dict(job: TransformJob) -> dict:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "error": job.error,
+        "priority": job.priority,
+        "style": job.style,
+        "room_type": job.room_type,
+        "attempts": job.attempts,
+        "design_id": job.design_id,
+        "original_image": job.original_image_path,
+        "generated_image": job.generated_image_path if job.status == "done" else None,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+# ============= STOCKAGE DES JOBS =============
+
+def create_job(
+    db: Session,
+    user_id: int,
+    original_image_path: str,
+    generated_image_path: Optional[str],
+    style: Optional[str],
+    room_type: Optional[str],
+    priority: int = 0
+) -> TransformJob:
+    job = TransformJob(
+        user_id=user_id,
+        status="queued",
+        priority=max(0, min(int(priority), JOB_MAX_PRIORITY)),
+        style=style,
+        room_type=room_type,
+        original_image_path=original_image_path,
+        generated_image_path=generated_image_path,
+        message="En file d'attente"
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_job(db: Session, job_id: int, user_id: int) -> Optional[TransformJob]:
+    return db.query(TransformJob).filter(
+        TransformJob.id == job_id,
+        TransformJob.user_id == user_id
+    ).first()
+
+
+def claim_next_job(db: Session, worker_id: str, per_user_limit: int = JOB_PER_USER_LIMIT) -> Optional[int]:
+    """Réserve le job le plus prioritaire dont l'utilisateur n'a pas atteint sa limite
+
+    La limite est vérifiée dans l'UPDATE qui réserve le job : exacte entre processus avec
+    SQLite (écritures sérialisées). Avec PostgreSQL (READ COMMITTED), deux processus qui
+    réservent au même instant deux jobs du même utilisateur peuvent la dépasser d'un job ;
+    dans un processus, le verrou de JobWorkerPool la garde exacte.
+    """
+    busy_users = select(TransformJob.user_id).where(
+        TransformJob.status == "running"
+    ).group_by(TransformJob.user_id).having(func.count(TransformJob.id) >= per_user_limit)
+
+    candidates = db.query(TransformJob.id, TransformJob.user_id).filter(
+        TransformJob.status == "queued",
+        TransformJob.user_id.not_in(busy_users)
+    ).order_by(TransformJob.priority.desc(), TransformJob.id.asc()).limit(5).all()
+
+    now = datetime.utcnow()
+    running = aliased(TransformJob)
+    for job_id, user_id in candidates:
+        running_for_user = select(func.count(running.id)).where(
+            running.user_id == user_id,
+            running.status == "running"
+        ).scalar_subquery()
+        # Mise à jour conditionnelle : un seul worker (même dans un autre processus) gagne le job
+        claimed = db.query(TransformJob).filter(
+            TransformJob.id == job_id,
+            TransformJob.status == "queued",
+            running_for_user < per_user_limit
+        ).update({
+            "status": "running",
+            "worker_id": worker_id,
+            "attempts": TransformJob.attempts + 1,
+            "started_at": now,
+            "heartbeat_at": now,
+            "progress": 0,
+            "message": "Démarrage"
+        }, synchronize_session=False)
+        db.commit()
+        if claimed:
+            return job_id
+    return None
+
+
+def _owned(job_id: int, worker_id: Optional[str]):
+    """Job encore en cours chez ce worker (None : job pas encore réservé, résultat en cache)"""
+    if worker_id is None:
+        return (TransformJob.id == job_id, TransformJob.status == "queued",
+                TransformJob.worker_id.is_(None))
+    return (TransformJob.id == job_id, TransformJob.status == "running",
+            TransformJob.worker_id == worker_id)
+
+
+def update_progress(db: Session, job_id: int, progress: int, message: Optional[str] = None,
+                    worker_id: Optional[str] = None) -> bool:
+    """Met à jour la progression et renouvelle le bail du worker ; False si le bail est perdu"""
+    values = {"progress": max(0, min(int(progress), 100)), "heartbeat_at": datetime.utcnow()}
+    if message is not None:
+        values["message"] = message
+    conditions = _owned(job_id, worker_id) if worker_id is not None else (
+        TransformJob.id == job_id, TransformJob.status == "running")
+    updated = db.query(TransformJob).filter(*conditions).update(values, synchronize_session=False)
+    db.commit()
+    return updated > 0
+
+
+def renew_lease(db: Session, job_id: int, worker_id: str) -> bool:
+    """Renouvelle le bail sans toucher à la progression ; False si le job a été repris"""
+    updated = db.query(TransformJob).filter(*_owned(job_id, worker_id)).update(
+        {"heartbeat_at": datetime.utcnow()}, synchronize_session=False
+    )
+    db.commit()
+    return updated > 0
+
+
+def complete_job(db: Session, job: TransformJob, worker_id: Optional[str] = None) -> Optional[DesignHistory]:
+    """Enregistre le design dans l'historique et termine le job dans la même transaction
+
+    Le job n'est terminé que s'il appartient encore à ce worker (bail expiré puis repris
+    par un autre : None, rien n'est enregistré ni compté deux fois).
+    """
+    finished = db.query(TransformJob).filter(*_owned(job.id, worker_id)).update({
+        "status": "done",
+        "progress": 100,
+        "message": "Terminé",
+        "generated_image_path": job.generated_image_path,
+        "finished_at": datetime.utcnow()
+    }, synchronize_session=False)
+    if not finished:
+        db.rollback()
+        return None
+
+    design = DesignHistory(
+        user_id=job.user_id,
+        original_image_path=job.original_image_path,
+        generated_image_path=job.generated_image_path,
+        room_type=job.room_type,
+        style=job.style,
+        confidence=None,
+        is_favorite=False,
+        created_at=datetime.utcnow()
+    )
+    db.add(design)
+    db.flush()
+    design_stats.record_design(db, design)
+    blobs.acquire(db, job.original_image_path)
+    blobs.acquire(db, job.generated_image_path)
+    quotas.charge(db, job.user_id, job.original_image_path, job.generated_image_path)
+
+    db.query(TransformJob).filter(TransformJob.id == job.id).update(
+        {"design_id": design.id}, synchronize_session=False
+    )
+    db.commit()
+    db.refresh(job)
+    return design
+
+
+def fail_job(db: Session, job: TransformJob, error: str, worker_id: Optional[str] = None,
+             stale_before: Optional[datetime] = None) -> bool:
+    """Remet le job en file s'il reste des tentatives, sinon le marque en échec
+
+    Seulement s'il est encore en cours (chez worker_id, ou sans battement depuis
+    stale_before) : un job déjà repris ou terminé ailleurs n'est pas touché.
+    """
+    conditions = [TransformJob.id == job.id, TransformJob.status == "running"]
+    if worker_id is not None:
+        conditions.append(TransformJob.worker_id == worker_id)
+    if stale_before is not None:
+        conditions.append(TransformJob.heartbeat_at < stale_before)
+    if job.attempts < JOB_MAX_ATTEMPTS:
+        values = {"status": "queued", "message": f"Nouvelle tentative après erreur: {error}"}
+    else:
+        values = {"status": "failed", "message": "Échec", "finished_at": datetime.utcnow()}
+    values.update({"error": error, "worker_id": None})
+    updated = db.query(TransformJob).filter(*conditions).update(values, synchronize_session=False)
+    db.commit()
+    return updated > 0
+
+
+def reclaim_stale_jobs(db: Session, lease_s: float = JOB_LEASE_S) -> int:
+    """Remet en file les jobs dont le worker a disparu (redémarrage, crash)"""
+    expired = datetime.utcnow() - timedelta(seconds=lease_s)
+    stale = db.query(TransformJob).filter(
+        TransformJob.status == "running",
+        TransformJob.heartbeat_at < expired
+    ).all()
+    # Condition répétée dans l'UPDATE : un battement arrivé entre-temps garde le job
+    return sum(fail_job(db, job, "Bail du worker expiré", stale_before=expired) for job in stale)
+
+
+# ============= WORKERS =============
+
+class JobWorkerPool:
+    """Workers locaux qui consomment la file de jobs persistée
+
+    transform_fn(original_path, output_path, style, room_type, progress) écrit
+    l'image générée dans un fichier de travail, rangé ensuite dans le stockage ;
+    progress(valeur, message) met à jour le job.
+    """
+
+    def __init__(
+        self,
+        transform_fn: Callable,
+        workers: int = JOB_WORKERS,
+        per_user_limit: int = JOB_PER_USER_LIMIT,
+        poll_interval_s: float = JOB_POLL_INTERVAL_S,
+        session_factory=None,
+        storage=None,
+        lease_s: float = JOB_LEASE_S,
+    ):
+        self.transform_fn = transform_fn
+        self.workers = max(0, int(workers))
+        self.per_user_limit = max(1, int(per_user_limit))
+        self.poll_interval_s = poll_interval_s
+        self.lease_s = lease_s
+        self.session_factory = session_factory or database.SessionLocal
+        self.storage = storage or storage_module.storage
+
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._claim_lock = threading.Lock()
+        self._threads = []
+        self._prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+        self.completed = 0
+        self.failed = 0
+        self.reclaimed = 0
+        self.abandoned = 0
+        self.active = 0
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopping.clear()
+        db = self.session_factory()
+        try:
+            self.reclaimed += reclaim_stale_jobs(db)
+        finally:
+            db.close()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, args=(f"{self._prefix}:{i}",),
+                                      name=f"transform-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout_s: float = 5.0):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout_s)
+        self._threads = []
+
+    def notify(self):
+        """Réveille les workers après une soumission"""
+        self._wakeup.set()
+
+    def _run(self, worker_id: str):
+        while not self._stopping.is_set():
+            db = self.session_factory()
+            try:
+                # Un seul claim à la fois dans le processus : la limite par utilisateur reste exacte
+                with self._claim_lock:
+                    job_id = claim_next_job(db, worker_id, self.per_user_limit)
+                    if job_id is None:
+                        self.reclaimed += reclaim_stale_jobs(db)
+                if job_id is not None:
+                    self._process(db, job_id, worker_id)
+                    continue
+            except Exception as e:
+                print(f"❌ Worker {worker_id}: {e}")
+            finally:
+                db.close()
+
+            self._wakeup.wait(self.poll_interval_s)
+            self._wakeup.clear()
+
+    def _heartbeat(self, job_id: int, worker_id: str, done: threading.Event):
+        """Renouvelle le bail pendant transform_fn (qui peut dépasser JOB_LEASE_S sans progresser)"""
+        while not done.wait(self.lease_s / 3):
+            db = self.session_factory()
+            try:
+                if not renew_lease(db, job_id, worker_id):
+                    return
+            except Exception as e:
+                print(f"⚠️  Bail du job {job_id} non renouvelé: {e}")
+            finally:
+                db.close()
+
+    def _process(self, db: Session, job_id: int, worker_id: str):
+        job = db.query(TransformJob).filter(TransformJob.id == job_id).first()
+        self.active += 1
+
+        def progress(value: int, message: Optional[str] = None):
+            update_progress(db, job_id, value, message, worker_id)
+
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job_id, worker_id, done),
+                                     name=f"job-heartbeat-{job_id}", daemon=True)
+        heartbeat.start()
+        output_path = self.storage.temp_path(".jpg")
+        try:
+            self.transform_fn(job.original_image_path, output_path,
+                              job.style, job.room_type, progress)
+            done.set()
+            stored = self.storage.ingest_file(output_path, ".jpg")
+            blobs.register(db, stored)
+            db.refresh(job)
+            job.generated_image_path = stored.path
+            if complete_job(db, job, worker_id) is None:
+                # Bail perdu : le job a été repris, l'image sans référence part au ramasse-miettes
+                self.abandoned += 1
+                print(f"⚠️  Job {job_id} repris par un autre worker, résultat abandonné")
+                return
+            derivatives.generator.submit(job.original_image_path, job.generated_image_path)
+            self.completed += 1
+        except Exception as e:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            db.rollback()
+            db.refresh(job)
+            if fail_job(db, job, str(e), worker_id):
+                self.failed += 1
+            print(f"❌ Job {job_id} en erreur: {e}")
+        finally:
+            done.set()
+            self.active -= 1
+
+    def stats(self) -> dict:
+        db = self.session_factory()
+        try:
+            counts = dict(
+                db.query(TransformJob.status, func.count(TransformJob.id))
+                .group_by(TransformJob.status).all()
+            )
+        finally:
+            db.close()
+        return {
+            "workers": len(self._threads),
+            "per_user_limit": self.per_user_limit,
+            "active": self.active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "reclaimed": self.reclaimed,
+            "abandoned": self.abandoned,
+            "jobs_by_status": counts,
+        }
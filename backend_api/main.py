@@ -1,36 +1,109 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
-from datetime import timedelta
-import tensorflow as tf
-from PIL import Image
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+import asyncio
 import numpy as np
-import io
 import os
-import models, schemas, crud, auth, database
+import models, schemas, crud, auth, database, identity
 from routers import profile
 from routers import history
+from routers import jobs as jobs_router
+from routers import files as files_router
+import jobs
+import blobs
+import derivatives
+import quotas
+import passwords
+import design_stats
+from storage_gc import StorageCollector
+from file_serving import CachedStaticFiles
+from style_engine import StyleEngine
+from result_cache import TransformResultCache
+from storage import STORAGE_OBJECTS_DIR, get_storage
+from ingestion import normalizer
 from pathlib import Path
 import shutil
+from inference.batching import BatchScheduler
+from inference.executor import InferenceExecutor
+from inference.cache import PredictionCache, model_version
+from inference.preprocessing import ImagePreprocessor, should_rescale
+from inference.backends import load_backend, model_path, INFERENCE_BACKEND
+from inference.lifecycle import ModelHolder, watch_registry, MODEL_LAZY_LOAD, MODEL_WARMUP
+from inference.registry import ModelRegistry, MODEL_REGISTRY_WATCH_S
+from inference.cascade import CascadeModel, CASCADE_ENABLED, CASCADE_MODEL_DIR
+from contextlib import asynccontextmanager
+from starlette.concurrency import run_in_threadpool
+import hmac
 
 
 # Créer les tables
 models.Base.metadata.create_all(bind=database.engine)
+models.create_columns(database.engine)
+models.create_indexes(database.engine)
+models.backfill_design_dates(database.engine)
+
+# Statistiques par utilisateur : construites depuis l'historique au premier démarrage
+with database.SessionLocal() as _db:
+    design_stats.initialize(_db)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Préchauffage en arrière-plan : /health/ready passe à 200 quand le modèle est chaud
+    if MODEL_WARMUP:
+        classification_model.start_background(warm_up=True)
+        if cascade is not None:
+            cascade.fast.start_background(warm_up=True)
+    # Remplacement automatique quand le pointeur ACTIVE du registre change
+    if MODEL_REGISTRY_WATCH_S > 0:
+        watch_registry(
+            classification_model,
+            model_registry,
+            lambda version: model_loader(model_registry.version_dir(version)),
+            MODEL_REGISTRY_WATCH_S,
+            on_model_swap
+        )
+    # Pool de hachage bcrypt (coût calibré si BCRYPT_TARGET_MS)
+    await run_in_threadpool(passwords.hasher.start)
+    # Workers de transformation (les jobs interrompus par un redémarrage sont repris)
+    job_pool.start()
+    # Suppression périodique des images orphelines, recomptage des quotas
+    storage_collector.start()
+    yield
+    storage_collector.stop()
+    job_pool.stop()
+    derivatives.generator.shutdown()
+    passwords.hasher.shutdown()
+    if database.async_engine is not None:
+        await database.async_engine.dispose()
 
 app = FastAPI(
     title="Interior Design AI API",
     description="API complète pour classification et transformation de pièces",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 app.include_router(profile.router)
 app.include_router(history.router)
+app.include_router(jobs_router.router)
+app.include_router(files_router.router)
 
 # Mount static files for serving uploaded images
 uploads_dir = Path("uploads")
 uploads_dir.mkdir(exist_ok=True)
-app.mount("/static", StaticFiles(directory="uploads"), name="static")
+# Objets adressés par contenu : cache long ; tous les fichiers : ETag fort, 304 et Range
+# /static n'est pas authentifié :
+#   "objects" (défaut) : seulement les objets, nommés par le SHA-256 de leur contenu (introuvables
+#     sans le connaître) ; fichiers hérités (uploads/designs/original_<id>_<date>.jpg...) en 404
+#   "all" : tout uploads/ (ancien comportement, clients pas encore passés aux URLs signées)
+#   "off" : plus de /static, les clients utilisent les URLs signées (/files) et /history
+SERVE_STATIC_UPLOADS = (os.getenv("SERVE_STATIC_UPLOADS") or "objects").lower()
+# Anciennes valeurs booléennes
+SERVE_STATIC_UPLOADS = {"true": "all", "false": "off"}.get(SERVE_STATIC_UPLOADS, SERVE_STATIC_UPLOADS)
+if SERVE_STATIC_UPLOADS in ("objects", "all"):
+    static_prefixes = [os.path.relpath(STORAGE_OBJECTS_DIR, "uploads")] if SERVE_STATIC_UPLOADS == "objects" else None
+    app.mount("/static", CachedStaticFiles(directory="uploads", allowed_prefixes=static_prefixes), name="static")
 
 # Configuration CORS pour Flutter
 app.add_middleware(
@@ -39,38 +112,134 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Curseur de la page suivante de /history/all (lisible par Flutter web)
+    expose_headers=["X-Next-Cursor"],
 )
 
-# Charger le modèle de classification
-MODEL_PATH = os.path.join("model", "room_classifier.keras")
-try:
-    classification_model = tf.keras.models.load_model(MODEL_PATH)
-    print("✅ Modèle de classification chargé avec succès")
-except Exception as e:
-    print(f"❌ Erreur lors du chargement du modèle: {e}")
-    classification_model = None
-
 CLASS_NAMES = ["bathroom", "bedroom", "office", "kitchen", "living room"]
 IMG_SIZE = 224
 
+# Modèle de classification (INFERENCE_BACKEND=keras|tflite|onnx)
+# Version active du registre (model/registry/<version>/), sinon le dossier model/ historique
+model_registry = ModelRegistry()
+ACTIVE_MODEL_VERSION = model_registry.active()
+MODEL_DIR = model_registry.version_dir(ACTIVE_MODEL_VERSION) if ACTIVE_MODEL_VERSION else "model"
+MODEL_PATH = model_path(MODEL_DIR)
+
+def model_loader(model_dir: str):
+    return lambda: load_backend(model_dir)
+
+classification_model = ModelHolder(
+    model_loader(MODEL_DIR),
+    input_shape=(IMG_SIZE, IMG_SIZE, 3),
+    version=ACTIVE_MODEL_VERSION or model_version(MODEL_PATH)
+)
+
+# Sans MODEL_LAZY_LOAD, le modèle est chargé à l'import comme avant
+if not MODEL_LAZY_LOAD:
+    try:
+        classification_model.load()
+        print(f"✅ Modèle de classification chargé avec succès ({INFERENCE_BACKEND}: {MODEL_PATH})")
+    except Exception as e:
+        print(f"❌ Erreur lors du chargement du modèle: {e}")
+
+# /255 comme à l'entraînement (PREPROCESS_RESCALE, voir inference/preprocessing.py)
+preprocessor = ImagePreprocessor(
+    size=IMG_SIZE,
+    rescale=should_rescale(os.path.join(MODEL_DIR, "config.json"))
+)
+
 def preprocess_image(image_bytes: bytes):
     """Prépare l'image pour la classification"""
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    img = img.resize((IMG_SIZE, IMG_SIZE))
-    arr = np.array(img).astype(np.float32) / 255.0
-    arr = np.expand_dims(arr, axis=0)
-    return arr
+    return preprocessor(image_bytes)
+
+# Cascade optionnelle : modèle rapide d'abord, classification_model pour les cas incertains
+cascade = None
+if CASCADE_ENABLED:
+    cascade = CascadeModel(
+        ModelHolder(
+            model_loader(CASCADE_MODEL_DIR),
+            input_shape=(IMG_SIZE, IMG_SIZE, 3),
+            version="cascade"
+        ),
+        classification_model
+    )
+
+def predict_batch(batch: np.ndarray):
+    """Une seule passe du modèle pour un lot (N, 224, 224, 3) ; (prédictions, version du modèle utilisé)"""
+    if cascade is not None:
+        return cascade.predict_with_version(batch)
+    return classification_model.predict_with_version(batch)
+
+def cache_version(version: str) -> str:
+    """Les résultats de la cascade dépendent aussi de son seuil"""
+    if cascade is not None:
+        return f"{version}+cascade@{cascade.threshold}"
+    return version
+
+# Pool dédié : décodage et inférence ne bloquent pas la boucle asyncio
+inference_executor = InferenceExecutor()
+
+# File partagée : les requêtes concurrentes sont regroupées en un seul lot
+# Chaque résultat porte la version du modèle qui l'a calculé (un remplacement peut survenir entre-temps)
+batch_scheduler = BatchScheduler(predict_batch, executor=inference_executor.pool, versioned=True)
+
+# Cache des prédictions : une photo renvoyée n'est ni redécodée ni reclassifiée
+prediction_cache = PredictionCache(model_version=cache_version(classification_model.version))
+
+def on_model_swap(version: str):
+    """Appelé au moment de la bascule : invalide le cache et adapte la normalisation"""
+    prediction_cache.set_model_version(cache_version(version))
+    preprocessor.rescale = should_rescale(
+        os.path.join(model_registry.version_dir(version), "config.json")
+    )
+
+def cache_prediction(cache_key: str, preds: np.ndarray, version: str):
+    """Rangé seulement sous la clé de la version qui a calculé le résultat"""
+    if cache_key.startswith(f"{cache_version(version)}:"):
+        prediction_cache.put(cache_key, preds, version)
+
+async def classify_bytes(image_bytes: bytes):
+    """Décode puis classifie une image sans bloquer la boucle (503 si surcharge) ; (prédictions, version)"""
+    cache_key = prediction_cache.key_for(image_bytes)
+    cached = prediction_cache.get_with_version(cache_key)
+    if cached is not None:
+        return cached
+
+    async with inference_executor.slot():
+        sample = await inference_executor.run(preprocessor.decode, image_bytes)
+        preds, version = await batch_scheduler.submit(sample)
+
+    cache_prediction(cache_key, preds, version)
+    return preds, version
+
+def prediction_payload(preds: np.ndarray, version: str) -> dict:
+    """Classe, confiance et détail des probabilités pour une prédiction"""
+    class_index = int(np.argmax(preds))
+    return {
+        "class": CLASS_NAMES[class_index],
+        "confidence": round(float(preds[class_index]), 4),
+        "all_predictions": {
+            CLASS_NAMES[i]: round(float(preds[i]), 4)
+            for i in range(len(CLASS_NAMES))
+        },
+        "model_version": version
+    }
+
+# Limites de l'endpoint de classification par lot
+CLASSIFY_BATCH_MAX_FILES = int(os.getenv("CLASSIFY_BATCH_MAX_FILES", "30"))
+CLASSIFY_BATCH_MAX_TOTAL_BYTES = int(os.getenv("CLASSIFY_BATCH_MAX_TOTAL_BYTES", str(50 * 1024 * 1024)))
 
 # ============= ENDPOINTS D'AUTHENTIFICATION =============
 
 @app.post("/api/auth/register", response_model=schemas.Token, tags=["Authentication"])
-async def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(database.get_async_db)):
     """Inscription d'un nouvel utilisateur"""
     try:
         print(f"📝 Tentative d'inscription: {user.email}, {user.username}")
         
         # Vérifier si l'email existe déjà
-        db_user = crud.get_user_by_email(db, email=user.email)
+        db_user = await crud.get_user_by_email(db, email=user.email)
         if db_user:
             print(f"⚠️ Email déjà existant: {user.email}")
             raise HTTPException(
@@ -79,7 +248,7 @@ async def register(user: schemas.UserCreate, db: Session = Depends(database.get_
             )
         
         # Vérifier si le username existe déjà
-        db_user = crud.get_user_by_username(db, username=user.username)
+        db_user = await crud.get_user_by_username(db, username=user.username)
         if db_user:
             print(f"⚠️ Username déjà existant: {user.username}")
             raise HTTPException(
@@ -88,16 +257,13 @@ async def register(user: schemas.UserCreate, db: Session = Depends(database.get_
             )
         
         print(f"🔐 Création de l'utilisateur...")
-        # Créer l'utilisateur
-        new_user = crud.create_user(db=db, user=user)
+        # Hachage dans le pool bcrypt : la boucle reste libre (503 si saturé)
+        new_user = await crud.create_user(db=db, user=user)
         print(f"✅ Utilisateur créé: ID={new_user.id}")
         
         print(f"🔑 Génération du token...")
         # Générer le token
-        access_token = auth.create_access_token(
-            data={"sub": new_user.email},
-            expires_delta=timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
-        )
+        access_token = auth.create_user_token(new_user)
         print(f"✅ Token généré")
         
         return {"access_token": access_token, "token_type": "bearer"}
@@ -114,9 +280,9 @@ async def register(user: schemas.UserCreate, db: Session = Depends(database.get_
             detail=f"Erreur serveur: {str(e)}"
         )
 @app.post("/api/auth/login", response_model=schemas.Token, tags=["Authentication"])
-def login(user: schemas.UserLogin, db: Session = Depends(database.get_db)):
+async def login(user: schemas.UserLogin, db: AsyncSession = Depends(database.get_async_db)):
     """Connexion utilisateur"""
-    db_user = crud.authenticate_user(db, user.email, user.password)
+    db_user = await crud.authenticate_user(db, user.email, user.password)
     if not db_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -124,24 +290,22 @@ def login(user: schemas.UserLogin, db: Session = Depends(database.get_db)):
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token = auth.create_access_token(
-        data={"sub": db_user.email},
-        expires_delta=timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
-    )
+    # Coût bcrypt relevé depuis le dernier hachage : rehash avec le mot de passe en clair,
+    # remis à une connexion ultérieure quand le pool est déjà occupé. La version de session
+    # ne dépend pas du hash : les autres sessions de l'utilisateur restent valides.
+    if passwords.hasher.needs_rehash(db_user.hashed_password) and not passwords.hasher.busy:
+        db_user.hashed_password = await passwords.hasher.hash(user.password)
+        await db.commit()
+        passwords.hasher.rehashed += 1
+    
+    access_token = auth.create_user_token(db_user)
     
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/api/auth/me", response_model=schemas.User, tags=["Authentication"])
-def get_current_user(
-    token: str = Depends(auth.oauth2_scheme),
-    db: Session = Depends(database.get_db)
-):
+def get_current_user(current_user: identity.Identity = Depends(auth.get_current_user)):
     """Récupérer les informations de l'utilisateur connecté"""
-    email = auth.verify_token(token)
-    user = crud.get_user_by_email(db, email=email)
-    if user is None:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-    return user
+    return current_user
 
 # ============= ENDPOINTS DE CLASSIFICATION =============
 
@@ -154,7 +318,7 @@ async def classify_room_protected(
     # Vérifier le token
     auth.verify_token(token)
     
-    if classification_model is None:
+    if classification_model.failed:
         raise HTTPException(
             status_code=500,
             detail="Le modèle de classification n'est pas disponible"
@@ -162,26 +326,95 @@ async def classify_room_protected(
     
     try:
         image_bytes = await file.read()
-        img = preprocess_image(image_bytes)
-        preds = classification_model.predict(img)
-        class_index = int(np.argmax(preds))
-        confidence = float(np.max(preds))
+        preds, version = await classify_bytes(image_bytes)
+        return JSONResponse(prediction_payload(preds, version))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
 
-        return JSONResponse({
-            "class": CLASS_NAMES[class_index],
-            "confidence": round(confidence, 4),
-            "all_predictions": {
-                CLASS_NAMES[i]: round(float(preds[0][i]), 4)
-                for i in range(len(CLASS_NAMES))
-            }
-        })
+async def _decode_or_error(image_bytes: bytes):
+    """Décode une image dans le pool ; renvoie (échantillon, None) ou (None, erreur)"""
+    try:
+        return await inference_executor.run(preprocessor.decode, image_bytes), None
+    except Exception as e:
+        return None, f"Image illisible: {str(e)}"
+
+@app.post("/api/classify-room/batch", tags=["Classification"])
+async def classify_room_batch(
+    files: List[UploadFile] = File(...),
+    token: str = Depends(auth.oauth2_scheme)
+):
+    """Classifier plusieurs photos en une requête (résultats dans l'ordre d'envoi)"""
+    auth.verify_token(token)
+
+    if classification_model.failed:
+        raise HTTPException(
+            status_code=500,
+            detail="Le modèle de classification n'est pas disponible"
+        )
+
+    if len(files) > CLASSIFY_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Trop de fichiers: {len(files)} (maximum {CLASSIFY_BATCH_MAX_FILES})"
+        )
+
+    # Lire les fichiers en vérifiant la taille totale au fur et à mesure
+    contents = []
+    total_bytes = 0
+    for file in files:
+        image_bytes = await file.read()
+        total_bytes += len(image_bytes)
+        if total_bytes > CLASSIFY_BATCH_MAX_TOTAL_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Taille totale trop grande (maximum {CLASSIFY_BATCH_MAX_TOTAL_BYTES} octets)"
+            )
+        contents.append(image_bytes)
+
+    results = [None] * len(files)
+    cache_keys = [prediction_cache.key_for(image_bytes) for image_bytes in contents]
+    pending = []
+    for i, cache_key in enumerate(cache_keys):
+        cached = prediction_cache.get_with_version(cache_key)
+        if cached is not None:
+            results[i] = prediction_payload(*cached)
+        else:
+            pending.append(i)
+
+    try:
+        async with inference_executor.slot():
+            # Décodage en parallèle, puis un seul passage dans la file de batching
+            decoded = await asyncio.gather(*[_decode_or_error(contents[i]) for i in pending])
+            valid = []
+            for i, (sample, error) in zip(pending, decoded):
+                if error is not None:
+                    results[i] = {"error": error}
+                else:
+                    valid.append((i, sample))
+            all_preds = await batch_scheduler.submit_many([sample for _, sample in valid])
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
 
+    for (i, _), (preds, version) in zip(valid, all_preds):
+        cache_prediction(cache_keys[i], preds, version)
+        results[i] = prediction_payload(preds, version)
+
+    return {
+        "count": len(files),
+        "results": [
+            {"filename": file.filename, **result}
+            for file, result in zip(files, results)
+        ]
+    }
+
 @app.post("/predict", tags=["Classification"])
 async def predict_public(file: UploadFile = File(...)):
     """Endpoint public de classification (pour tests, sans authentification)"""
-    if classification_model is None:
+    if classification_model.failed:
         raise HTTPException(
             status_code=500,
             detail="Le modèle de classification n'est pas disponible"
@@ -189,84 +422,96 @@ async def predict_public(file: UploadFile = File(...)):
     
     try:
         image_bytes = await file.read()
-        img = preprocess_image(image_bytes)
-        preds = classification_model.predict(img)
+        preds, version = await classify_bytes(image_bytes)
         class_index = int(np.argmax(preds))
         confidence = float(np.max(preds))
 
         return JSONResponse({
             "class": CLASS_NAMES[class_index],
-            "confidence": round(confidence, 4)
+            "confidence": round(confidence, 4),
+            "model_version": version
         })
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
 
 # ============= ENDPOINT DE TRANSFORMATION AI =============
 
+# Moteur de styles CPU et pool de workers qui exécute les transformations en dehors des requêtes
+style_engine = StyleEngine()
+transform_cache = TransformResultCache(engine_version=style_engine.version)
+job_pool = jobs.JobWorkerPool(transform_fn=transform_cache.wrap(style_engine.transform_file))
+storage_collector = StorageCollector()
+
+
+def restore_cached_transform(storage, cache_key: str):
+    """Résultat en cache rangé dans le stockage, ou None (appel bloquant)"""
+    output_path = storage.temp_path(".jpg")
+    if not transform_cache.restore(cache_key, output_path):
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return None
+    return storage.ingest_file(output_path, ".jpg")
+
 @app.post("/api/transform-room", tags=["Transformation"])
 async def transform_room(
     file: UploadFile = File(...),
     style: str = Form(...),
     room_type: str = Form(...),
-    token: str = Depends(auth.oauth2_scheme),
-    db: Session = Depends(database.get_db)  # ← AJOUTER db
+    priority: int = Form(0),
+    current_user: identity.Identity = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(database.get_async_db),
+    storage = Depends(get_storage)
 ):
-    """Transformer une pièce avec le style demandé"""
-    
-    # Vérifier le token et récupérer l'utilisateur
-    email = auth.verify_token(token)
-    current_user = crud.get_user_by_email(db, email=email)
+    """Soumettre une transformation : renvoie immédiatement un job à suivre"""
     
-    if not current_user:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+    # Quota déjà atteint : refusé avant de lire l'image
+    await db.run_sync(quotas.check, current_user.id)
     
-    # Créer le dossier pour sauvegarder les images
-    uploads_dir = Path("uploads/designs")
-    uploads_dir.mkdir(parents=True, exist_ok=True)
+    # Sauvegarder l'image originale normalisée (orientée, plafonnée, sans métadonnées)
+    original = await normalizer.save_upload(storage, file)
+    # L'image générée, comptée à la fin du job, a une taille comparable à l'originale
+    await db.run_sync(quotas.check, current_user.id, 2 * original.size)
+    await db.run_sync(blobs.register, original)
     
-    # Sauvegarder l'image originale
-    timestamp = int(datetime.utcnow().timestamp())
-    original_filename = f"original_{current_user.id}_{timestamp}.jpg"
-    original_path = uploads_dir / original_filename
+    # Même photo, même style, même pièce : le résultat existant est réutilisé sans recalcul
+    cache_key = transform_cache.key_for(original.sha256, style, room_type)
+    generated = await run_in_threadpool(restore_cached_transform, storage, cache_key)
+    cached = generated is not None
+    if cached:
+        await db.run_sync(blobs.register, generated)
     
-    # Lire et sauvegarder l'image
-    image_data = await file.read()
-    with original_path.open("wb") as f:
-        f.write(image_data)
-    
-    # TODO: Intégrer votre modèle de transformation Stable Diffusion ici
-    # Pour l'instant, on copie l'image originale comme "image générée"
-    generated_filename = f"generated_{current_user.id}_{timestamp}.jpg"
-    generated_path = uploads_dir / generated_filename
-    
-    # Temporaire : copier l'image originale
-    import shutil
-    shutil.copy(str(original_path), str(generated_path))
-    
-    # SAUVEGARDER DANS L'HISTORIQUE
-    new_design = models.DesignHistory(
+    # Sinon le worker écrit l'image générée et enregistre le design dans l'historique
+    job = await db.run_sync(
+        jobs.create_job,
         user_id=current_user.id,
-        original_image_path=str(original_path),
-        generated_image_path=str(generated_path),
-        room_type=room_type,
+        original_image_path=original.path,
+        generated_image_path=generated.path if cached else None,
         style=style,
-        confidence=None,  # Sera rempli après classification
-        is_favorite=False
+        room_type=room_type,
+        priority=priority
     )
-    
-    db.add(new_design)
-    db.commit()
-    db.refresh(new_design)
+    # Terminé directement sauf si un worker a déjà réservé le job entre-temps
+    if cached and await db.run_sync(jobs.complete_job, job) is not None:
+        derivatives.generator.submit(job.original_image_path, job.generated_image_path)
+    else:
+        cached = False
+        job_pool.notify()
     
     return {
         "success": True,
-        "message": "Design créé et sauvegardé",
-        "design_id": new_design.id,
-        "user_email": email,
+        "message": "Transformation terminée (cache)" if cached else "Transformation en file d'attente",
+        "job_id": job.id,
+        "status": job.status,
+        "cached": cached,
+        "design_id": job.design_id,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+        "user_email": current_user.email,
         "style": style,
         "room_type": room_type,
-        "original_image": str(original_path),
-        "generated_image": str(generated_path)
+        "original_image": original.path
     }
 
 # ============= ENDPOINTS D'INFORMATION =============
@@ -277,7 +522,7 @@ def root():
         "message": "Interior Design AI API",
         "version": "1.0.0",
         "status": "running",
-        "model_loaded": classification_model is not None,
+        "model_loaded": classification_model.model is not None,
         "endpoints": {
             "auth": [
                 "POST /api/auth/register",
@@ -286,10 +531,14 @@ def root():
             ],
             "classification": [
                 "POST /api/classify-room (protected)",
-                "POST /predict (public)"
+                "POST /api/classify-room/batch (protected)",
+                "POST /predict (public)",
+                "GET /api/inference/stats"
             ],
             "transformation": [
-                "POST /api/transform-room (protected)"
+                "POST /api/transform-room (protected)",
+                "GET /jobs/{job_id} (protected)",
+                "GET /jobs/{job_id}/events (protected, SSE)"
             ]
         }
     }
@@ -298,7 +547,92 @@ def root():
 def health_check():
     return {
         "status": "healthy",
-        "model_loaded": classification_model is not None
+        "model_loaded": classification_model.model is not None,
+        "model_state": classification_model.state,
+        "model_version": classification_model.version,
+        "inference_backend": INFERENCE_BACKEND
+    }
+
+@app.get("/health/live", tags=["Info"])
+def liveness():
+    """Liveness : le processus répond"""
+    return {"status": "alive"}
+
+@app.get("/health/ready", tags=["Info"])
+def readiness():
+    """Readiness : prêt à recevoir du trafic uniquement quand le modèle est chaud"""
+    if MODEL_WARMUP:
+        ready = classification_model.ready
+    else:
+        ready = not classification_model.failed
+    return JSONResponse(
+        {
+            "status": "ready" if ready else "not_ready",
+            "model": classification_model.status()
+        },
+        status_code=200 if ready else 503
+    )
+
+# ============= ADMINISTRATION DU MODÈLE =============
+
+# Jeton partagé pour les endpoints d'administration (désactivés si vide)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def require_admin(x_admin_token: str = Header(None)):
+    if not ADMIN_TOKEN or not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Accès administrateur requis")
+
+@app.get("/api/admin/models", tags=["Admin"], dependencies=[Depends(require_admin)])
+def list_model_versions():
+    """Versions du registre et état du modèle servi"""
+    return {
+        "registry": model_registry.describe(),
+        "model": classification_model.status()
+    }
+
+@app.post("/api/admin/models/activate", tags=["Admin"], status_code=202, dependencies=[Depends(require_admin)])
+def activate_model_version(version: str):
+    """Active une version : chargement et préchauffage en arrière-plan, puis bascule sans interruption"""
+    try:
+        if not model_registry.exists(version):
+            raise HTTPException(status_code=404, detail=f"Version inconnue: {version}")
+        if classification_model.swapping:
+            raise RuntimeError("Un remplacement de modèle est déjà en cours")
+        
+        def on_activated(version: str):
+            # ACTIVE ne change qu'une fois la version chargée et préchauffée : un échec laisse
+            # le pointeur (suivi par les autres workers et au redémarrage) sur l'ancienne version
+            model_registry.set_active(version)
+            on_model_swap(version)
+        
+        classification_model.swap_in_background(
+            model_loader(model_registry.version_dir(version)),
+            version,
+            on_activated
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    return {"message": "Remplacement du modèle lancé", "version": version}
+
+@app.get("/api/inference/stats", tags=["Info"])
+def inference_stats():
+    """Statistiques de la file de batching, du pool d'inférence, du cache, de la cascade et des transformations"""
+    return {
+        "batching": batch_scheduler.stats(),
+        "executor": inference_executor.stats(),
+        "cache": prediction_cache.stats(),
+        "cascade": cascade.stats() if cascade is not None else None,
+        "jobs": job_pool.stats(),
+        "style_engine": style_engine.stats(),
+        "transform_cache": transform_cache.stats(),
+        "derivatives": derivatives.generator.stats(),
+        "ingestion": normalizer.stats(),
+        "storage_gc": storage_collector.stats(),
+        "identity": identity.cache.stats(),
+        "passwords": passwords.hasher.stats()
     }
 
 if __name__ == "__main__":
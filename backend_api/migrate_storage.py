@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Migration des images existantes vers le stockage adressé par contenu
+
+Les chemins hérités (uploads/designs/original_<user>_<timestamp>.jpg, photos de
+profil, jobs) sont rangés dans uploads/objects/ab/cd/<sha256>.<ext>, les lignes
+sont mises à jour et les références comptées. Relancer le script est sans effet
+sur les lignes déjà migrées.
+
+Usage:
+    python migrate_storage.py [--dry-run] [--delete-legacy]
+"""
+
+import argparse
+import os
+
+import blobs
+import database
+import models
+from storage import LocalStorage, object_sha256
+
+# (modèle, colonne, la ligne garde-t-elle une référence sur l'image)
+MIGRATED_COLUMNS = [
+    (models.DesignHistory, "original_image_path", True),
+    (models.DesignHistory, "generated_image_path", True),
+    (models.UserProfile, "profile_picture", True),
+    (models.TransformJob, "original_image_path", False),
+    (models.TransformJob, "generated_image_path", False),
+]
+
+
+def legacy_file(path: str) -> str:
+    """Chemins enregistrés sous Windows : séparateurs "\\" """
+    return path.replace("\\", "/")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migration vers le stockage adressé par contenu")
+    parser.add_argument("--dry-run", action="store_true", help="Affiche ce qui serait migré")
+    parser.add_argument("--delete-legacy", action="store_true",
+                        help="Supprime les anciens fichiers une fois toutes les lignes migrées")
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=database.engine)
+    storage = LocalStorage()
+    db = database.SessionLocal()
+
+    migrated = {}  # ancien fichier -> objet
+    missing = set()
+    rows = 0
+
+    print("=" * 60)
+    print("📦 MIGRATION DU STOCKAGE DES IMAGES")
+    print("=" * 60)
+
+    try:
+        for model, column, referenced in MIGRATED_COLUMNS:
+            attr = getattr(model, column)
+            for row in db.query(model).filter(attr.isnot(None)).all():
+                path = getattr(row, column)
+                if object_sha256(path) is not None:
+                    continue
+
+                source = legacy_file(path)
+                if source not in migrated:
+                    if not os.path.exists(source):
+                        if source not in missing:
+                            print(f"⚠️  Fichier introuvable: {path}")
+                        missing.add(source)
+                        continue
+                    if args.dry_run:
+                        print(f"   {model.__tablename__}.{column} #{row.id}: {path}")
+                        migrated[source] = None
+                        rows += 1
+                        continue
+                    ext = os.path.splitext(source)[1].lower() or ".jpg"
+                    stored = storage.ingest_file(source, ext, move=False)
+                    blobs.register(db, stored)
+                    migrated[source] = stored
+                elif args.dry_run:
+                    rows += 1
+                    continue
+
+                stored = migrated[source]
+                setattr(row, column, stored.path)
+                if referenced:
+                    blobs.acquire(db, stored.path)
+                db.commit()
+                rows += 1
+    finally:
+        db.close()
+
+    print(f"\n✅ Lignes {'à migrer' if args.dry_run else 'migrées'}: {rows}")
+    print(f"📁 Fichiers distincts: {len(migrated)}")
+    if not args.dry_run:
+        distinct = {stored.sha256 for stored in migrated.values()}
+        print(f"♻️  Objets après déduplication: {len(distinct)}")
+    if missing:
+        print(f"⚠️  Fichiers introuvables: {len(missing)}")
+
+    if args.delete_legacy and not args.dry_run and not missing:
+        for source in migrated:
+            os.remove(source)
+        print(f"🗑️  Anciens fichiers supprimés: {len(migrated)}")
+    elif args.delete_legacy and missing:
+        print("⚠️  Anciens fichiers conservés : certaines lignes n'ont pas pu être migrées")
+
+
+if __name__ == "__main__":
+    main()
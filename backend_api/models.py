@@ -1,5 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Index, desc, func, select, update
+from sqlalchemy import inspect
 from sqlalchemy.orm import relationship
+from sqlalchemy.schema import CreateColumn
 from database import Base
 from datetime import datetime
 
@@ -11,6 +13,9 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     username = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
+    # +1 à chaque changement de mot de passe : version de session portée par les tokens
+    # (indépendante du hash, qui change aussi quand le coût bcrypt est relevé)
+    password_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relation avec UserProfile
@@ -34,6 +39,13 @@ class UserProfile(Base):
 
 class DesignHistory(Base):
     __tablename__ = "design_history"
+    __table_args__ = (
+        # Historique d'un utilisateur, du plus récent au plus ancien (pagination par curseur ;
+        # id départage les designs créés à la même seconde, sans tri supplémentaire)
+        Index("ix_design_history_user_created", "user_id", desc("created_at"), desc("id")),
+        # Favoris d'un utilisateur
+        Index("ix_design_history_user_favorite_created", "user_id", "is_favorite", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -43,7 +55,101 @@ class DesignHistory(Base):
     style = Column(String, nullable=True)  # Style choisi (modern, minimalist, etc.)
     confidence = Column(String, nullable=True)  # Confiance de la classification
     is_favorite = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # Clé de la pagination par curseur : jamais NULL (voir backfill_design_dates)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
     # Relation avec l'utilisateur
     user = relationship("User", back_populates="designs")
+
+
+class TransformJob(Base):
+    __tablename__ = "transform_jobs"
+    __table_args__ = (
+        # Sélection du prochain job : file d'attente par priorité puis ancienneté
+        Index("ix_transform_jobs_status_priority", "status", "priority", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    status = Column(String, nullable=False, default="queued")  # queued, running, done, failed
+    priority = Column(Integer, nullable=False, default=0)
+    style = Column(String, nullable=True)
+    room_type = Column(String, nullable=True)
+    original_image_path = Column(String, nullable=False)
+    generated_image_path = Column(String, nullable=True)  # renseigné quand le job se termine
+    progress = Column(Integer, nullable=False, default=0)  # 0 à 100
+    message = Column(String, nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    worker_id = Column(String, nullable=True)
+    design_id = Column(Integer, ForeignKey("design_history.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)  # bail du worker : repris s'il expire
+    finished_at = Column(DateTime, nullable=True)
+
+
+class ImageBlob(Base):
+    __tablename__ = "image_blobs"
+    
+    sha256 = Column(String(64), primary_key=True)  # le chemin est dérivé du contenu (extension comprise)
+    path = Column(String, unique=True, nullable=False)
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)  # designs et photos de profil qui l'utilisent
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class UserStorage(Base):
+    __tablename__ = "user_storage"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    used_bytes = Column(Integer, nullable=False, default=0)  # images de ses designs et photo de profil
+    quota_bytes = Column(Integer, nullable=True)  # None : quota par défaut (STORAGE_QUOTA_BYTES)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class UserDesignStat(Base):
+    __tablename__ = "user_design_stats"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    dimension = Column(String, primary_key=True)  # total, favorites, style, room_type
+    value = Column(String, primary_key=True, default="")  # style ou pièce ; "" pour les totaux
+    count = Column(Integer, nullable=False, default=0)
+
+
+def create_columns(bind):
+    """create_all n'ajoute pas les colonnes ajoutées à une table qui existe déjà (valeur par défaut requise)"""
+    existing_tables = set(inspect(bind).get_table_names())
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=connection.dialect)
+                    connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+
+
+def create_indexes(bind):
+    """create_all ne crée pas les index ajoutés à une table qui existe déjà"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+
+def backfill_design_dates(bind) -> int:
+    """Designs sans date (tables créées avant nullable=False) : date d'inscription de l'utilisateur
+
+    Un created_at NULL ne peut pas servir de curseur et sort de la pagination par clé ;
+    SQLite ne sait pas ajouter NOT NULL à une colonne existante, les lignes sont donc
+    complétées au démarrage.
+    """
+    signed_up = select(User.created_at).where(User.id == DesignHistory.user_id).scalar_subquery()
+    with bind.begin() as connection:
+        return connection.execute(
+            update(DesignHistory)
+            .where(DesignHistory.created_at.is_(None))
+            .values(created_at=func.coalesce(signed_up, datetime(1970, 1, 1)))
+        ).rowcount
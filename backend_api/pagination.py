@@ -0,0 +1,87 @@
+# backend_api/pagination.py - Pagination par curseur (keyset) de l'historique
+#
+# Une page reprend après la dernière ligne vue, (created_at, id), au lieu de sauter
+# `offset` lignes : avec l'index (user_id, created_at DESC) le coût d'une page ne
+# dépend que de sa taille, quelle que soit sa profondeur.
+
+import base64
+import binascii
+import os
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from models import DesignHistory
+
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "50"))
+# Taille de page maximale : un limit plus grand est ramené à cette borne (comme /jobs)
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "200"))
+
+
+def encode_cursor(created_at: datetime, design_id: int) -> str:
+    """Curseur opaque pour le client : base64url de "<created_at ISO>|<id>" """
+    raw = f"{created_at.isoformat()}|{design_id}".encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, design_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(design_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def history_query(db: Session, user_id: int, favorites_only: bool = False):
+    query = db.query(DesignHistory).filter(DesignHistory.user_id == user_id)
+    if favorites_only:
+        query = query.filter(DesignHistory.is_favorite == True)
+    return query
+
+
+def history_offset_page(
+    db: Session,
+    user_id: int,
+    limit: int = HISTORY_PAGE_SIZE,
+    offset: int = 0,
+    favorites_only: bool = False,
+) -> List[DesignHistory]:
+    """Ancienne pagination par offset (clients existants) : coût proportionnel à la profondeur"""
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    return history_query(db, user_id, favorites_only).order_by(
+        DesignHistory.created_at.desc(),
+        DesignHistory.id.desc()
+    ).offset(max(0, offset)).limit(limit).all()
+
+
+def history_page(
+    db: Session,
+    user_id: int,
+    limit: int = HISTORY_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    favorites_only: bool = False,
+) -> Tuple[List[DesignHistory], Optional[str]]:
+    """Une page de designs, du plus récent au plus ancien, et le curseur de la suivante (None à la fin)"""
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    query = history_query(db, user_id, favorites_only)
+    if cursor:
+        created_at, design_id = decode_cursor(cursor)
+        # Comparaison de tuples : parcours de l'index à partir du curseur
+        query = query.filter(
+            tuple_(DesignHistory.created_at, DesignHistory.id) < tuple_(created_at, design_id)
+        )
+
+    # Une ligne de plus pour savoir s'il existe une page suivante
+    rows = query.order_by(
+        DesignHistory.created_at.desc(),
+        DesignHistory.id.desc()
+    ).limit(limit + 1).all()
+
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
@@ -0,0 +1,183 @@
+# backend_api/passwords.py - Hachage bcrypt dans un pool de workers borné
+#
+# bcrypt occupe un cœur pendant ~250 ms : exécuté sur la boucle asyncio, une vague
+# d'inscriptions ou de connexions bloque toutes les autres requêtes. Les calculs partent
+# dans un pool dédié (bcrypt relâche le GIL : les workers tournent en parallèle sans
+# processus à démarrer à côté du modèle TensorFlow), la file est bornée et délestée en 503.
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import bcrypt
+from fastapi import HTTPException, status
+
+# Coût bcrypt (2^rounds itérations) ; BCRYPT_TARGET_MS > 0 le calibre au démarrage
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", "0"))
+BCRYPT_MIN_ROUNDS = int(os.getenv("BCRYPT_MIN_ROUNDS", "10"))
+BCRYPT_MAX_ROUNDS = int(os.getenv("BCRYPT_MAX_ROUNDS", "14"))
+# Workers de hachage et calculs autorisés à attendre au-delà
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(2, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+PASSWORD_HASH_RETRY_AFTER_S = int(os.getenv("PASSWORD_HASH_RETRY_AFTER_S", "2"))
+
+BCRYPT_MAX_BYTES = 72
+
+
+def _password_bytes(password: str) -> bytes:
+    """bcrypt ignore au-delà de 72 octets : tronqué sans couper un caractère UTF-8"""
+    return str(password).encode("utf-8")[:BCRYPT_MAX_BYTES].decode("utf-8", errors="ignore").encode("utf-8")
+
+
+def hash_rounds(hashed_password: str) -> Optional[int]:
+    """Coût d'un hash bcrypt ("$2b$12$...")"""
+    try:
+        return int(hashed_password.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+# ============= EXÉCUTÉ DANS LES WORKERS DU POOL =============
+
+def _hash(password: str, rounds: int) -> Tuple[str, float]:
+    start = time.perf_counter()
+    hashed = bcrypt.hashpw(_password_bytes(password), bcrypt.gensalt(rounds)).decode()
+    return hashed, (time.perf_counter() - start) * 1000
+
+
+def _verify(password: str, hashed_password: str) -> Tuple[bool, float]:
+    start = time.perf_counter()
+    try:
+        valid = bcrypt.checkpw(_password_bytes(password), hashed_password.encode())
+    except ValueError:
+        valid = False
+    return valid, (time.perf_counter() - start) * 1000
+
+
+def _calibrate(target_ms: float, min_rounds: int, max_rounds: int) -> int:
+    """Plus grand coût dont un hachage tient dans target_ms sur cette machine"""
+    rounds = min_rounds
+    _, elapsed_ms = _hash("calibration", rounds)
+    # Chaque round de plus double le temps
+    while rounds < max_rounds and elapsed_ms * 2 <= target_ms:
+        rounds += 1
+        elapsed_ms *= 2
+    return rounds
+
+
+# ============= CÔTÉ API =============
+
+class PasswordHasher:
+    """Pool bcrypt : concurrence bornée, délestage, rehash quand le coût change"""
+
+    def __init__(
+        self,
+        rounds: int = BCRYPT_ROUNDS,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_queue: int = PASSWORD_HASH_MAX_QUEUE,
+        retry_after_s: int = PASSWORD_HASH_RETRY_AFTER_S,
+        target_ms: float = BCRYPT_TARGET_MS,
+    ):
+        self.rounds = rounds
+        self.workers = max(1, int(workers))
+        self.max_queue = max(0, int(max_queue))
+        self.retry_after_s = retry_after_s
+        self.target_ms = target_ms
+
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.total_wait_ms = 0.0
+        self.total_run_ms = 0.0
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._pool
+
+    def start(self):
+        """Crée le pool (et calibre le coût si BCRYPT_TARGET_MS) ; bloquant"""
+        pool = self._executor()
+        if self.target_ms > 0:
+            self.rounds = pool.submit(_calibrate, self.target_ms,
+                                      BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS).result()
+            print(f"🔐 Coût bcrypt calibré : {self.rounds} rounds (~{self.target_ms:.0f} ms)")
+
+    def shutdown(self):
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def busy(self) -> bool:
+        """Tous les workers occupés : un travail facultatif (rehash) peut attendre"""
+        return self._pending >= self.workers
+
+    def _overloaded(self) -> HTTPException:
+        self.rejected += 1
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Trop de connexions simultanées, réessayez dans un instant",
+            headers={"Retry-After": str(self.retry_after_s)},
+        )
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.workers + self.max_queue:
+            raise self._overloaded()
+        self._pending += 1
+        self.peak_pending = max(self.peak_pending, self._pending)
+        start = time.perf_counter()
+        try:
+            result, run_ms = await asyncio.wrap_future(self._executor().submit(fn, *args))
+        finally:
+            self._pending -= 1
+        self.completed += 1
+        self.total_run_ms += run_ms
+        self.total_wait_ms += max(0.0, (time.perf_counter() - start) * 1000 - run_ms)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password, self.rounds)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(_verify, password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """Hash produit avec un coût inférieur au coût configuré
+
+        Un coût supérieur est gardé : des workers calibrés différemment (BCRYPT_TARGET_MS,
+        calibré par processus) ne se renvoient pas le hash à chaque connexion.
+        """
+        rounds = hash_rounds(hashed_password)
+        return rounds is None or rounds < self.rounds
+
+    def hash_blocking(self, password: str) -> str:
+        """Pour le code synchrone (scripts, pool de threads) : même pool, appel bloquant"""
+        return self._executor().submit(_hash, password, self.rounds).result()[0]
+
+    def verify_blocking(self, password: str, hashed_password: str) -> bool:
+        return self._executor().submit(_verify, password, hashed_password).result()[0]
+
+    def stats(self) -> dict:
+        completed = max(1, self.completed)
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "peak_pending": self.peak_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "avg_wait_ms": round(self.total_wait_ms / completed, 1),
+            "avg_run_ms": round(self.total_run_ms / completed, 1),
+        }
+
+
+hasher = PasswordHasher()
@@ -0,0 +1,128 @@
+# backend_api/quotas.py - Espace de stockage utilisé par chaque utilisateur et quotas
+#
+# Chaque référence est comptée : un design compte ses deux images, le profil sa photo.
+# Deux utilisateurs qui envoient la même photo paient chacun sa taille, même si l'objet
+# n'est stocké qu'une fois.
+
+import os
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from models import DesignHistory, ImageBlob, UserProfile, UserStorage
+from storage import STORAGE_ROOT, object_sha256
+
+# Quota par défaut par utilisateur (0 : illimité) ; surchargé par user_storage.quota_bytes
+STORAGE_QUOTA_BYTES = int(os.getenv("STORAGE_QUOTA_BYTES", str(500 * 1024 * 1024)))
+
+
+def path_size(db: Session, path: Optional[str], sizes: Optional[dict] = None) -> int:
+    """Taille d'une image référencée : table des objets, sinon le fichier hérité (0 s'il manque)"""
+    if not path:
+        return 0
+    if sizes is not None and path in sizes:
+        return sizes[path]
+    sha256 = object_sha256(path)
+    if sha256 is not None and sizes is None:
+        size = db.query(ImageBlob.size).filter(ImageBlob.sha256 == sha256).scalar()
+        if size is not None:
+            return size
+    try:
+        return os.path.getsize(os.path.join(STORAGE_ROOT, path.replace("\\", "/")))
+    except OSError:
+        return 0
+
+
+def compute_usage(db: Session, user_id: int, sizes: Optional[dict] = None) -> int:
+    """Recalcule l'espace utilisé à partir des lignes qui référencent des images"""
+    paths = []
+    for original, generated in db.query(
+        DesignHistory.original_image_path, DesignHistory.generated_image_path
+    ).filter(DesignHistory.user_id == user_id):
+        paths += [original, generated]
+    paths += [picture for (picture,) in db.query(UserProfile.profile_picture).filter(
+        UserProfile.user_id == user_id, UserProfile.profile_picture.isnot(None)
+    )]
+    return sum(path_size(db, path, sizes) for path in paths)
+
+
+def _account(db: Session, user_id: int) -> UserStorage:
+    """Ligne de l'utilisateur, créée à partir de l'existant au premier accès (non committée)"""
+    account = db.get(UserStorage, user_id)
+    if account is None:
+        db.flush()
+        account = UserStorage(user_id=user_id, used_bytes=compute_usage(db, user_id))
+        db.add(account)
+        db.flush()
+    return account
+
+
+def quota_for(account: UserStorage) -> int:
+    return account.quota_bytes if account.quota_bytes is not None else STORAGE_QUOTA_BYTES
+
+
+def check(db: Session, user_id: int, incoming_bytes: int = 0):
+    """413 si les images reçues dépassent le quota de l'utilisateur"""
+    account = _account(db, user_id)
+    quota = quota_for(account)
+    if quota and account.used_bytes + incoming_bytes > quota:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Quota de stockage dépassé ({account.used_bytes / 1024 / 1024:.1f} MB utilisés "
+                   f"sur {quota / 1024 / 1024:.1f} MB)"
+        )
+
+
+def _add(db: Session, user_id: int, delta: int):
+    if db.get(UserStorage, user_id) is None:
+        # Créée après la modification : le recalcul en tient déjà compte
+        _account(db, user_id)
+        return
+    db.query(UserStorage).filter(UserStorage.user_id == user_id).update({
+        "used_bytes": UserStorage.used_bytes + delta,
+        "updated_at": datetime.utcnow()
+    }, synchronize_session=False)
+
+
+def charge(db: Session, user_id: int, *paths: Optional[str]):
+    """Ajoute les images nouvellement référencées ; à committer avec la ligne qui les référence"""
+    _add(db, user_id, sum(path_size(db, path) for path in paths))
+
+
+def refund(db: Session, user_id: int, *paths: Optional[str]):
+    """Retire les images qui ne sont plus référencées ; à committer avec la modification"""
+    _add(db, user_id, -sum(path_size(db, path) for path in paths))
+
+
+def usage(db: Session, user_id: int) -> dict:
+    account = _account(db, user_id)
+    db.commit()
+    quota = quota_for(account)
+    return {
+        "used_bytes": account.used_bytes,
+        "quota_bytes": quota or None,
+        "available_bytes": max(quota - account.used_bytes, 0) if quota else None,
+        "used_percent": round(100 * account.used_bytes / quota, 1) if quota else None,
+    }
+
+
+def rebuild(db: Session) -> int:
+    """Recalcule tous les comptes (dérive après crash, suppressions manuelles) ; renvoie le nombre corrigé"""
+    fixed = 0
+    sizes = dict(db.query(ImageBlob.path, ImageBlob.size))
+    user_ids = {user_id for (user_id,) in db.query(DesignHistory.user_id).distinct()}
+    user_ids |= {user_id for (user_id,) in db.query(UserProfile.user_id)}
+    user_ids |= {user_id for (user_id,) in db.query(UserStorage.user_id)}
+    for user_id in user_ids:
+        used = compute_usage(db, user_id, sizes)
+        account = db.get(UserStorage, user_id)
+        if account is None:
+            db.add(UserStorage(user_id=user_id, used_bytes=used))
+            fixed += 1
+        elif account.used_bytes != used:
+            account.used_bytes = used
+            fixed += 1
+    db.commit()
+    return fixed
@@ -0,0 +1,183 @@
+# backend_api/result_cache.py - Cache disque des transformations (image + style + type de pièce)
+
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from storage import file_sha256, object_sha256
+from style_engine import style_key
+
+# Budget disque et emplacement des résultats en cache (0 = cache désactivé)
+TRANSFORM_CACHE_MAX_BYTES = int(os.getenv("TRANSFORM_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Hors de uploads/ (servi par /static) : un résultat en cache n'est rendu qu'une fois rangé
+# dans le stockage et rattaché à un design, donc par les routes authentifiées ou signées
+TRANSFORM_CACHE_DIR = os.getenv("TRANSFORM_CACHE_DIR", "cache/transforms")
+
+def link_or_copy(src: str, dst: str):
+    """Lien physique (aucune donnée réécrite), copie si le lien est impossible ; remplacement atomique"""
+    tmp = f"{dst}.tmp{threading.get_ident()}"
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+class TransformResultCache:
+    """Cache LRU des images générées, borné en octets sur disque
+
+    Chaque entrée possède son propre lien vers le résultat : une éviction ne casse
+    jamais les fichiers référencés par l'historique.
+    """
+
+    def __init__(
+        self,
+        engine_version: str,
+        root: str = TRANSFORM_CACHE_DIR,
+        max_bytes: int = TRANSFORM_CACHE_MAX_BYTES,
+    ):
+        self.engine_version = engine_version
+        self.root = root
+        self.max_bytes = max(0, int(max_bytes))
+
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.deduplicated = 0
+        self.stores = 0
+        self.evictions = 0
+
+        if self.enabled:
+            self._load_index()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def key_for(self, image_sha256: str, style: str, room_type: str) -> str:
+        raw = f"{self.engine_version}|{style_key(style)}|{style_key(room_type)}|{image_sha256}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.jpg")
+
+    def _load_index(self):
+        """Reconstruit l'index depuis le disque, du moins au plus récemment utilisé (mtime)"""
+        found = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith(".jpg"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(dirpath, name))
+                except OSError:
+                    continue
+                found.append((stat.st_mtime_ns, name[:-4], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._bytes += size
+
+    def get(self, key: str, count: bool = True) -> Optional[str]:
+        """Chemin du résultat en cache, ou None ; count=False hors du chemin de la requête"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            generated = self._path(key)
+            if key in self._entries and not os.path.exists(generated):
+                self._bytes -= self._entries.pop(key)
+            if key not in self._entries:
+                if count:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if count:
+                self.hits += 1
+        # L'ordre LRU survit au redémarrage
+        try:
+            os.utime(generated)
+        except OSError:
+            pass
+        return generated
+
+    def put(self, key: str, generated_path: str):
+        if not self.enabled:
+            return
+        cached = self._path(key)
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        link_or_copy(generated_path, cached)
+        size = os.path.getsize(cached)
+
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)
+            self._entries[key] = size
+            self._bytes += size
+            self.stores += 1
+            evicted = []
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, old_size = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                self.evictions += 1
+                evicted.append(old_key)
+
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                pass
+
+    def restore(self, key: str, generated_path: str) -> bool:
+        """Place le résultat en cache au chemin du job, sans recalcul"""
+        cached = self.get(key)
+        if cached is None:
+            return False
+        try:
+            link_or_copy(cached, generated_path)
+        except OSError:
+            return False
+        return True
+
+    def wrap(self, transform_fn: Callable) -> Callable:
+        """Transformation avec cache, pour jobs.JobWorkerPool"""
+        def cached_transform(original_path: str, generated_path: str, style: str, room_type: str,
+                             progress: Callable[[int, str], None]):
+            if not self.enabled:
+                return transform_fn(original_path, generated_path, style, room_type, progress)
+
+            image_sha256 = object_sha256(original_path) or file_sha256(original_path)
+            key = self.key_for(image_sha256, style or "", room_type or "")
+            # Un job identique a pu se terminer pendant que celui-ci attendait
+            cached = self.get(key, count=False)
+            if cached is not None:
+                with self._lock:
+                    self.deduplicated += 1
+                progress(90, "Résultat en cache")
+                link_or_copy(cached, generated_path)
+                return
+            transform_fn(original_path, generated_path, style, room_type, progress)
+            self.put(key, generated_path)
+
+        return cached_transform
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "engine_version": self.engine_version,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "deduplicated": self.deduplicated,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
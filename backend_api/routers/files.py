@@ -0,0 +1,43 @@
+# backend_api/routers/files.py - Téléchargement par URL signée (ni JWT ni base de données)
+
+import os
+
+from fastapi import APIRouter, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+import derivatives
+from file_serving import cached_file_response, media_type_for
+from signed_urls import UPLOADS_DIR, url_path, verify
+
+router = APIRouter(prefix="/files", tags=["Files"])
+
+
+def _serve(request: Request, stored_path: str, size: str):
+    # Chemins enregistrés relatifs à STORAGE_ROOT, pas au répertoire courant
+    full_path = derivatives.generator.full_path(stored_path)
+    if not os.path.exists(full_path):
+        raise HTTPException(status_code=404, detail="Image file not found")
+    if size == "original":
+        return cached_file_response(request, stored_path, media_type=media_type_for(stored_path),
+                                    file_path=full_path)
+    derivative_path = derivatives.generator.ensure(stored_path, size)
+    return cached_file_response(request, derivative_path, media_type=derivatives.generator.media_type,
+                                file_path=derivatives.generator.full_path(derivative_path))
+
+
+# GET - Image désignée par une URL signée (émise dans les réponses de /history)
+@router.get("/{path:path}")
+async def get_signed_file(
+    path: str,
+    request: Request,
+    exp: int,
+    sig: str,
+    size: str = "original"
+):
+    """Vérifie la signature HMAC et l'expiration, puis envoie l'image (ETag, 304, Range)"""
+    if size not in derivatives.IMAGE_SIZES or url_path(f"{UPLOADS_DIR}/{path}") != path:
+        raise HTTPException(status_code=400, detail="Invalid image URL")
+    if not verify(path, size, exp, sig):
+        raise HTTPException(status_code=403, detail="Invalid or expired signature")
+
+    return await run_in_threadpool(_serve, request, f"{UPLOADS_DIR}/{path}", size)
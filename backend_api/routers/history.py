@@ -1,21 +1,32 @@
 # backend_api/routers/history.py - NOUVEAU FICHIER
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request, Response
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, List, Optional
 from datetime import datetime
 import os
-from pathlib import Path
-import shutil
 
-from database import get_db
-from models import User, DesignHistory
+from database import get_async_db
+from models import DesignHistory
 from auth import get_current_user
-from pydantic import BaseModel
+from identity import Identity
+from storage import get_storage
+from ingestion import normalizer
+import blobs
+import quotas
+import design_stats
+from pagination import HISTORY_PAGE_SIZE, history_offset_page, history_page
+import derivatives
+from file_serving import cached_file_response, media_type_for
+import signed_urls
+from pydantic import BaseModel, computed_field
 
 router = APIRouter(prefix="/history", tags=["History"])
 
+IMAGE_SIZES = derivatives.IMAGE_SIZES
+
 # Schémas Pydantic
 class DesignHistoryResponse(BaseModel):
     id: int
@@ -29,6 +40,25 @@ class DesignHistoryResponse(BaseModel):
     
     class Config:
         from_attributes = True
+    
+    @computed_field
+    @property
+    def image_urls(self) -> Dict[str, Dict[str, str]]:
+        """URLs signées par image et par taille (les listes n'ont besoin que de la miniature) ;
+        /history/{id}/images/... (authentifié) pour un fichier hors du dossier uploads"""
+        paths = {"original": self.original_image_path, "generated": self.generated_image_path}
+        return {
+            image_type: {
+                size: signed_urls.sign(path, size) or f"/history/{self.id}/images/{image_type}?size={size}"
+                for size in IMAGE_SIZES
+            }
+            for image_type, path in paths.items()
+        }
+
+
+class DesignHistoryPage(BaseModel):
+    items: List[DesignHistoryResponse]
+    next_cursor: Optional[str]  # None : dernière page
 
 
 class SaveDesignRequest(BaseModel):
@@ -42,41 +72,58 @@ class SaveDesignRequest(BaseModel):
 # GET - Récupérer tout l'historique
 @router.get("/all", response_model=List[DesignHistoryResponse])
 async def get_all_history(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    limit: int = 50,
+    response: Response,
+    current_user: Identity = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    limit: int = HISTORY_PAGE_SIZE,
     offset: int = 0,
+    cursor: Optional[str] = None,
     favorites_only: bool = False
 ):
-    """Récupère l'historique des designs de l'utilisateur"""
-    
-    query = db.query(DesignHistory).filter(
-        DesignHistory.user_id == current_user.id
-    )
+    """Récupère l'historique des designs de l'utilisateur
     
-    if favorites_only:
-        query = query.filter(DesignHistory.is_favorite == True)
+    Liste simple (clients existants) ; la page suivante est désignée par l'en-tête
+    X-Next-Cursor, à renvoyer dans `cursor`. `offset` reste accepté mais son coût
+    croît avec la profondeur. `limit` est ramené à HISTORY_MAX_PAGE_SIZE, avec ou sans offset.
+    """
     
-    history = query.order_by(
-        DesignHistory.created_at.desc()
-    ).offset(offset).limit(limit).all()
+    if offset > 0 and not cursor:
+        return await db.run_sync(history_offset_page, current_user.id, limit, offset, favorites_only)
     
+    history, next_cursor = await db.run_sync(history_page, current_user.id, limit, cursor, favorites_only)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return history
 
 
+# GET - Historique paginé par curseur
+@router.get("/page", response_model=DesignHistoryPage)
+async def get_history_page(
+    current_user: Identity = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    limit: int = HISTORY_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    favorites_only: bool = False
+):
+    """Une page de l'historique et le curseur opaque de la suivante (next_cursor) ; limit ramené à HISTORY_MAX_PAGE_SIZE"""
+    
+    items, next_cursor = await db.run_sync(history_page, current_user.id, limit, cursor, favorites_only)
+    return {"items": items, "next_cursor": next_cursor}
+
+
 # GET - Récupérer un design spécifique
 @router.get("/{design_id}", response_model=DesignHistoryResponse)
 async def get_design_by_id(
     design_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Identity = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Récupère un design spécifique par son ID"""
     
-    design = db.query(DesignHistory).filter(
+    design = await db.scalar(select(DesignHistory).where(
         DesignHistory.id == design_id,
         DesignHistory.user_id == current_user.id
-    ).first()
+    ))
     
     if not design:
         raise HTTPException(
@@ -95,41 +142,28 @@ async def save_design(
     room_type: Optional[str] = Form(None),
     style: Optional[str] = Form(None),
     confidence: Optional[str] = Form(None),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Identity = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    storage = Depends(get_storage)
 ):
     """Sauvegarde un nouveau design dans l'historique avec les images"""
     
-    # Créer le dossier pour sauvegarder les images
-    uploads_dir = Path("uploads/designs")
-    uploads_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Générer des noms de fichiers uniques
-    timestamp = int(datetime.utcnow().timestamp())
-    original_filename = f"original_{current_user.id}_{timestamp}.jpg"
-    generated_filename = f"generated_{current_user.id}_{timestamp}.jpg"
-    
-    original_path = uploads_dir / original_filename
-    generated_path = uploads_dir / generated_filename
-    
     try:
-        # Sauvegarder l'image originale
-        with original_path.open("wb") as buffer:
-            shutil.copyfileobj(original_image.file, buffer)
-        
-        # Sauvegarder l'image générée
-        with generated_path.open("wb") as buffer:
-            shutil.copyfileobj(generated_image.file, buffer)
+        # Quota déjà atteint : refusé avant de lire les images
+        await db.run_sync(quotas.check, current_user.id)
         
-        # Sauvegarder dans la base de données
-        # Normalize paths to use forward slashes for URL compatibility (Windows uses backslashes)
-        original_path_str = str(original_path).replace('\\', '/')
-        generated_path_str = str(generated_path).replace('\\', '/')
+        # Sauvegarder les deux images normalisées (adressées par leur contenu, hors de la boucle d'événements)
+        original = await normalizer.save_upload(storage, original_image)
+        generated = await normalizer.save_upload(storage, generated_image)
+        await db.run_sync(quotas.check, current_user.id, original.size + generated.size)
+        await db.run_sync(blobs.register, original)
+        await db.run_sync(blobs.register, generated)
         
+        # Sauvegarder dans la base de données avec les références aux images
         new_design = DesignHistory(
             user_id=current_user.id,
-            original_image_path=original_path_str,
-            generated_image_path=generated_path_str,
+            original_image_path=original.path,
+            generated_image_path=generated.path,
             room_type=room_type,
             style=style,
             confidence=confidence,
@@ -138,20 +172,24 @@ async def save_design(
         )
         
         db.add(new_design)
-        db.commit()
-        db.refresh(new_design)
+        await db.run_sync(design_stats.record_design, new_design)
+        await db.run_sync(blobs.acquire, original.path)
+        await db.run_sync(blobs.acquire, generated.path)
+        await db.run_sync(quotas.charge, current_user.id, original.path, generated.path)
+        await db.commit()
+        await db.refresh(new_design)
+        derivatives.generator.submit(original.path, generated.path)
         
         return {
             "message": "Design saved successfully",
             "design_id": new_design.id,
             "design": new_design
         }
+    except HTTPException:
+        raise
     except Exception as e:
-        # Nettoyer les fichiers en cas d'erreur
-        if original_path.exists():
-            os.remove(original_path)
-        if generated_path.exists():
-            os.remove(generated_path)
+        # Les images déjà écrites, sans référence, sont supprimées par le ramasse-miettes (storage_gc.py)
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error saving design: {str(e)}")
 
 
@@ -160,15 +198,15 @@ async def save_design(
 async def toggle_favorite(
     design_id: int,
     is_favorite: bool,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Identity = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Marque ou démarque un design comme favori"""
     
-    design = db.query(DesignHistory).filter(
+    design = await db.scalar(select(DesignHistory).where(
         DesignHistory.id == design_id,
         DesignHistory.user_id == current_user.id
-    ).first()
+    ))
     
     if not design:
         raise HTTPException(
@@ -176,9 +214,18 @@ async def toggle_favorite(
             detail="Design not found"
         )
     
-    design.is_favorite = is_favorite
-    db.commit()
-    db.refresh(design)
+    # Mise à jour conditionnelle : le compteur ne bouge que si la valeur change réellement
+    # (IS NOT : les anciennes lignes à NULL comptent comme non favorites)
+    changed = (await db.execute(
+        update(DesignHistory).where(
+            DesignHistory.id == design_id,
+            DesignHistory.is_favorite.isnot(True) if is_favorite else DesignHistory.is_favorite == True
+        ).values(is_favorite=is_favorite).execution_options(synchronize_session=False)
+    )).rowcount
+    if changed:
+        await db.run_sync(design_stats.record_favorite, current_user.id, 1 if is_favorite else -1)
+    await db.commit()
+    await db.refresh(design)
     
     return {
         "message": f"Design {'added to' if is_favorite else 'removed from'} favorites",
@@ -190,15 +237,15 @@ async def toggle_favorite(
 @router.delete("/{design_id}")
 async def delete_design(
     design_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Identity = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Supprime un design de l'historique"""
     
-    design = db.query(DesignHistory).filter(
+    design = await db.scalar(select(DesignHistory).where(
         DesignHistory.id == design_id,
         DesignHistory.user_id == current_user.id
-    ).first()
+    ))
     
     if not design:
         raise HTTPException(
@@ -206,15 +253,14 @@ async def delete_design(
             detail="Design not found"
         )
     
-    # Supprimer les fichiers images si nécessaire
-    # (Optionnel - à activer si vous voulez supprimer les fichiers physiques)
-    # if os.path.exists(design.original_image_path):
-    #     os.remove(design.original_image_path)
-    # if os.path.exists(design.generated_image_path):
-    #     os.remove(design.generated_image_path)
+    # Les images peuvent être partagées : on rend les références, le fichier reste tant qu'il est utilisé
+    await db.run_sync(blobs.release, design.original_image_path)
+    await db.run_sync(blobs.release, design.generated_image_path)
+    await db.run_sync(quotas.refund, current_user.id, design.original_image_path, design.generated_image_path)
+    await db.run_sync(design_stats.forget_design, design)
     
-    db.delete(design)
-    db.commit()
+    await db.delete(design)
+    await db.commit()
     
     return {"message": "Design deleted successfully"}
 
@@ -222,45 +268,12 @@ async def delete_design(
 # GET - Statistiques de l'utilisateur
 @router.get("/stats/summary")
 async def get_user_stats(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Identity = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Récupère les statistiques de l'utilisateur"""
+    """Récupère les statistiques de l'utilisateur (compteurs tenus à jour, une seule requête)"""
     
-    total_designs = db.query(DesignHistory).filter(
-        DesignHistory.user_id == current_user.id
-    ).count()
-    
-    total_favorites = db.query(DesignHistory).filter(
-        DesignHistory.user_id == current_user.id,
-        DesignHistory.is_favorite == True
-    ).count()
-    
-    # Styles les plus utilisés
-    from sqlalchemy import func
-    style_stats = db.query(
-        DesignHistory.style,
-        func.count(DesignHistory.style).label('count')
-    ).filter(
-        DesignHistory.user_id == current_user.id,
-        DesignHistory.style.isnot(None)
-    ).group_by(DesignHistory.style).all()
-    
-    # Room types les plus utilisés
-    room_stats = db.query(
-        DesignHistory.room_type,
-        func.count(DesignHistory.room_type).label('count')
-    ).filter(
-        DesignHistory.user_id == current_user.id,
-        DesignHistory.room_type.isnot(None)
-    ).group_by(DesignHistory.room_type).all()
-    
-    return {
-        "total_designs": total_designs,
-        "total_favorites": total_favorites,
-        "style_distribution": [{"style": s[0], "count": s[1]} for s in style_stats],
-        "room_distribution": [{"room_type": r[0], "count": r[1]} for r in room_stats]
-    }
+    return await db.run_sync(design_stats.summary, current_user.id)
 
 
 # GET - Télécharger une image
@@ -268,15 +281,16 @@ async def get_user_stats(
 async def download_image(
     design_id: int,
     image_type: str,  # "original" ou "generated"
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    current_user: Identity = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Télécharge une image (originale ou générée)"""
     
-    design = db.query(DesignHistory).filter(
+    design = await db.scalar(select(DesignHistory).where(
         DesignHistory.id == design_id,
         DesignHistory.user_id == current_user.id
-    ).first()
+    ))
     
     if not design:
         raise HTTPException(
@@ -294,14 +308,80 @@ async def download_image(
             detail="Invalid image type. Use 'original' or 'generated'"
         )
     
-    if not os.path.exists(file_path):
+    file_path = file_path.replace("\\", "/")
+    full_path = derivatives.generator.full_path(file_path)
+    if not os.path.exists(full_path):
         raise HTTPException(
             status_code=404,
             detail="Image file not found"
         )
     
-    return FileResponse(
+    # ETag fort : un client qui a déjà l'image reçoit 304 ; Range pour les reprises
+    return await run_in_threadpool(
+        cached_file_response,
+        request,
         file_path,
-        media_type="image/jpeg",
-        filename=f"design_{design_id}_{image_type}.jpg"
-    )
\ No newline at end of file
+        media_type=media_type_for(file_path),
+        filename=f"design_{design_id}_{image_type}{os.path.splitext(file_path)[1] or '.jpg'}",
+        file_path=full_path
+    )
+
+
+# GET - Image d'un design à la taille demandée (miniature, moyenne, pleine, originale)
+@router.get("/{design_id}/images/{image_type}")
+async def get_design_image(
+    design_id: int,
+    image_type: str,  # "original" ou "generated"
+    request: Request,
+    size: str = "medium",
+    current_user: Identity = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Sert un dérivé redimensionné ; généré à la demande s'il n'existe pas encore"""
+    
+    design = await db.scalar(select(DesignHistory).where(
+        DesignHistory.id == design_id,
+        DesignHistory.user_id == current_user.id
+    ))
+    
+    if not design:
+        raise HTTPException(status_code=404, detail="Design not found")
+    
+    if image_type == "original":
+        file_path = design.original_image_path
+    elif image_type == "generated":
+        file_path = design.generated_image_path
+    else:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid image type. Use 'original' or 'generated'"
+        )
+    
+    if size not in IMAGE_SIZES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid size. Use one of: {', '.join(IMAGE_SIZES)}"
+        )
+    
+    file_path = file_path.replace("\\", "/")
+    full_path = derivatives.generator.full_path(file_path)
+    if not os.path.exists(full_path):
+        raise HTTPException(status_code=404, detail="Image file not found")
+    
+    if size == "original":
+        return await run_in_threadpool(cached_file_response, request, file_path,
+                                       media_type=media_type_for(file_path), file_path=full_path)
+    
+    try:
+        derivative_path = await run_in_threadpool(derivatives.generator.ensure, file_path, size)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating image: {str(e)}")
+    
+    # Dérivé d'un objet : jamais modifié (cache long) ; d'un fichier hérité : revalidé comme sa source
+    return await run_in_threadpool(
+        cached_file_response,
+        request,
+        derivative_path,
+        media_type=derivatives.generator.media_type,
+        file_path=derivatives.generator.full_path(derivative_path)
+    )
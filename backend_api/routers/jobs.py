@@ -0,0 +1,90 @@
+# backend_api/routers/jobs.py
+
+import asyncio
+import json
+import os
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+import database
+from database import get_db
+from models import TransformJob
+from auth import get_current_user
+from identity import Identity
+from jobs import job_to_dict, get_job, FINISHED_STATUSES
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+# Intervalle de rafraîchissement du flux SSE
+JOB_EVENTS_INTERVAL_S = float(os.getenv("JOB_EVENTS_INTERVAL_S", "0.5"))
+
+
+def _load_job(job_id: int, user_id: int):
+    db = database.SessionLocal()
+    try:
+        job = get_job(db, job_id, user_id)
+        return job_to_dict(job) if job else None
+    finally:
+        db.close()
+
+
+# GET - Jobs récents de l'utilisateur
+@router.get("/")
+def list_jobs(
+    current_user: Identity = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    limit: int = 20
+):
+    """Liste les derniers jobs de transformation de l'utilisateur"""
+    jobs = db.query(TransformJob).filter(
+        TransformJob.user_id == current_user.id
+    ).order_by(TransformJob.id.desc()).limit(min(limit, 100)).all()
+    return [job_to_dict(job) for job in jobs]
+
+
+# GET - État d'un job (polling)
+@router.get("/{job_id}")
+def get_job_status(
+    job_id: int,
+    current_user: Identity = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Récupère l'état et la progression d'un job"""
+    job = get_job(db, job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_dict(job)
+
+
+# GET - Progression en continu (Server-Sent Events)
+@router.get("/{job_id}/events")
+async def stream_job_events(
+    job_id: int,
+    current_user: Identity = Depends(get_current_user)
+):
+    """Flux SSE : un événement à chaque changement, jusqu'à la fin du job"""
+    user_id = current_user.id
+    if await run_in_threadpool(_load_job, job_id, user_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        last = None
+        while True:
+            job = await run_in_threadpool(_load_job, job_id, user_id)
+            if job is None:
+                break
+            if job != last:
+                yield f"event: {job['status']}\ndata: {json.dumps(job)}\n\n"
+                last = job
+            if job["status"] in FINISHED_STATUSES:
+                break
+            await asyncio.sleep(JOB_EVENTS_INTERVAL_S)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
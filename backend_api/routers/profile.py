@@ -1,17 +1,23 @@
 # backend_api/routers/profile.py
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from datetime import datetime
-import shutil
-import os
-from pathlib import Path
 
 # Imports depuis votre projet
 import database
 import models
 import auth
+from storage import get_storage, MAX_PROFILE_PICTURE_BYTES
+from ingestion import normalizer, PROFILE_PICTURE_MAX_EDGE
+import blobs
+import identity
+from identity import Identity
+import quotas
+import passwords
+import design_stats
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/profile", tags=["Profile"])
@@ -40,35 +46,25 @@ class ProfileResponse(BaseModel):
 # GET - Récupérer le profil de l'utilisateur
 @router.get("/me", response_model=ProfileResponse)
 async def get_my_profile(
-    token: str = Depends(auth.oauth2_scheme),
-    db: Session = Depends(database.get_db)
+    current_user: Identity = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """Récupère le profil de l'utilisateur connecté"""
     
-    # Vérifier le token et récupérer l'email
-    email = auth.verify_token(token)
-    
-    # Récupérer l'utilisateur
-    from crud import get_user_by_email
-    current_user = get_user_by_email(db, email=email)
-    
-    if not current_user:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-    
     # Récupérer ou créer le profil
-    profile = db.query(models.UserProfile).filter(
+    profile = await db.scalar(select(models.UserProfile).where(
         models.UserProfile.user_id == current_user.id
-    ).first()
+    ))
     
     if not profile:
         # Créer un profil par défaut si inexistant
         profile = models.UserProfile(user_id=current_user.id)
         db.add(profile)
-        db.commit()
-        db.refresh(profile)
+        await db.commit()
+        await db.refresh(profile)
     
-    # Compter le nombre total de designs (pour l'instant 0)
-    total_designs = 0
+    # Compteur tenu à jour par design_stats (une lecture par clé primaire)
+    total_designs = await db.run_sync(design_stats.total_designs, current_user.id)
     
     return {
         "id": profile.id,
@@ -87,24 +83,14 @@ async def get_my_profile(
 @router.put("/update")
 async def update_profile(
     profile_data: ProfileUpdate,
-    token: str = Depends(auth.oauth2_scheme),
-    db: Session = Depends(database.get_db)
+    current_user: Identity = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """Met à jour le profil de l'utilisateur"""
     
-    # Vérifier le token et récupérer l'email
-    email = auth.verify_token(token)
-    
-    # Récupérer l'utilisateur
-    from crud import get_user_by_email
-    current_user = get_user_by_email(db, email=email)
-    
-    if not current_user:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-    
-    profile = db.query(models.UserProfile).filter(
+    profile = await db.scalar(select(models.UserProfile).where(
         models.UserProfile.user_id == current_user.id
-    ).first()
+    ))
     
     if not profile:
         profile = models.UserProfile(user_id=current_user.id)
@@ -122,8 +108,9 @@ async def update_profile(
     # CORRECTION ICI :
     profile.updated_at = datetime.utcnow()  # datetime avec un 'd' minuscule
 
-    db.commit()
-    db.refresh(profile)
+    await db.commit()
+    await db.refresh(profile)
+    identity.cache.invalidate(current_user.id)
     return {"message": "Profile updated successfully", "profile": profile}
 
 
@@ -131,21 +118,12 @@ async def update_profile(
 @router.post("/upload-picture")
 async def upload_profile_picture(
     file: UploadFile = File(...),
-    token: str = Depends(auth.oauth2_scheme),
-    db: Session = Depends(database.get_db)
+    current_user: Identity = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(database.get_async_db),
+    storage = Depends(get_storage)
 ):
     """Upload une photo de profil"""
     
-    # Vérifier le token et récupérer l'email
-    email = auth.verify_token(token)
-    
-    # Récupérer l'utilisateur
-    from crud import get_user_by_email
-    current_user = get_user_by_email(db, email=email)
-    
-    if not current_user:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-    
     # Vérifier le type de fichier
     allowed_types = ["image/jpeg", "image/png", "image/jpg"]
     if file.content_type not in allowed_types:
@@ -154,79 +132,87 @@ async def upload_profile_picture(
             detail="Only JPEG and PNG images are allowed"
         )
     
-    # Créer le dossier pour les photos de profil
-    upload_dir = Path("uploads/profile_pictures")
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Générer un nom de fichier unique
-    file_extension = file.filename.split(".")[-1]
-    filename = f"user_{current_user.id}_{int(datetime.utcnow().timestamp())}.{file_extension}"
-    file_path = upload_dir / filename
+    # Quota déjà atteint : refusé avant de lire l'image
+    await db.run_sync(quotas.check, current_user.id)
     
-    # Sauvegarder le fichier
-    with file_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Sauvegarder le fichier normalisé (adressé par son contenu, taille limitée pendant la copie)
+    stored = await normalizer.save_upload(storage, file, max_bytes=MAX_PROFILE_PICTURE_BYTES,
+                                          max_edge=PROFILE_PICTURE_MAX_EDGE)
+    file_path = stored.path
     
     # Mettre à jour le profil
-    profile = db.query(models.UserProfile).filter(
+    profile = await db.scalar(select(models.UserProfile).where(
         models.UserProfile.user_id == current_user.id
-    ).first()
+    ))
     
     if not profile:
         profile = models.UserProfile(user_id=current_user.id)
         db.add(profile)
     
-    # Supprimer l'ancienne photo si elle existe
-    if profile.profile_picture and os.path.exists(profile.profile_picture):
-        try:
-            os.remove(profile.profile_picture)
-        except:
-            pass
+    await db.run_sync(blobs.register, stored)
     
-    profile.profile_picture = str(file_path)
+    # L'ancienne photo perd sa référence (supprimée par le ramasse-miettes si plus utilisée)
+    # et la nouvelle la remplace dans le quota
+    if profile.profile_picture != file_path:
+        previous_size = await db.run_sync(quotas.path_size, profile.profile_picture)
+        await db.run_sync(quotas.check, current_user.id, stored.size - previous_size)
+        await db.run_sync(blobs.release, profile.profile_picture)
+        await db.run_sync(blobs.acquire, file_path)
+        await db.run_sync(quotas.refund, current_user.id, profile.profile_picture)
+        await db.run_sync(quotas.charge, current_user.id, file_path)
+    
+    profile.profile_picture = file_path
     profile.updated_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(profile)
+    await db.commit()
+    await db.refresh(profile)
     
     return {
         "message": "Profile picture uploaded successfully",
-        "file_path": str(file_path)
+        "file_path": file_path
     }
 
 
+# GET - Espace de stockage utilisé
+@router.get("/storage")
+async def get_storage_usage(
+    current_user: Identity = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """Espace occupé par les images de l'utilisateur et quota"""
+    
+    return await db.run_sync(quotas.usage, current_user.id)
+
+
 # PUT - Changer le mot de passe
 @router.put("/change-password")
 async def change_password(
     old_password: str,
     new_password: str,
-    token: str = Depends(auth.oauth2_scheme),
-    db: Session = Depends(database.get_db)
+    current_user: Identity = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """Change le mot de passe de l'utilisateur"""
     
-    from passlib.context import CryptContext
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    user = await db.get(models.User, current_user.id)
     
-    # Vérifier le token et récupérer l'email
-    email = auth.verify_token(token)
-    
-    # Récupérer l'utilisateur
-    from crud import get_user_by_email
-    current_user = get_user_by_email(db, email=email)
-    
-    if not current_user:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-    
-    # Vérifier l'ancien mot de passe
-    if not pwd_context.verify(old_password, current_user.hashed_password):
+    # Vérifier l'ancien mot de passe (bcrypt dans le pool dédié)
+    if not await passwords.hasher.verify(old_password, user.hashed_password):
         raise HTTPException(
             status_code=400,
             detail="Incorrect old password"
         )
     
     # Hasher et sauvegarder le nouveau mot de passe
-    current_user.hashed_password = pwd_context.hash(new_password)
-    db.commit()
+    user.hashed_password = await passwords.hasher.hash(new_password)
+    user.password_version = (user.password_version or 0) + 1
+    await db.commit()
     
-    return {"message": "Password changed successfully"}
\ No newline at end of file
+    # Les tokens émis avant ce changement ne sont plus acceptés (version de session)
+    identity.cache.invalidate(current_user.id)
+    
+    return {
+        "message": "Password changed successfully",
+        "access_token": auth.create_user_token(user),
+        "token_type": "bearer"
+    }
\ No newline at end of file
@@ -0,0 +1,66 @@
+# backend_api/signed_urls.py - URLs d'images signées (HMAC), vérifiables sans base de données
+
+import base64
+import hashlib
+import hmac
+import os
+import time
+from typing import Optional
+
+from auth import SECRET_KEY
+
+# Durée de validité ; l'expiration est arrondie à la fenêtre pour que l'URL d'une image
+# reste identique d'une réponse à l'autre (cache d'images du client)
+SIGNED_URL_TTL_S = int(os.getenv("SIGNED_URL_TTL_S", "900"))
+SIGNED_URL_WINDOW_S = int(os.getenv("SIGNED_URL_WINDOW_S", "300"))
+# Clé dédiée, dérivée par défaut de SECRET_KEY (la clé des JWT n'est pas utilisée telle quelle)
+SIGNED_URL_SECRET = os.getenv("SIGNED_URL_SECRET") or hmac.new(
+    SECRET_KEY.encode(), b"signed-urls", hashlib.sha256
+).hexdigest()
+
+URL_PREFIX = "/files"
+UPLOADS_DIR = "uploads"
+
+
+def _signature(path: str, size: str, expires: int, secret: str) -> str:
+    message = f"{path}\n{size}\n{expires}".encode()
+    digest = hmac.new(secret.encode(), message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def url_path(stored_path: str) -> Optional[str]:
+    """uploads/objects/ab/cd/x.jpg -> objects/ab/cd/x.jpg ; None hors du dossier uploads"""
+    path = stored_path.replace("\\", "/")
+    if not path.startswith(f"{UPLOADS_DIR}/"):
+        return None
+    path = path[len(UPLOADS_DIR) + 1:]
+    if not path or any(part in ("", ".", "..") for part in path.split("/")):
+        return None
+    return path
+
+
+def sign(
+    stored_path: str,
+    size: str = "original",
+    ttl_s: int = SIGNED_URL_TTL_S,
+    now: Optional[float] = None,
+    secret: str = SIGNED_URL_SECRET,
+) -> Optional[str]:
+    """URL signée d'une image enregistrée, à la taille demandée"""
+    path = url_path(stored_path)
+    if path is None:
+        return None
+    now = time.time() if now is None else now
+    window = max(1, SIGNED_URL_WINDOW_S)
+    expires = int(-(-(now + ttl_s) // window) * window)
+    signature = _signature(path, size, expires, secret)
+    return f"{URL_PREFIX}/{path}?size={size}&exp={expires}&sig={signature}"
+
+
+def verify(path: str, size: str, expires: int, signature: str,
+           now: Optional[float] = None, secret: str = SIGNED_URL_SECRET) -> bool:
+    """Signature valide et non expirée (comparaison en temps constant)"""
+    now = time.time() if now is None else now
+    if expires < now:
+        return False
+    return hmac.compare_digest(_signature(path, size, expires, secret), signature)
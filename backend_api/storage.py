@@ -0,0 +1,285 @@
+# backend_api/storage.py - Stockage des images (écritures non bloquantes, atomiques, bornées)
+#
+# Les images sont adressées par leur contenu : uploads/objects/ab/cd/<sha256>.jpg.
+# Des octets identiques ne sont stockés qu'une fois (références comptées dans blobs.py).
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import uuid
+from pathlib import Path
+from typing import BinaryIO, NamedTuple, Optional
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+# Racine des chemins relatifs enregistrés en base ("uploads/designs/...")
+STORAGE_ROOT = os.getenv("STORAGE_ROOT", ".")
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+STORAGE_CHUNK_SIZE = int(os.getenv("STORAGE_CHUNK_SIZE", str(1024 * 1024)))
+STORAGE_OBJECTS_DIR = os.getenv("STORAGE_OBJECTS_DIR", "uploads/objects")
+
+# Tailles maximales acceptées, vérifiées pendant la copie
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+MAX_PROFILE_PICTURE_BYTES = int(os.getenv("MAX_PROFILE_PICTURE_BYTES", str(5 * 1024 * 1024)))
+
+
+class StoredFile(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+
+def file_sha256(path: str, chunk_size: int = STORAGE_CHUNK_SIZE) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Extension d'un objet d'après ses premiers octets : des octets identiques n'ont qu'un chemin
+# (et une ligne image_blobs), quelle que soit l'extension fournie par l'appelant
+_SIGNATURES = [(b"\xff\xd8\xff", ".jpg"), (b"\x89PNG\r\n\x1a\n", ".png"), (b"GIF8", ".gif")]
+_EXT_ALIASES = {".jpeg": ".jpg", ".jpe": ".jpg"}
+
+
+def content_ext(head: bytes, ext: str) -> str:
+    """Extension canonique du contenu (head : 12 premiers octets), sinon ext normalisée"""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    for signature, known in _SIGNATURES:
+        if head.startswith(signature):
+            return known
+    ext = ext.lower()
+    return _EXT_ALIASES.get(ext, ext)
+
+
+def object_path(sha256: str, ext: str = ".jpg") -> str:
+    """Chemin d'un objet : deux niveaux de 256 sous-répertoires"""
+    return f"{STORAGE_OBJECTS_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}"
+
+
+def object_sha256(path: Optional[str]) -> Optional[str]:
+    """Hash d'un chemin d'objet, None pour un chemin hérité (uploads/designs/...)"""
+    if not path or not path.startswith(f"{STORAGE_OBJECTS_DIR}/"):
+        return None
+    name = path.rsplit("/", 1)[-1]
+    sha256 = name.split(".", 1)[0]
+    return sha256 if len(sha256) == 64 else None
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Fichier trop volumineux (max {max_bytes / 1024 / 1024:.1f} MB)"
+    )
+
+
+def _check_declared_size(upload: UploadFile, max_bytes: int):
+    """Rejet immédiat si la taille connue dépasse déjà la limite"""
+    if upload.size is not None and upload.size > max_bytes:
+        raise _too_large(max_bytes)
+
+
+class LocalStorage:
+    """Système de fichiers local : copie par blocs dans le pool de threads, fichier temporaire + rename"""
+
+    def __init__(self, root: str = STORAGE_ROOT, chunk_size: int = STORAGE_CHUNK_SIZE):
+        self.root = Path(root)
+        self.chunk_size = chunk_size
+        self._tmp_dir = self.root / STORAGE_OBJECTS_DIR / ".tmp"
+
+    def _full_path(self, path: str) -> Path:
+        return self.root / path
+
+    def temp_path(self, ext: str = ".jpg") -> str:
+        """Fichier de travail local (sur le même disque que les objets, pour un rename atomique)"""
+        self._tmp_dir.mkdir(parents=True, exist_ok=True)
+        return str(self._tmp_dir / f"{uuid.uuid4().hex}{ext}")
+
+    def _commit(self, tmp_path: Path, sha256: str, size: int, ext: str) -> StoredFile:
+        """Place le fichier temporaire à son adresse (rename atomique)
+
+        Un objet déjà présent est remplacé par la copie identique qui vient d'être écrite :
+        sa date de modification est rafraîchie, ce qui le protège du ramasse-miettes
+        (storage_gc.py) jusqu'à ce que la requête en cours y fasse référence.
+        """
+        with open(tmp_path, "rb") as f:
+            path = object_path(sha256, content_ext(f.read(12), ext))
+        full_path = self._full_path(path)
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_path, full_path)
+        return StoredFile(path, size, sha256)
+
+    def _copy_to_temp(self, source: BinaryIO, ext: str, max_bytes: Optional[int]):
+        """Copie par blocs vers un fichier temporaire ; renvoie (chemin, sha256, taille)"""
+        tmp_path = Path(self.temp_path(ext))
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with tmp_path.open("wb") as out:
+                while True:
+                    chunk = source.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise _too_large(max_bytes)
+                    digest.update(chunk)
+                    out.write(chunk)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return tmp_path, digest.hexdigest(), size
+
+    def _write_stream(self, source: BinaryIO, ext: str, max_bytes: Optional[int]) -> StoredFile:
+        tmp_path, sha256, size = self._copy_to_temp(source, ext, max_bytes)
+        try:
+            return self._commit(tmp_path, sha256, size, ext)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def ingest_file(self, local_path: str, ext: str = ".jpg", move: bool = True) -> StoredFile:
+        """Range un fichier produit localement (sortie d'un worker, migration) ; appel bloquant"""
+        source = Path(local_path)
+        if move:
+            return self._commit(source, file_sha256(local_path), source.stat().st_size, ext)
+        with source.open("rb") as f:
+            return self._write_stream(f, ext, None)
+
+    def _delete(self, path: str) -> bool:
+        try:
+            self._full_path(path).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    async def save_upload(self, upload: UploadFile, ext: str = ".jpg",
+                          max_bytes: Optional[int] = MAX_UPLOAD_BYTES) -> StoredFile:
+        """Copie l'upload sans le charger en mémoire ; 413 dès que la limite est franchie"""
+        if max_bytes is not None:
+            _check_declared_size(upload, max_bytes)
+        await upload.seek(0)
+        return await run_in_threadpool(self._write_stream, upload.file, ext, max_bytes)
+
+    async def receive_upload(self, upload: UploadFile, ext: str = "",
+                             max_bytes: Optional[int] = MAX_UPLOAD_BYTES) -> str:
+        """Upload brut dans un fichier temporaire local (à traiter puis ingest_file) ; 413 au-delà de la limite"""
+        if max_bytes is not None:
+            _check_declared_size(upload, max_bytes)
+        await upload.seek(0)
+        tmp_path, _, _ = await run_in_threadpool(self._copy_to_temp, upload.file, ext, max_bytes)
+        return str(tmp_path)
+
+    async def save_bytes(self, data: bytes, ext: str = ".jpg") -> StoredFile:
+        return await run_in_threadpool(self._write_stream, io.BytesIO(data), ext, None)
+
+    async def read(self, path: str) -> bytes:
+        return await run_in_threadpool(self._full_path(path).read_bytes)
+
+    async def exists(self, path: str) -> bool:
+        return await run_in_threadpool(self._full_path(path).exists)
+
+    async def delete(self, path: str) -> bool:
+        return await run_in_threadpool(self._delete, path)
+
+
+class MemoryStorage:
+    """Stockage en mémoire pour les tests (app.dependency_overrides[get_storage])"""
+
+    def __init__(self, chunk_size: int = STORAGE_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.files = {}
+        self._lock = threading.Lock()
+
+    def temp_path(self, ext: str = ".jpg") -> str:
+        fd, path = tempfile.mkstemp(suffix=ext)
+        os.close(fd)
+        return path
+
+    def _put(self, data: bytes, ext: str) -> StoredFile:
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = object_path(sha256, content_ext(data[:12], ext))
+        with self._lock:
+            self.files.setdefault(path, data)
+        return StoredFile(path, len(data), sha256)
+
+    def ingest_file(self, local_path: str, ext: str = ".jpg", move: bool = True) -> StoredFile:
+        with open(local_path, "rb") as f:
+            stored = self._put(f.read(), ext)
+        if move:
+            os.remove(local_path)
+        return stored
+
+    async def save_upload(self, upload: UploadFile, ext: str = ".jpg",
+                          max_bytes: Optional[int] = MAX_UPLOAD_BYTES) -> StoredFile:
+        if max_bytes is not None:
+            _check_declared_size(upload, max_bytes)
+        await upload.seek(0)
+        chunks = []
+        size = 0
+        while True:
+            chunk = await upload.read(self.chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if max_bytes is not None and size > max_bytes:
+                raise _too_large(max_bytes)
+            chunks.append(chunk)
+        return self._put(b"".join(chunks), ext)
+
+    async def receive_upload(self, upload: UploadFile, ext: str = "",
+                             max_bytes: Optional[int] = MAX_UPLOAD_BYTES) -> str:
+        if max_bytes is not None:
+            _check_declared_size(upload, max_bytes)
+        await upload.seek(0)
+        tmp_path = self.temp_path(ext)
+        size = 0
+        try:
+            with open(tmp_path, "wb") as out:
+                while True:
+                    chunk = await upload.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise _too_large(max_bytes)
+                    out.write(chunk)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return tmp_path
+
+    async def save_bytes(self, data: bytes, ext: str = ".jpg") -> StoredFile:
+        return self._put(data, ext)
+
+    async def read(self, path: str) -> bytes:
+        with self._lock:
+            if path not in self.files:
+                raise FileNotFoundError(path)
+            return self.files[path]
+
+    async def exists(self, path: str) -> bool:
+        with self._lock:
+            return path in self.files
+
+    async def delete(self, path: str) -> bool:
+        with self._lock:
+            return self.files.pop(path, None) is not None
+
+
+STORAGE_BACKENDS = {
+    "local": LocalStorage,
+    "memory": MemoryStorage,
+}
+
+storage = STORAGE_BACKENDS[STORAGE_BACKEND]()
+
+
+def get_storage():
+    """Dépendance FastAPI : le stockage configuré"""
+    return storage
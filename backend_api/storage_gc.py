@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Ramasse-miettes du stockage des images
+
+Compare les chemins référencés en base (DesignHistory, UserProfile, jobs récents)
+aux fichiers présents sur le disque et supprime, par lots, les fichiers orphelins :
+objets sans référence, anciens fichiers uploads/designs, fichiers temporaires
+abandonnés, dérivés dont la source a disparu. Recompte au passage les références
+des objets (image_blobs) et l'espace utilisé par chaque utilisateur (quotas.py).
+
+Un fichier n'est supprimé que s'il n'a pas été modifié depuis GC_GRACE_S secondes
+(un upload en cours n'est pas encore référencé) et si, juste avant la suppression,
+aucune ligne ne le référence toujours.
+
+Lancé périodiquement par l'API (GC_INTERVAL_S) ou à la main :
+    python storage_gc.py [--dry-run] [--grace SECONDES]
+"""
+
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Optional, Set
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+
+import database
+import derivatives
+import models
+import quotas
+from models import DesignHistory, ImageBlob, TransformJob, UserProfile
+from storage import STORAGE_OBJECTS_DIR, STORAGE_ROOT, object_sha256
+
+# Intervalle entre deux passes dans l'API (0 : désactivé)
+GC_INTERVAL_S = float(os.getenv("GC_INTERVAL_S", "3600"))
+# Âge minimal d'un fichier orphelin avant suppression
+GC_GRACE_S = float(os.getenv("GC_GRACE_S", "3600"))
+GC_BATCH_SIZE = int(os.getenv("GC_BATCH_SIZE", "200"))
+# Pause entre deux lots pour ne pas saturer le disque ni la base
+GC_BATCH_PAUSE_S = float(os.getenv("GC_BATCH_PAUSE_S", "0.05"))
+# Les jobs terminés depuis plus longtemps ne protègent plus leurs images
+GC_JOB_RETENTION_S = float(os.getenv("GC_JOB_RETENTION_S", str(7 * 24 * 3600)))
+# Dossiers parcourus (le cache des transformations, hors de uploads/, gère lui-même sa taille)
+GC_DIRS = [d for d in os.getenv(
+    "GC_DIRS", f"{STORAGE_OBJECTS_DIR},uploads/designs,uploads/profile_pictures"
+).split(",") if d]
+
+# (modèle, colonne) des lignes qui gardent une image
+REFERENCING_COLUMNS = [
+    (DesignHistory, "original_image_path"),
+    (DesignHistory, "generated_image_path"),
+    (UserProfile, "profile_picture"),
+]
+
+
+def normalize(path: str) -> str:
+    """Chemins enregistrés sous Windows : séparateurs "\\" """
+    return path.replace("\\", "/")
+
+
+def _batches(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class StorageCollector:
+    """Réconciliation base / disque, en arrière-plan ou en une passe (run_once)"""
+
+    def __init__(
+        self,
+        session_factory=None,
+        root: str = STORAGE_ROOT,
+        directories: Optional[List[str]] = None,
+        grace_s: float = GC_GRACE_S,
+        batch_size: int = GC_BATCH_SIZE,
+        batch_pause_s: float = GC_BATCH_PAUSE_S,
+        job_retention_s: float = GC_JOB_RETENTION_S,
+        interval_s: float = GC_INTERVAL_S,
+        derivative_generator: Optional[derivatives.DerivativeGenerator] = None,
+        dry_run: bool = False,
+    ):
+        self.session_factory = session_factory or database.SessionLocal
+        self.root = root
+        self.directories = directories if directories is not None else GC_DIRS
+        self.grace_s = grace_s
+        self.batch_size = max(1, int(batch_size))
+        self.batch_pause_s = batch_pause_s
+        self.job_retention_s = job_retention_s
+        self.interval_s = interval_s
+        self.derivatives = derivative_generator or derivatives.generator
+        self.dry_run = dry_run
+
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._run_lock = threading.Lock()
+
+        self.runs = 0
+        self.reclaimed_files = 0
+        self.reclaimed_bytes = 0
+        self.last_run: Optional[dict] = None
+
+    # ============= RÉFÉRENCES =============
+
+    def _job_filter(self):
+        """Jobs dont les images sont encore utiles : en cours ou terminés récemment"""
+        retention = datetime.utcnow() - timedelta(seconds=self.job_retention_s)
+        return or_(
+            TransformJob.status.notin_(("done", "failed")),
+            TransformJob.finished_at.is_(None),
+            TransformJob.finished_at > retention,
+        )
+
+    def referenced_paths(self, db: Session) -> Set[str]:
+        referenced = set()
+        for model, column in REFERENCING_COLUMNS:
+            attr = getattr(model, column)
+            referenced.update(normalize(path) for (path,) in db.query(attr).filter(attr.isnot(None)))
+        for original, generated in db.query(
+            TransformJob.original_image_path, TransformJob.generated_image_path
+        ).filter(self._job_filter()):
+            referenced.update(normalize(path) for path in (original, generated) if path)
+        return referenced
+
+    def _still_referenced(self, db: Session, paths: List[str]) -> Set[str]:
+        """Relecture juste avant la suppression (un lot, une requête par colonne)"""
+        variants = paths + [path.replace("/", "\\") for path in paths]
+        referenced = set()
+        for model, column in REFERENCING_COLUMNS:
+            attr = getattr(model, column)
+            referenced.update(normalize(path) for (path,) in db.query(attr).filter(attr.in_(variants)))
+        for column in (TransformJob.original_image_path, TransformJob.generated_image_path):
+            referenced.update(normalize(path) for (path,) in db.query(column).filter(
+                column.in_(variants), self._job_filter()
+            ))
+        return referenced
+
+    def reconcile_blobs(self, db: Session) -> int:
+        """Recompte les références de chaque objet en une requête (corrige les compteurs faussés)"""
+        refs = sum(
+            select(func.count()).where(getattr(model, column) == ImageBlob.path).scalar_subquery()
+            for model, column in REFERENCING_COLUMNS
+        )
+        if self.dry_run:
+            return db.query(ImageBlob).filter(ImageBlob.ref_count != refs).count()
+        fixed = db.query(ImageBlob).filter(ImageBlob.ref_count != refs).update(
+            {"ref_count": refs}, synchronize_session=False
+        )
+        db.commit()
+        return fixed
+
+    # ============= FICHIERS =============
+
+    def _full_path(self, path: str) -> str:
+        return os.path.join(self.root, path)
+
+    def _files(self, directory: str) -> Iterator[str]:
+        for dirpath, _, filenames in os.walk(self._full_path(directory)):
+            relative_dir = normalize(os.path.relpath(dirpath, self.root))
+            for filename in filenames:
+                yield f"{relative_dir}/{filename}"
+
+    def _is_old(self, path: str, cutoff: float) -> bool:
+        try:
+            return os.stat(self._full_path(path)).st_mtime < cutoff
+        except FileNotFoundError:
+            return False
+
+    def _orphans(self, referenced: Set[str], cutoff: float, report: dict) -> Iterator[str]:
+        for directory in self.directories:
+            for path in self._files(directory):
+                report["scanned"] += 1
+                if path not in referenced and self._is_old(path, cutoff):
+                    yield path
+
+    def _unlink(self, path: str, report: dict):
+        # En dry-run, un dérivé déjà compté avec sa source ne l'est pas une seconde fois
+        if path in report["_seen"]:
+            return
+        report["_seen"].add(path)
+        full_path = self._full_path(path)
+        try:
+            size = os.path.getsize(full_path)
+            if not self.dry_run:
+                os.remove(full_path)
+        except FileNotFoundError:
+            return
+        report["reclaimed_files"] += 1
+        report["reclaimed_bytes"] += size
+
+    def _reclaim_batch(self, db: Session, batch: List[str], cutoff: float, report: dict):
+        # Réécrit entre-temps par un upload du même contenu : conservé (vérifié avant toute écriture)
+        batch = [path for path in batch if self._is_old(path, cutoff)]
+        if not batch:
+            return
+        still_referenced = self._still_referenced(db, batch)
+        cutoff_at = datetime.utcfromtimestamp(cutoff)
+        for path in batch:
+            if path in still_referenced:
+                continue
+            sha256 = object_sha256(path)
+            try:
+                if sha256 is not None and not self.dry_run:
+                    # Une référence prise entre-temps annule la suppression de l'objet
+                    # Ligne de ce fichier (chemin), pas d'un même contenu sous une autre extension
+                    blob = db.query(ImageBlob).filter(ImageBlob.path == path)
+                    deleted = blob.filter(
+                        ImageBlob.ref_count == 0,
+                        ImageBlob.updated_at < cutoff_at
+                    ).delete(synchronize_session=False)
+                    if not deleted and blob.first() is not None:
+                        continue
+                if not self._is_old(path, cutoff):
+                    # Réécrit pendant la vérification : la ligne supprimée est restaurée
+                    db.rollback()
+                    continue
+                for size in self.derivatives.sizes:
+                    self._unlink(self.derivatives.path_for(path, size), report)
+                self._unlink(path, report)
+                # La ligne ne disparaît qu'avec le fichier : même transaction que la suppression
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            report["orphans"] += 1
+
+    def _orphan_derivatives(self, referenced: Set[str], cutoff: float) -> Iterator[str]:
+        """Dérivés dont aucune image référencée n'est la source"""
+        keys = {derivatives.source_key(path) for path in referenced}
+        for path in self._files(self.derivatives.directory):
+            key = os.path.basename(path).rsplit("_", 1)[0]
+            if key not in keys and self._is_old(path, cutoff):
+                yield path
+
+    # ============= PASSE =============
+
+    def run_once(self) -> dict:
+        """Une passe complète ; renvoie le rapport (rien n'est supprimé en dry_run)"""
+        with self._run_lock:
+            start = time.perf_counter()
+            cutoff = time.time() - self.grace_s
+            report = {
+                "dry_run": self.dry_run,
+                "scanned": 0,
+                "orphans": 0,
+                "reclaimed_files": 0,
+                "reclaimed_bytes": 0,
+                "orphan_derivatives": 0,
+                "blob_refs_fixed": 0,
+                "user_usage_fixed": 0,
+                "_seen": set(),
+            }
+            db = self.session_factory()
+            try:
+                report["blob_refs_fixed"] = self.reconcile_blobs(db)
+                referenced = self.referenced_paths(db)
+
+                for batch in _batches(self._orphans(referenced, cutoff, report), self.batch_size):
+                    self._reclaim_batch(db, batch, cutoff, report)
+                    if self._stopping.wait(self.batch_pause_s):
+                        break
+
+                for batch in _batches(self._orphan_derivatives(referenced, cutoff), self.batch_size):
+                    for path in batch:
+                        if path not in report["_seen"]:
+                            report["orphan_derivatives"] += 1
+                        self._unlink(path, report)
+                    if self._stopping.wait(self.batch_pause_s):
+                        break
+
+                if not self.dry_run:
+                    report["user_usage_fixed"] = quotas.rebuild(db)
+            finally:
+                db.close()
+
+            del report["_seen"]
+            report["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            report["finished_at"] = datetime.utcnow().isoformat()
+            self.runs += 1
+            if not self.dry_run:
+                self.reclaimed_files += report["reclaimed_files"]
+                self.reclaimed_bytes += report["reclaimed_bytes"]
+            self.last_run = report
+            return report
+
+    def _run(self):
+        while not self._stopping.wait(self.interval_s):
+            try:
+                report = self.run_once()
+                if report["reclaimed_files"]:
+                    print(f"🧹 Stockage : {report['reclaimed_files']} fichiers orphelins supprimés "
+                          f"({report['reclaimed_bytes'] / 1024 / 1024:.1f} MB)")
+            except Exception as e:
+                print(f"❌ Ramasse-miettes du stockage: {e}")
+
+    def start(self):
+        if self._thread is not None or self.interval_s <= 0:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="storage-gc", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout_s: float = 5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout_s)
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "interval_s": self.interval_s,
+            "grace_s": self.grace_s,
+            "runs": self.runs,
+            "reclaimed_files": self.reclaimed_files,
+            "reclaimed_bytes": self.reclaimed_bytes,
+            "last_run": self.last_run,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suppression des images orphelines")
+    parser.add_argument("--dry-run", action="store_true", help="Affiche ce qui serait supprimé")
+    parser.add_argument("--grace", type=float, default=GC_GRACE_S,
+                        help="Âge minimal (secondes) d'un fichier orphelin")
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=database.engine)
+
+    print("=" * 60)
+    print("🧹 RAMASSE-MIETTES DU STOCKAGE" + (" (dry-run)" if args.dry_run else ""))
+    print("=" * 60)
+    report = StorageCollector(grace_s=args.grace, dry_run=args.dry_run).run_once()
+    for key, value in report.items():
+        print(f"   {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+# backend_api/style_engine.py - Moteur de styles CPU (NumPy vectorisé, déterministe)
+
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Callable, Optional
+
+import numpy as np
+from PIL import Image
+
+# À incrémenter dès qu'un style ou un filtre change : sert de clé de cache des résultats
+STYLE_ENGINE_VERSION = "1"
+# Budget de calcul par image : au-delà, l'image est réduite avant traitement (décision déterministe)
+STYLE_LATENCY_BUDGET_MS = float(os.getenv("STYLE_LATENCY_BUDGET_MS", "1500"))
+# Hauteur des bandes traitées d'un coup (borne la mémoire sur les grandes images)
+STYLE_TILE_ROWS = int(os.getenv("STYLE_TILE_ROWS", "256"))
+STYLE_JPEG_QUALITY = int(os.getenv("STYLE_JPEG_QUALITY", "90"))
+DEFAULT_STYLE = "modern-aesthetic"
+
+LUT_SIZE = 17
+
+# Coût estimé de chaque étape en ns/pixel (ordre de grandeur mesuré avec bench_style_engine.py)
+_COST_NS_PER_PIXEL = {
+    "tone": 10.0,
+    "lut": 240.0,
+    "sharpen": 140.0,
+    "glow": 160.0,
+    "vignette": 15.0,
+    "grain": 15.0,
+}
+
+
+def style_key(name: str) -> str:
+    """'Boho Chic' -> 'boho-chic'"""
+    return re.sub(r"[^a-z0-9]+", "-", (name or "").lower()).strip("-")
+
+
+class Style:
+    """Paramètres d'un style : balance des couleurs (LUT 3D), courbe de tons et filtres"""
+
+    def __init__(
+        self,
+        name: str,
+        aliases: tuple = (),
+        temperature: float = 0.0,    # >0 chaud, <0 froid
+        tint: float = 0.0,           # >0 magenta, <0 vert
+        saturation: float = 1.0,
+        contrast: float = 1.0,
+        brightness: float = 0.0,
+        fade: float = 0.0,           # relève les noirs (rendu mat)
+        shadows: tuple = (0.0, 0.0, 0.0),     # teinte ajoutée aux ombres (R, G, B)
+        highlights: tuple = (0.0, 0.0, 0.0),  # teinte ajoutée aux hautes lumières
+        sharpen: float = 0.0,
+        glow: float = 0.0,
+        vignette: float = 0.0,
+        grain: float = 0.0,
+    ):
+        self.name = name
+        self.aliases = aliases
+        self.temperature = temperature
+        self.tint = tint
+        self.saturation = saturation
+        self.contrast = contrast
+        self.brightness = brightness
+        self.fade = fade
+        self.shadows = np.array(shadows, dtype=np.float32)
+        self.highlights = np.array(highlights, dtype=np.float32)
+        self.sharpen = sharpen
+        self.glow = glow
+        self.vignette = vignette
+        self.grain = grain
+        self.seed = zlib.crc32(name.encode())
+
+        self._tone_curve: Optional[np.ndarray] = None
+        self._lut: Optional[np.ndarray] = None
+
+    @property
+    def tone_curve(self) -> np.ndarray:
+        """Courbe de tons 256 entrées (contraste, luminosité, fondu)"""
+        if self._tone_curve is None:
+            x = np.linspace(0.0, 1.0, 256, dtype=np.float32)
+            y = 0.5 + (x - 0.5) * self.contrast + self.brightness
+            y = self.fade + np.clip(y, 0.0, 1.0) * (1.0 - self.fade)
+            self._tone_curve = np.round(np.clip(y, 0.0, 1.0) * 255).astype(np.uint8)
+        return self._tone_curve
+
+    @property
+    def lut(self) -> np.ndarray:
+        """LUT 3D (LUT_SIZE^3, 3) : balance des blancs, saturation, virage partiel"""
+        if self._lut is None:
+            grid = np.linspace(0.0, 1.0, LUT_SIZE, dtype=np.float32)
+            r, g, b = np.meshgrid(grid, grid, grid, indexing="ij")
+            rgb = np.stack([r, g, b], axis=-1)
+
+            rgb[..., 0] *= 1.0 + self.temperature
+            rgb[..., 2] *= 1.0 - self.temperature
+            rgb[..., 1] *= 1.0 - self.tint
+
+            luma = (rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32))[..., None]
+            rgb = luma + (rgb - luma) * self.saturation
+            rgb += (1.0 - luma) * self.shadows + luma * self.highlights
+
+            self._lut = np.clip(rgb, 0.0, 1.0).reshape(-1, 3).astype(np.float32) * 255.0
+        return self._lut
+
+    def cost_ns_per_pixel(self) -> float:
+        cost = _COST_NS_PER_PIXEL["tone"] + _COST_NS_PER_PIXEL["lut"]
+        for step in ("sharpen", "glow", "vignette", "grain"):
+            if getattr(self, step):
+                cost += _COST_NS_PER_PIXEL[step]
+        return cost
+
+
+# ============= REGISTRE DES STYLES =============
+
+STYLES = {}
+
+
+def register_style(style: Style):
+    STYLES[style_key(style.name)] = style
+    for alias in style.aliases:
+        STYLES[style_key(alias)] = style
+
+
+for _style in (
+    Style("Modern Aesthetic", aliases=("modern",),
+          temperature=-0.02, saturation=0.95, contrast=1.12, sharpen=0.4, vignette=0.15),
+    Style("Cozy Minimalist", aliases=("minimalist", "minimal"),
+          temperature=0.04, saturation=0.85, contrast=1.05, brightness=0.03, fade=0.04, glow=0.1),
+    Style("Scandinavian", aliases=("scandi",),
+          temperature=-0.03, saturation=0.8, contrast=1.02, brightness=0.06, fade=0.05,
+          highlights=(0.0, 0.01, 0.03)),
+    Style("Japandi",
+          temperature=0.05, saturation=0.75, contrast=1.04, fade=0.06,
+          shadows=(0.02, 0.015, 0.0), grain=4.0),
+    Style("Boho Chic", aliases=("boho",),
+          temperature=0.1, saturation=1.1, contrast=1.08, shadows=(0.04, 0.01, -0.02),
+          vignette=0.25, grain=5.0),
+    Style("Soft Cottagecore", aliases=("cottagecore",),
+          temperature=0.06, tint=-0.02, saturation=0.9, fade=0.08, glow=0.2,
+          highlights=(0.03, 0.03, 0.0)),
+    Style("Vintage Pastel", aliases=("vintage",),
+          temperature=0.05, saturation=0.7, contrast=0.92, fade=0.12,
+          shadows=(0.03, 0.0, 0.04), vignette=0.3, grain=8.0),
+    Style("Soft Girly", aliases=("Coquette Style", "Princess Style", "Princess Bedroom",
+                                 "Korean Girly Minimal"),
+          temperature=0.02, tint=0.04, saturation=0.9, brightness=0.04, fade=0.06, glow=0.25,
+          highlights=(0.04, 0.0, 0.02)),
+    Style("Barbiecore", aliases=("Barbie pink",),
+          tint=0.08, saturation=1.3, contrast=1.1, highlights=(0.08, 0.0, 0.04), glow=0.15),
+    Style("Cute Kawaii Style", aliases=("kawaii", "colorfull and childlish", "Childish Playroom",
+                                        "Toyland Theme", "Nursery Style"),
+          saturation=1.25, brightness=0.05, contrast=1.05, glow=0.1),
+    Style("Fantasy Kids", aliases=("Fantasy Kids Room", "Fairycore", "Dreamcore"),
+          temperature=-0.04, tint=0.05, saturation=1.15, fade=0.05, glow=0.35,
+          shadows=(0.02, 0.0, 0.06), vignette=0.2),
+    Style("Artistic Studio", aliases=("artistic",),
+          saturation=1.05, contrast=1.18, sharpen=0.6, vignette=0.35, grain=6.0),
+):
+    register_style(_style)
+
+
+# ============= OPÉRATIONS VECTORISÉES =============
+
+# Position dans la grille de la LUT pour chaque valeur 0..255 : indice inférieur et fraction
+_LUT_X = np.arange(256, dtype=np.float32) * ((LUT_SIZE - 1) / 255.0)
+_LUT_INDEX = np.minimum(_LUT_X.astype(np.int32), LUT_SIZE - 2)
+_LUT_FRAC = (_LUT_X - _LUT_INDEX).astype(np.float32)
+
+
+def _apply_lut(tile: np.ndarray, lut: np.ndarray) -> np.ndarray:
+    """Interpolation trilinéaire d'une LUT 3D sur une bande uint8 (H, W, 3) -> float32"""
+    n = LUT_SIZE
+    pixels = tile.reshape(-1, 3)
+    r, g, b = pixels[:, 0], pixels[:, 1], pixels[:, 2]
+    base = (_LUT_INDEX[r] * n + _LUT_INDEX[g]) * n + _LUT_INDEX[b]
+    fr, fg, fb = _LUT_FRAC[r][:, None], _LUT_FRAC[g][:, None], _LUT_FRAC[b][:, None]
+
+    def lerp_b(offset):
+        low = np.take(lut, base + offset, axis=0)
+        high = np.take(lut, base + offset + 1, axis=0)
+        high -= low
+        high *= fb
+        low += high
+        return low
+
+    # Interpolation le long de B, puis G, puis R (opérations en place)
+    c00, c01 = lerp_b(0), lerp_b(n)
+    c10, c11 = lerp_b(n * n), lerp_b(n * n + n)
+    c01 -= c00
+    c01 *= fg
+    c00 += c01
+    c11 -= c10
+    c11 *= fg
+    c10 += c11
+    c10 -= c00
+    c10 *= fr
+    c00 += c10
+    return c00.reshape(tile.shape)
+
+
+def _box_blur(a: np.ndarray, radius: int) -> np.ndarray:
+    """Flou boîte séparable par sommes cumulées (coût indépendant du rayon)"""
+    if radius <= 0:
+        return a
+    k = 2 * radius + 1
+    # Lignes
+    c = np.cumsum(np.pad(a, ((radius + 1, radius), (0, 0), (0, 0)), mode="edge"), axis=0, dtype=np.float64)
+    a = ((c[k:] - c[:-k]) / k).astype(np.float32)
+    # Colonnes
+    c = np.cumsum(np.pad(a, ((0, 0), (radius + 1, radius), (0, 0)), mode="edge"), axis=1, dtype=np.float64)
+    return ((c[:, k:] - c[:, :-k]) / k).astype(np.float32)
+
+
+def _hash_noise(y0: int, y1: int, width: int, seed: int) -> np.ndarray:
+    """Bruit uniforme [-0.5, 0.5] fonction des seules coordonnées : identique quel que soit le découpage"""
+    y = np.arange(y0, y1, dtype=np.uint32)[:, None]
+    x = np.arange(width, dtype=np.uint32)[None, :]
+    h = x * np.uint32(374761393) + y * np.uint32(668265263) + np.uint32(seed)
+    h = (h ^ (h >> np.uint32(13))) * np.uint32(1274126177)
+    h ^= h >> np.uint32(16)
+    return (h & np.uint32(0xFFFF)).astype(np.float32) / 65535.0 - 0.5
+
+
+class StyleEngine:
+    """Applique un style à une image entière, bande par bande"""
+
+    def __init__(
+        self,
+        styles: dict = STYLES,
+        latency_budget_ms: float = STYLE_LATENCY_BUDGET_MS,
+        tile_rows: int = STYLE_TILE_ROWS,
+    ):
+        self.styles = styles
+        self.latency_budget_ms = latency_budget_ms
+        self.tile_rows = max(16, int(tile_rows))
+        self.version = STYLE_ENGINE_VERSION
+
+        self._lock = threading.Lock()
+        self._images = 0
+        self._downscaled = 0
+        self._over_budget = 0
+        self._total_ms = 0.0
+        self._max_ms = 0.0
+
+    def resolve(self, name: str) -> Style:
+        """Style demandé, ou le style par défaut si inconnu"""
+        return self.styles.get(style_key(name)) or self.styles[DEFAULT_STYLE]
+
+    def fit_to_budget(self, img: Image.Image, style: Style) -> Image.Image:
+        """Réduit l'image si le coût estimé dépasse le budget (ne dépend que de la taille)"""
+        pixels = img.width * img.height
+        max_pixels = self.latency_budget_ms * 1e6 / style.cost_ns_per_pixel()
+        if pixels <= max_pixels:
+            return img
+        scale = (max_pixels / pixels) ** 0.5
+        size = (max(1, int(img.width * scale)), max(1, int(img.height * scale)))
+        with self._lock:
+            self._downscaled += 1
+        return img.resize(size, Image.Resampling.BILINEAR)
+
+    def apply(self, pixels: np.ndarray, style: Style,
+              progress: Optional[Callable[[float], None]] = None) -> np.ndarray:
+        """Image uint8 (H, W, 3) -> image stylisée uint8 (H, W, 3)"""
+        height, width = pixels.shape[:2]
+        out = np.empty_like(pixels)
+        curve = style.tone_curve
+        lut = style.lut
+
+        blur_radius = max(1, round(min(height, width) / 400))
+        glow_radius = max(2, round(min(height, width) / 80))
+        halo = (blur_radius if style.sharpen else 0) + (glow_radius if style.glow else 0)
+
+        # Coordonnées normalisées pour le vignettage
+        xs = (np.arange(width, dtype=np.float32) - (width - 1) / 2) / (width / 2)
+
+        for y0 in range(0, height, self.tile_rows):
+            y1 = min(height, y0 + self.tile_rows)
+            # Bande étendue : les flous ont besoin des lignes voisines
+            e0, e1 = max(0, y0 - halo), min(height, y1 + halo)
+
+            tile = _apply_lut(curve[pixels[e0:e1]], lut)
+
+            if style.sharpen:
+                tile += (tile - _box_blur(tile, blur_radius)) * style.sharpen
+            if style.glow:
+                blurred = _box_blur(tile, glow_radius)
+                # Fusion "screen" : éclaircit les zones lumineuses
+                tile += (blurred - tile * blurred / 255.0) * style.glow
+
+            tile = tile[y0 - e0:tile.shape[0] - (e1 - y1)]
+
+            if style.vignette:
+                ys = (np.arange(y0, y1, dtype=np.float32) - (height - 1) / 2) / (height / 2)
+                dist2 = (ys[:, None] ** 2 + xs[None, :] ** 2) / 2
+                tile *= (1.0 - style.vignette * dist2)[..., None]
+            if style.grain:
+                tile += (_hash_noise(y0, y1, width, style.seed) * (2 * style.grain))[..., None]
+
+            np.clip(tile, 0, 255, out=tile)
+            out[y0:y1] = tile.astype(np.uint8)
+
+            if progress is not None:
+                progress(y1 / height)
+        return out
+
+    def transform_file(self, original_path: str, generated_path: str, style: str, room_type: str,
+                       progress: Callable[[int, str], None]):
+        """Transformation d'un fichier (signature attendue par jobs.JobWorkerPool)"""
+        start = time.perf_counter()
+        resolved = self.resolve(style)
+
+        progress(5, "Lecture de l'image")
+        with Image.open(original_path) as img:
+            img = self.fit_to_budget(img.convert("RGB"), resolved)
+        pixels = np.asarray(img)
+
+        progress(15, f"Style {resolved.name}")
+        result = self.apply(pixels, resolved, lambda done: progress(15 + int(done * 75), None))
+
+        progress(92, "Enregistrement")
+        tmp_path = f"{generated_path}.tmp"
+        Image.fromarray(result).save(tmp_path, format="JPEG", quality=STYLE_JPEG_QUALITY)
+        os.replace(tmp_path, generated_path)
+
+        self._record((time.perf_counter() - start) * 1000)
+
+    def _record(self, elapsed_ms: float):
+        with self._lock:
+            self._images += 1
+            self._total_ms += elapsed_ms
+            self._max_ms = max(self._max_ms, elapsed_ms)
+            if elapsed_ms > self.latency_budget_ms:
+                self._over_budget += 1
+
+    def stats(self) -> dict:
+        images = self._images
+        return {
+            "version": self.version,
+            "latency_budget_ms": self.latency_budget_ms,
+            "images": images,
+            "avg_ms": round(self._total_ms / images, 2) if images else 0.0,
+            "max_ms": round(self._max_ms, 2),
+            "downscaled": self._downscaled,
+            "over_budget": self._over_budget,
+            "styles": sorted({style.name for style in self.styles.values()}),
+        }
@@ -0,0 +1,44 @@
+# backend_api/tests/conftest.py - Base SQLite et racine de stockage temporaires
+#
+# Lancer depuis backend_api/ : python -m pytest
+# Les modules lisent leur configuration à l'import : l'environnement est fixé avant.
+
+import os
+import sys
+import tempfile
+
+_ROOT = tempfile.mkdtemp(prefix="backend_api_tests_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_ROOT}/test.db")
+os.environ.setdefault("STORAGE_ROOT", _ROOT)
+os.environ.setdefault("GC_INTERVAL_S", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Base vide par test (fichier SQLite : plusieurs sessions la partagent)"""
+    engine = create_engine(f"sqlite:///{tmp_path}/test.db", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def user(db):
+    user = models.User(email="test@example.com", username="test", hashed_password="x")
+    db.add(user)
+    db.commit()
+    return user
@@ -0,0 +1,28 @@
+# backend_api/tests/test_database.py - DB_ASYNC=false : même code de route sur une session synchrone
+
+import asyncio
+
+from sqlalchemy import select
+
+import design_stats
+from database import ThreadedSession
+from models import User
+
+
+def test_threaded_session_matches_async_session_calls(session_factory):
+    async def route():
+        async with ThreadedSession(session_factory(expire_on_commit=False)) as db:
+            user = User(email="a@example.com", username="a", hashed_password="x")
+            db.add(user)
+            await db.commit()
+            await db.refresh(user)
+
+            assert await db.scalar(select(User.id).where(User.email == "a@example.com")) == user.id
+            assert (await db.get(User, user.id)).username == "a"
+            assert await db.run_sync(design_stats.total_designs, user.id) == 0
+
+            await db.delete(user)
+            await db.commit()
+            return await db.scalar(select(User).where(User.id == user.id))
+
+    assert asyncio.run(route()) is None
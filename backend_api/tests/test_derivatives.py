@@ -0,0 +1,54 @@
+# backend_api/tests/test_derivatives.py - Dérivés des objets immuables, ceux des fichiers hérités suivent leur source
+
+import os
+
+from PIL import Image
+
+from derivatives import DerivativeGenerator
+from file_serving import IMMUTABLE_CACHE_CONTROL, MUTABLE_CACHE_CONTROL, cache_headers
+from storage import object_path
+
+SIZES = {"thumb": 16}
+
+
+def image(path, color):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new("RGB", (64, 48), color).save(path, "JPEG")
+
+
+def policy(generator, path):
+    full_path = generator.full_path(path)
+    return cache_headers(path, os.stat(full_path), full_path)
+
+
+def test_object_derivative_is_immutable(tmp_path):
+    generator = DerivativeGenerator(sizes=SIZES, root=str(tmp_path))
+    source = object_path("ab" * 32)
+    image(tmp_path / source, "red")
+
+    path = generator.ensure(source, "thumb")
+
+    headers = policy(generator, path)
+    assert headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+    assert headers["ETag"] == f'"{os.path.basename(path)}"'
+
+
+def test_legacy_derivative_follows_its_source(tmp_path):
+    generator = DerivativeGenerator(sizes=SIZES, root=str(tmp_path))
+    source = "uploads/designs/design_20240101.jpg"
+    image(tmp_path / source, "red")
+
+    path = generator.ensure(source, "thumb")
+    headers = policy(generator, path)
+    assert headers["Cache-Control"] == MUTABLE_CACHE_CONTROL
+
+    # Source réécrite sous le même nom : le dérivé est régénéré et son ETag change
+    image(tmp_path / source, "blue")
+    later = os.stat(generator.full_path(path)).st_mtime_ns + 1_000_000_000
+    os.utime(tmp_path / source, ns=(later, later))
+
+    assert generator.ensure(source, "thumb") == path
+    with Image.open(generator.full_path(path)) as thumb:
+        red, green, blue = thumb.convert("RGB").getpixel((0, 0))
+    assert blue > red
+    assert policy(generator, path)["ETag"] != headers["ETag"]
@@ -0,0 +1,112 @@
+# backend_api/tests/test_design_stats.py - Compteurs tenus à jour = compteurs recalculés depuis design_history
+
+from datetime import datetime
+
+from sqlalchemy import event, update
+
+import design_stats
+import jobs
+from models import DesignHistory, UserDesignStat
+
+
+# Mêmes écritures que les routes de routers/history.py (session synchrone)
+
+def save(db, user_id, style, room_type, is_favorite=False):
+    design = DesignHistory(
+        user_id=user_id,
+        original_image_path="uploads/designs/original.jpg",
+        generated_image_path="uploads/designs/generated.jpg",
+        style=style,
+        room_type=room_type,
+        is_favorite=is_favorite,
+        created_at=datetime.utcnow(),
+    )
+    db.add(design)
+    design_stats.record_design(db, design)
+    db.commit()
+    return design
+
+
+def toggle_favorite(db, design, is_favorite):
+    changed = db.execute(
+        update(DesignHistory).where(
+            DesignHistory.id == design.id,
+            DesignHistory.is_favorite.isnot(True) if is_favorite else DesignHistory.is_favorite == True
+        ).values(is_favorite=is_favorite).execution_options(synchronize_session=False)
+    ).rowcount
+    if changed:
+        design_stats.record_favorite(db, design.user_id, 1 if is_favorite else -1)
+    db.commit()
+
+
+def delete(db, design):
+    design_stats.forget_design(db, design)
+    db.delete(design)
+    db.commit()
+
+
+def test_counters_match_history_after_mixed_operations(db, user):
+    first = save(db, user.id, "modern", "bedroom")
+    second = save(db, user.id, "modern", "kitchen")
+    save(db, user.id, "minimalist", None)
+    # Ancienne ligne sans valeur de favori (NULL)
+    legacy = save(db, user.id, "modern", "bedroom", is_favorite=None)
+    assert design_stats.verify(db, user.id) == {}
+
+    # Transformation terminée par la file de jobs
+    job = jobs.create_job(db, user.id, "uploads/designs/original.jpg", "uploads/designs/out.jpg",
+                          "industrial", "bedroom")
+    transformed = jobs.complete_job(db, job)
+    assert transformed is not None
+    assert design_stats.verify(db, user.id) == {}
+
+    toggle_favorite(db, first, True)
+    toggle_favorite(db, first, True)  # déjà favori : compteur inchangé
+    toggle_favorite(db, second, True)
+    toggle_favorite(db, first, False)
+    toggle_favorite(db, legacy, False)  # NULL : déjà non favori
+    toggle_favorite(db, transformed, True)
+    assert design_stats.verify(db, user.id) == {}
+
+    delete(db, second)  # favori
+    delete(db, transformed)
+    assert design_stats.verify(db, user.id) == {}
+
+    summary = design_stats.summary(db, user.id)
+    assert summary["total_designs"] == 3
+    assert summary["total_favorites"] == 0
+    assert summary["style_distribution"] == [{"style": "minimalist", "count": 1}, {"style": "modern", "count": 2}]
+
+
+def test_concurrent_first_insert(session_factory, db, user):
+    """Le premier design de l'utilisateur enregistré en même temps par une autre requête
+
+    L'autre transaction crée les compteurs entre l'UPDATE (aucune ligne) et l'INSERT :
+    l'INSERT échoue dans son savepoint (begin_nested) et l'incrément est refait sur sa ligne.
+    """
+    other = save(db, user.id, "modern", "bedroom")
+    other_counters = [(other.user_id, dimension, value) for dimension, value in design_stats._design_counters(other)]
+    db.query(UserDesignStat).delete()
+    db.commit()
+
+    engine = session_factory.kw["bind"]
+    raced = []
+
+    def other_request_commits(conn, cursor, statement, parameters, context, executemany):
+        if raced or not statement.startswith("SAVEPOINT"):
+            return
+        raced.append(statement)
+        cursor.executemany(
+            "INSERT INTO user_design_stats (user_id, dimension, value, count) VALUES (?, ?, ?, 1)",
+            other_counters,
+        )
+
+    event.listen(engine, "before_cursor_execute", other_request_commits)
+    try:
+        save(db, user.id, "modern", "bedroom")
+    finally:
+        event.remove(engine, "before_cursor_execute", other_request_commits)
+
+    assert raced
+    assert design_stats.total_designs(db, user.id) == 2
+    assert design_stats.verify(db, user.id) == {}
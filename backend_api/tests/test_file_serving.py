@@ -0,0 +1,49 @@
+# backend_api/tests/test_file_serving.py - /static : ETag, 304 et politique de cache
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+import file_serving
+from file_serving import IMMUTABLE_CACHE_CONTROL, MUTABLE_CACHE_CONTROL, CachedStaticFiles
+from storage import object_path
+
+SHA256 = "ab" * 32
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # Rien n'est hashé pendant une requête /static
+    monkeypatch.setattr(file_serving, "file_sha256", lambda *args, **kwargs: pytest.fail("hash sur la boucle"))
+    uploads = tmp_path / "uploads"
+    (uploads / "designs").mkdir(parents=True)
+    (uploads / "designs" / "legacy.jpg").write_bytes(b"legacy")
+    obj = tmp_path / object_path(SHA256)
+    obj.parent.mkdir(parents=True)
+    obj.write_bytes(b"object")
+
+    app = Starlette(routes=[Mount("/static", CachedStaticFiles(directory=str(uploads)), name="static")])
+    return TestClient(app)
+
+
+def test_legacy_file_gets_weak_etag_and_revalidates(client):
+    response = client.get("/static/designs/legacy.jpg")
+
+    assert response.status_code == 200
+    assert response.content == b"legacy"
+    assert response.headers["etag"].startswith('W/"')
+    assert response.headers["cache-control"] == MUTABLE_CACHE_CONTROL
+
+    revalidated = client.get("/static/designs/legacy.jpg", headers={"If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == 304
+
+
+def test_object_keeps_strong_etag(client):
+    path = object_path(SHA256).removeprefix("uploads/")
+    response = client.get(f"/static/{path}")
+
+    assert response.status_code == 200
+    assert response.headers["etag"] == f'"{SHA256}"'
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert client.get(f"/static/{path}", headers={"If-None-Match": f'W/"{SHA256}"'}).status_code == 304
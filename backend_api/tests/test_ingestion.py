@@ -0,0 +1,43 @@
+# backend_api/tests/test_ingestion.py - Images déjà normalisées gardées telles quelles, les autres ré-encodées
+
+import io
+
+from PIL import Image
+
+from ingestion import ImageNormalizer
+
+
+def jpeg(path, progressive: bool, size=(64, 48)):
+    Image.new("RGB", size, (120, 80, 40)).save(path, "JPEG", quality=85, progressive=progressive)
+
+
+def test_progressive_jpeg_kept_byte_for_byte(tmp_path):
+    source, output = tmp_path / "in.jpg", tmp_path / "out.jpg"
+    jpeg(source, progressive=True)
+
+    result = ImageNormalizer(image_format="jpeg").normalize(str(source), str(output))
+
+    assert not result.reencoded
+    assert output.read_bytes() == source.read_bytes()
+
+
+def test_baseline_jpeg_reencoded_progressive(tmp_path):
+    source, output = tmp_path / "in.jpg", tmp_path / "out.jpg"
+    jpeg(source, progressive=False)
+
+    result = ImageNormalizer(image_format="jpeg").normalize(str(source), str(output))
+
+    assert result.reencoded
+    with Image.open(output) as img:
+        assert img.info.get("progressive")
+
+
+def test_oversized_jpeg_reencoded(tmp_path):
+    source, output = tmp_path / "in.jpg", tmp_path / "out.jpg"
+    jpeg(source, progressive=True, size=(400, 300))
+
+    result = ImageNormalizer(image_format="jpeg", max_edge=100).normalize(str(source), str(output))
+
+    assert result.reencoded
+    with Image.open(io.BytesIO(output.read_bytes())) as img:
+        assert max(img.size) == 100
@@ -0,0 +1,25 @@
+# backend_api/tests/test_pagination.py - limit ramené à la borne, offset négatif ramené à 0
+
+from datetime import datetime, timedelta
+
+import pagination
+from models import DesignHistory
+
+
+def test_limit_and_offset_are_clamped(db, user, monkeypatch):
+    monkeypatch.setattr(pagination, "HISTORY_MAX_PAGE_SIZE", 2)
+    now = datetime.utcnow()
+    db.add_all([
+        DesignHistory(user_id=user.id, original_image_path="a.jpg", generated_image_path="b.jpg",
+                      created_at=now - timedelta(minutes=i))
+        for i in range(3)
+    ])
+    db.commit()
+
+    items, next_cursor = pagination.history_page(db, user.id, limit=500)
+    assert len(items) == 2 and next_cursor is not None
+    rest, next_cursor = pagination.history_page(db, user.id, limit=500, cursor=next_cursor)
+    assert len(rest) == 1 and next_cursor is None
+
+    assert [d.id for d in pagination.history_offset_page(db, user.id, limit=500, offset=-5)] == [d.id for d in items]
+    assert len(pagination.history_page(db, user.id, limit=0)[0]) == 1
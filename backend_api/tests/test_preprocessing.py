@@ -0,0 +1,46 @@
+# backend_api/tests/test_preprocessing.py - Parité du prétraitement avec celui de l'entraînement
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from inference.preprocessing import IMG_SIZE, ImagePreprocessor
+
+
+def training_pixels(image_bytes: bytes) -> np.ndarray:
+    """Prétraitement de l'entraînement : décodage complet, resize par défaut (BICUBIC)"""
+    img = Image.open(io.BytesIO(image_bytes)).convert("RGB").resize((IMG_SIZE, IMG_SIZE))
+    return np.asarray(img).astype(np.float32)
+
+
+def photo(width: int, height: int) -> bytes:
+    """Texture aléatoire agrandie : plus de détails qu'un simple dégradé"""
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, size=(height // 16, width // 16, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).resize((width, height), Image.Resampling.BICUBIC).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("size", [(300, 200), (1280, 960)])
+def test_full_decode_matches_training_exactly(size):
+    image_bytes = photo(*size)
+    sample = ImagePreprocessor(draft=False).decode(image_bytes)
+    assert np.array_equal(sample.astype(np.float32), training_pixels(image_bytes))
+
+
+@pytest.mark.parametrize("size", [(1280, 960), (4032, 3024)])
+def test_draft_decode_stays_close_to_training(size):
+    image_bytes = photo(*size)
+    diff = np.abs(ImagePreprocessor(draft=True).decode(image_bytes).astype(np.float32) - training_pixels(image_bytes))
+    # Écart moyen sous 1 % de la plage (niveaux 0-255)
+    assert diff.mean() < 2.55
+
+
+def test_rescaled_sample_is_divided_by_255():
+    image_bytes = photo(300, 200)
+    sample = ImagePreprocessor(rescale=True, draft=False).decode(image_bytes)
+    assert sample.dtype == np.float32
+    np.testing.assert_allclose(sample * 255, training_pixels(image_bytes), atol=1e-3)
@@ -0,0 +1,205 @@
+# backend_api/tests/test_storage.py - Écritures bornées et atomiques, déduplication, références, ramasse-miettes
+
+import asyncio
+import io
+import os
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+import blobs
+from derivatives import DerivativeGenerator
+from models import DesignHistory, ImageBlob
+from storage import STORAGE_OBJECTS_DIR, LocalStorage, MemoryStorage, object_path
+from storage_gc import StorageCollector
+
+
+def png(color) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def upload(data: bytes, size=None) -> UploadFile:
+    return UploadFile(io.BytesIO(data), size=size, filename="photo.jpg")
+
+
+def objects(root) -> list:
+    """Fichiers sous uploads/objects, fichiers temporaires compris"""
+    return [
+        os.path.join(dirpath, filename)
+        for dirpath, _, filenames in os.walk(os.path.join(root, STORAGE_OBJECTS_DIR))
+        for filename in filenames
+    ]
+
+
+# ============= LIMITES DE TAILLE =============
+
+def test_memory_upload_rejected_while_streaming():
+    storage = MemoryStorage(chunk_size=4)
+    file = upload(b"x" * 100)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(storage.save_upload(file, max_bytes=10))
+
+    assert error.value.status_code == 413
+    # Arrêt au premier bloc qui franchit la limite, sans lire le reste
+    assert file.file.tell() <= 10 + storage.chunk_size
+    assert storage.files == {}
+
+
+def test_declared_size_rejected_before_reading():
+    storage = MemoryStorage()
+    file = upload(b"x" * 100, size=100)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(storage.save_upload(file, max_bytes=10))
+
+    assert error.value.status_code == 413
+    assert file.file.tell() == 0
+
+
+def test_memory_receive_upload_removes_temp_file(tmp_path, monkeypatch):
+    storage = MemoryStorage(chunk_size=4)
+    tmp_file = tmp_path / "raw.jpg"
+    monkeypatch.setattr(storage, "temp_path", lambda ext="": str(tmp_file))
+
+    with pytest.raises(HTTPException):
+        asyncio.run(storage.receive_upload(upload(b"x" * 100), max_bytes=10))
+
+    assert not tmp_file.exists()
+
+
+# ============= ÉCRITURES ATOMIQUES =============
+
+def test_local_write_lands_at_content_address(tmp_path):
+    storage = LocalStorage(root=str(tmp_path), chunk_size=4)
+    data = png("red")
+
+    stored = asyncio.run(storage.save_upload(upload(data), ext=".png"))
+
+    assert stored.path == object_path(stored.sha256, ".png")
+    assert stored.size == len(data)
+    assert (tmp_path / stored.path).read_bytes() == data
+    # Plus rien dans le répertoire temporaire après le rename
+    assert objects(tmp_path) == [str(tmp_path / stored.path)]
+
+
+def test_local_rejected_upload_leaves_nothing(tmp_path):
+    storage = LocalStorage(root=str(tmp_path), chunk_size=4)
+    existing = asyncio.run(storage.save_bytes(png("red"), ".png"))
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(storage.save_upload(upload(b"x" * 100), max_bytes=10))
+
+    assert error.value.status_code == 413
+    # Ni fichier partiel ni objet existant modifié
+    assert objects(tmp_path) == [str(tmp_path / existing.path)]
+    assert (tmp_path / existing.path).read_bytes() == png("red")
+
+
+# ============= DÉDUPLICATION =============
+
+@pytest.mark.parametrize("storage_class", [LocalStorage, MemoryStorage])
+def test_identical_bytes_share_one_object(tmp_path, storage_class):
+    storage = storage_class(root=str(tmp_path)) if storage_class is LocalStorage else storage_class()
+    data = png("blue")
+
+    # L'extension vient du contenu, pas de l'appelant
+    stored = [asyncio.run(storage.save_bytes(data, ext)) for ext in (".png", ".jpg", ".JPEG")]
+
+    assert {s.path for s in stored} == {object_path(stored[0].sha256, ".png")}
+    assert asyncio.run(storage.read(stored[0].path)) == data
+    if storage_class is MemoryStorage:
+        assert list(storage.files) == [stored[0].path]
+    else:
+        assert len(objects(tmp_path)) == 1
+
+
+def test_blob_ref_counts(db):
+    stored = asyncio.run(MemoryStorage().save_bytes(png("green"), ".png"))
+    blobs.register(db, stored)
+    blobs.register(db, stored)
+    assert db.query(ImageBlob).count() == 1
+
+    assert blobs.acquire(db, stored.path)
+    assert blobs.acquire(db, stored.path)
+    db.commit()
+    assert db.get(ImageBlob, stored.sha256).ref_count == 2
+
+    assert blobs.release(db, stored.path)
+    assert blobs.release(db, stored.path)
+    # Jamais en dessous de zéro
+    assert not blobs.release(db, stored.path)
+    db.commit()
+    db.expire_all()
+    assert db.get(ImageBlob, stored.sha256).ref_count == 0
+
+    # Fichiers hérités (hors uploads/objects) : pas de compteur
+    assert not blobs.acquire(db, "uploads/designs/photo.jpg")
+
+
+# ============= RAMASSE-MIETTES =============
+
+def test_gc_keeps_referenced_objects_and_reclaims_the_rest(tmp_path, session_factory, db, user):
+    storage = LocalStorage(root=str(tmp_path))
+    shared = asyncio.run(storage.save_bytes(png("red"), ".png"))
+    orphan = asyncio.run(storage.save_bytes(png("black"), ".png"))
+    for stored in (shared, orphan):
+        blobs.register(db, stored)
+
+    # Deux designs pointent vers le même objet
+    designs = [
+        DesignHistory(user_id=user.id, original_image_path=shared.path, generated_image_path=shared.path)
+        for _ in range(2)
+    ]
+    db.add_all(designs)
+    for _ in range(4):
+        blobs.acquire(db, shared.path)
+    db.commit()
+
+    # Un des deux supprimé : le fichier reste, toujours utilisé par l'autre
+    blobs.release(db, designs[0].original_image_path)
+    blobs.release(db, designs[0].generated_image_path)
+    db.delete(designs[0])
+    # Compteur faussé (à corriger par la réconciliation)
+    db.get(ImageBlob, shared.sha256).ref_count = 5
+    db.commit()
+
+    collector = StorageCollector(
+        session_factory=session_factory,
+        root=str(tmp_path),
+        grace_s=-1,
+        batch_pause_s=0,
+        derivative_generator=DerivativeGenerator(root=str(tmp_path)),
+    )
+    report = collector.run_once()
+
+    assert report["blob_refs_fixed"] == 1
+    assert report["orphans"] == 1
+    assert (tmp_path / shared.path).exists()
+    assert not (tmp_path / orphan.path).exists()
+
+    db.expire_all()
+    assert db.get(ImageBlob, shared.sha256).ref_count == 2
+    assert db.get(ImageBlob, orphan.sha256) is None
+
+
+def test_gc_dry_run_deletes_nothing(tmp_path, session_factory, db):
+    storage = LocalStorage(root=str(tmp_path))
+    orphan = asyncio.run(storage.save_bytes(png("black"), ".png"))
+    blobs.register(db, orphan)
+
+    report = StorageCollector(
+        session_factory=session_factory,
+        root=str(tmp_path),
+        grace_s=-1,
+        batch_pause_s=0,
+        derivative_generator=DerivativeGenerator(root=str(tmp_path)),
+        dry_run=True,
+    ).run_once()
+
+    assert report["reclaimed_files"] == 1
+    assert (tmp_path / orphan.path).exists()
+    assert db.get(ImageBlob, orphan.sha256) is not None
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Choix du seuil de la cascade sur un dossier d'images étiquetées
+Structure attendue : <dossier>/<classe>/*.jpg (classes = CLASS_NAMES)
+Usage : python tune_cascade.py <dossier> [--max-accuracy-drop 0.01]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+from inference.backends import load_backend
+from inference.cascade import CASCADE_MODEL_DIR
+from inference.preprocessing import ImagePreprocessor, should_rescale
+
+CLASS_NAMES = ["bathroom", "bedroom", "office", "kitchen", "living room"]
+IMG_SIZE = 224
+BATCH_SIZE = 16
+
+
+def load_dataset(folder: str):
+    """Chemins et étiquettes à partir des sous-dossiers de classes"""
+    paths, labels = [], []
+    for label, class_name in enumerate(CLASS_NAMES):
+        for pattern in ("*.jpg", "*.jpeg", "*.png"):
+            found = glob.glob(os.path.join(folder, class_name, pattern))
+            paths.extend(found)
+            labels.extend([label] * len(found))
+    return paths, np.array(labels)
+
+
+def run_model(model, samples: np.ndarray):
+    """Prédictions par lots et temps moyen par image"""
+    preds = []
+    start = time.perf_counter()
+    for i in range(0, len(samples), BATCH_SIZE):
+        preds.append(np.asarray(model.predict(samples[i:i + BATCH_SIZE]), dtype=np.float32))
+    per_image_ms = (time.perf_counter() - start) * 1000 / len(samples)
+    return np.concatenate(preds), per_image_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Choisir CASCADE_THRESHOLD")
+    parser.add_argument("folder")
+    parser.add_argument("--full-model-dir", default="model")
+    parser.add_argument("--fast-model-dir", default=CASCADE_MODEL_DIR)
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.01)
+    args = parser.parse_args()
+
+    paths, labels = load_dataset(args.folder)
+    if not paths:
+        print(f"❌ Aucune image trouvée dans {args.folder}/<classe>/")
+        sys.exit(1)
+
+    print(f"📷 {len(paths)} images étiquetées")
+    preprocessor = ImagePreprocessor(
+        size=IMG_SIZE,
+        rescale=should_rescale(os.path.join(args.full_model_dir, "config.json"))
+    )
+    samples = np.empty((len(paths), IMG_SIZE, IMG_SIZE, 3), dtype=np.float32)
+    for i, path in enumerate(paths):
+        with open(path, "rb") as f:
+            samples[i] = preprocessor.decode(f.read())
+
+    fast_preds, fast_ms = run_model(load_backend(args.fast_model_dir), samples)
+    full_preds, full_ms = run_model(load_backend(args.full_model_dir), samples)
+
+    fast_correct = fast_preds.argmax(axis=1) == labels
+    full_correct = full_preds.argmax(axis=1) == labels
+    fast_confidence = fast_preds.max(axis=1)
+    full_accuracy = full_correct.mean()
+
+    print(f"\n⏱️  Rapide: {fast_ms:.2f} ms/image, complet: {full_ms:.2f} ms/image")
+    print(f"🎯 Précision modèle complet seul: {full_accuracy:.4f}\n")
+    print(f"{'seuil':>6} {'couverture':>11} {'précision':>10} {'ms/image':>9}")
+
+    best = None
+    for threshold in np.round(np.arange(0.50, 1.0, 0.02), 2):
+        answered = fast_confidence >= threshold
+        accuracy = np.where(answered, fast_correct, full_correct).mean()
+        coverage = answered.mean()
+        cost_ms = fast_ms + (1 - coverage) * full_ms
+        print(f"{threshold:>6.2f} {coverage:>11.2%} {accuracy:>10.4f} {cost_ms:>9.2f}")
+        # Seuil le plus bas (donc le plus rapide) qui respecte la perte de précision tolérée
+        if best is None and accuracy >= full_accuracy - args.max_accuracy_drop:
+            best = (threshold, coverage, accuracy, cost_ms)
+
+    if best is None:
+        print("\n⚠️  Aucun seuil ne respecte la tolérance : garder la cascade désactivée")
+    else:
+        threshold, coverage, accuracy, cost_ms = best
+        print(f"\n✅ CASCADE_THRESHOLD={threshold:.2f} "
+              f"(couverture {coverage:.2%}, précision {accuracy:.4f}, {cost_ms:.2f} ms/image)")
+
+
+if __name__ == "__main__":
+    main()
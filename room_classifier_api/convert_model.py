@@ -1,28 +1,170 @@
-import tensorflow as tf
+import argparse
+import glob
 import json
 import os
 
-print("🔄 Conversion du modèle en format .keras...")
+import numpy as np
 
-# Charger la configuration
-with open('model/config.json', 'r') as f:
-    config = json.load(f)
+from inference.backends import model_filename
+from inference.preprocessing import ImagePreprocessor, should_rescale
 
-# Reconstruire le modèle depuis la config
-model = tf.keras.models.model_from_json(json.dumps(config))
+MODEL_DIR = "model"
+IMG_SIZE = 224
+CALIBRATION_SAMPLES = 100
 
-# Charger les poids
-model.load_weights('model/model.weights.h5')
 
-# Sauvegarder au format .keras
-model.save('model/room_classifier.keras')
+def size_mb(path: str) -> float:
+    return os.path.getsize(path) / 1024 / 1024
 
-print("✅ Modèle converti avec succès!")
-print(f"📁 Fichier créé: model/room_classifier.keras")
-print(f"📊 Taille: {os.path.getsize('model/room_classifier.keras') / 1024 / 1024:.2f} MB")
 
-# Vérifier le modèle
-print("\n🧪 Test du modèle:")
-print(f"  - Input shape: {model.input_shape}")
-print(f"  - Output shape: {model.output_shape}")
-print(f"  - Nombre de couches: {len(model.layers)}")
\ No newline at end of file
+def convert_keras():
+    """Reconstruit le modèle depuis config.json + poids et le sauvegarde en .keras"""
+    import tensorflow as tf
+
+    print("🔄 Conversion du modèle en format .keras...")
+
+    # Charger la configuration
+    with open(os.path.join(MODEL_DIR, 'config.json'), 'r') as f:
+        config = json.load(f)
+
+    # Reconstruire le modèle depuis la config
+    model = tf.keras.models.model_from_json(json.dumps(config))
+
+    # Charger les poids
+    model.load_weights(os.path.join(MODEL_DIR, 'model.weights.h5'))
+
+    # Sauvegarder au format .keras
+    keras_path = os.path.join(MODEL_DIR, model_filename("keras"))
+    model.save(keras_path)
+
+    print("✅ Modèle converti avec succès!")
+    print(f"📁 Fichier créé: {keras_path}")
+    print(f"📊 Taille: {size_mb(keras_path):.2f} MB")
+
+    # Vérifier le modèle
+    print("\n🧪 Test du modèle:")
+    print(f"  - Input shape: {model.input_shape}")
+    print(f"  - Output shape: {model.output_shape}")
+    print(f"  - Nombre de couches: {len(model.layers)}")
+    return model
+
+
+def calibration_batches(calibration_dir: str):
+    """Échantillons représentatifs pour la quantification int8, prétraités comme en production"""
+    preprocessor = ImagePreprocessor(
+        size=IMG_SIZE,
+        rescale=should_rescale(os.path.join(MODEL_DIR, "config.json"))
+    )
+    paths = []
+    if calibration_dir:
+        for pattern in ("*.jpg", "*.jpeg", "*.png"):
+            paths.extend(glob.glob(os.path.join(calibration_dir, "**", pattern), recursive=True))
+    paths = sorted(paths)[:CALIBRATION_SAMPLES]
+
+    if not paths:
+        print("⚠️  Aucune image de calibration : données synthétiques (précision int8 dégradée)")
+        rng = np.random.default_rng(0)
+        scale = 1.0 / 255.0 if preprocessor.rescale else 1.0
+        for _ in range(CALIBRATION_SAMPLES):
+            yield (rng.uniform(0, 255, (1, IMG_SIZE, IMG_SIZE, 3)) * scale).astype(np.float32)
+        return
+
+    print(f"📷 Calibration sur {len(paths)} images de {calibration_dir}")
+    for path in paths:
+        with open(path, "rb") as f:
+            yield preprocessor(f.read())
+
+
+def export_tflite(model, quantization: str, calibration_dir: str):
+    """Exporte en TFLite : float32, float16 (poids) ou int8 (poids + activations)"""
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantization == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == "int8":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: ([batch] for batch in calibration_batches(calibration_dir))
+        # Entrées/sorties restent en float32 : le prétraitement ne change pas
+        converter.target_spec.supported_ops = [
+            tf.lite.OpsSet.TFLITE_BUILTINS_INT8,
+            tf.lite.OpsSet.TFLITE_BUILTINS,
+        ]
+
+    tflite_path = os.path.join(MODEL_DIR, model_filename("tflite", quantization))
+    with open(tflite_path, "wb") as f:
+        f.write(converter.convert())
+    print(f"✅ TFLite {quantization or 'float32'}: {tflite_path} ({size_mb(tflite_path):.2f} MB)")
+
+
+class _CalibrationReader:
+    """Lecteur de calibration pour onnxruntime.quantization.quantize_static"""
+
+    def __init__(self, input_name: str, calibration_dir: str):
+        self._batches = ({input_name: batch} for batch in calibration_batches(calibration_dir))
+
+    def get_next(self):
+        return next(self._batches, None)
+
+
+def export_onnx(model, quantization: str, calibration_dir: str):
+    """Exporte en ONNX (tf2onnx), puis quantification statique int8 (QDQ) si demandée"""
+    import tensorflow as tf
+    import tf2onnx
+
+    onnx_path = os.path.join(MODEL_DIR, model_filename("onnx"))
+    spec = (tf.TensorSpec((None, IMG_SIZE, IMG_SIZE, 3), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=17, output_path=onnx_path)
+    print(f"✅ ONNX float32: {onnx_path} ({size_mb(onnx_path):.2f} MB)")
+
+    if quantization == "int8":
+        from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+
+        int8_path = os.path.join(MODEL_DIR, model_filename("onnx", "int8"))
+        quantize_static(
+            onnx_path,
+            int8_path,
+            _CalibrationReader("input", calibration_dir),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+        )
+        print(f"✅ ONNX int8: {int8_path} ({size_mb(int8_path):.2f} MB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conversion et export du classifieur de pièces")
+    parser.add_argument(
+        "--formats", default="keras",
+        help="Formats à produire, séparés par des virgules : keras,tflite,onnx"
+    )
+    parser.add_argument(
+        "--quantize", default="",
+        help="Variantes quantifiées en plus du float32 : float16,int8"
+    )
+    parser.add_argument(
+        "--calibration-dir", default="",
+        help="Dossier d'images représentatives pour la quantification int8"
+    )
+    args = parser.parse_args()
+
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    quantizations = [""] + [q.strip() for q in args.quantize.split(",") if q.strip()]
+
+    model = convert_keras()
+
+    if "tflite" in formats:
+        print("\n🔄 Export TFLite...")
+        for quantization in quantizations:
+            export_tflite(model, quantization, args.calibration_dir)
+
+    if "onnx" in formats:
+        print("\n🔄 Export ONNX...")
+        if "float16" in quantizations:
+            print("⚠️  float16 n'est pas proposé pour ONNX sur CPU, utilisez int8 ou TFLite float16")
+        export_onnx(model, "int8" if "int8" in quantizations else "", args.calibration_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+# Inference modules are shared with backend_api: backend_api/inference is the only copy.
+# Appending it to this package's search path keeps `from inference.batching import ...`
+# working here without duplicating the files (run from room_classifier_api, next to backend_api).
+import os
+
+__path__.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             "backend_api", "inference"))
@@ -1,37 +1,66 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.responses import JSONResponse
-import tensorflow as tf
-from PIL import Image
 import numpy as np
-import io
 import os
+from inference.batching import BatchScheduler
+from inference.executor import InferenceExecutor
+from inference.cache import PredictionCache, model_version
+from inference.preprocessing import ImagePreprocessor, should_rescale
+from inference.backends import load_backend
 
 app = FastAPI(title="Room Classifier API")
 
-# Path to your model file
-MODEL_PATH = os.path.join("model", "room_classifier.keras")
+MODEL_DIR = "model"
 
-# Load model once on startup
-model = tf.keras.models.load_model(MODEL_PATH)
+# Load model once on startup, with the runtime picked by INFERENCE_BACKEND (keras, tflite, onnx)
+model = load_backend(MODEL_DIR)
+MODEL_PATH = model.model_path
 
 # Replace with your real class names in correct order
 CLASS_NAMES = ["bathroom", "bedroom", "office", "kitchen", "living room"]
 
 IMG_SIZE = 224  # EfficientNetB0 default input size
 
+# /255 as in training (PREPROCESS_RESCALE, see inference/preprocessing.py)
+preprocessor = ImagePreprocessor(
+    size=IMG_SIZE,
+    rescale=should_rescale(os.path.join(MODEL_DIR, "config.json"))
+)
+
 def preprocess_image(image_bytes: bytes):
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    img = img.resize((IMG_SIZE, IMG_SIZE))
-    arr = np.array(img).astype(np.float32) / 255.0
-    arr = np.expand_dims(arr, axis=0)
-    return arr
+    return preprocessor(image_bytes)
+
+def predict_batch(batch: np.ndarray) -> np.ndarray:
+    # One forward pass for a whole (N, 224, 224, 3) batch
+    return model.predict(batch)
+
+# Decoding and inference run on a dedicated pool, off the event loop
+inference_executor = InferenceExecutor()
+
+# Concurrent requests are grouped into a single batch
+batch_scheduler = BatchScheduler(predict_batch, executor=inference_executor.pool)
+
+# Re-submitted photos are answered from cache, keyed by content hash + model version
+prediction_cache = PredictionCache(model_version=model_version(MODEL_PATH))
+
+async def classify_bytes(image_bytes: bytes) -> np.ndarray:
+    cache_key = prediction_cache.key_for(image_bytes)
+    preds = prediction_cache.get(cache_key)
+    if preds is not None:
+        return preds
+
+    async with inference_executor.slot():
+        sample = await inference_executor.run(preprocessor.decode, image_bytes)
+        preds = await batch_scheduler.submit(sample)
+
+    prediction_cache.put(cache_key, preds)
+    return preds
 
 @app.post("/predict")
 async def predict(file: UploadFile = File(...)):
     try:
         image_bytes = await file.read()
-        img = preprocess_image(image_bytes)
-        preds = model.predict(img)
+        preds = await classify_bytes(image_bytes)
         class_index = int(np.argmax(preds))
         confidence = float(np.max(preds))
 
@@ -39,5 +68,15 @@ async def predict(file: UploadFile = File(...)):
             "class": CLASS_NAMES[class_index] if class_index < len(CLASS_NAMES) else str(class_index),
             "confidence": round(confidence, 4)
         })
+    except HTTPException:
+        raise
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=500)
+
+@app.get("/stats")
+def stats():
+    return {
+        "batching": batch_scheduler.stats(),
+        "executor": inference_executor.stats(),
+        "cache": prediction_cache.stats()
+    }